@@ -0,0 +1,59 @@
+"""Микробенчмарк ArgsParser.parse_args: быстрый путь против посимвольного
+разбора на типичных строках man-страниц.
+
+    python benchmarks/bench_args_parser.py [-n NUMBER]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from core.args_parser import ArgsParser  # noqa: E402
+
+SAMPLE_LINES = [
+    "The quick brown fox jumps over the lazy dog and keeps running.\n",
+    ".TP\n",
+    ".B \\-a, \\-\\-all\n",
+    "do not ignore entries starting with .\n",
+    ".BR ls (1),\n",
+    ".IR file \\fR...\\fP\n",
+    ".SH \"SEE ALSO\"\n",
+    ".TH LS 1 \"March 2020\" \"GNU coreutils 8.32\" \"User Commands\"\n",
+    "with \\-l, print the author of each file\n",
+    "\n",
+]
+
+
+def run(number):
+    parser = ArgsParser()
+    for line in SAMPLE_LINES:
+        assert parser.parse_args(line) == \
+            list(parser._parse_args_exact(line)), line
+
+    def exact():
+        for line in SAMPLE_LINES:
+            list(parser._parse_args_exact(line))
+
+    def fast():
+        for line in SAMPLE_LINES:
+            parser.parse_args(line)
+
+    exact_time = min(timeit.repeat(exact, number=number, repeat=5))
+    fast_time = min(timeit.repeat(fast, number=number, repeat=5))
+    lines = number * len(SAMPLE_LINES)
+    print("exact: {:.0f} lines/sec".format(lines / exact_time))
+    print("fast:  {:.0f} lines/sec".format(lines / fast_time))
+    print("speedup: {:.1f}x".format(exact_time / fast_time))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=20000,
+                        help="Passes over the sample lines per repeat")
+    run(parser.parse_args().number)
+
+
+if __name__ == "__main__":
+    main()
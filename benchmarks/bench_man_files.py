@@ -0,0 +1,67 @@
+"""Микробенчмарк чтения файлов страниц: ManFile против текстового
+режима open, gzip.open, bz2.open и lzma.open.
+
+    python benchmarks/bench_man_files.py [--lines 200000]
+"""
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from benchmarks.corpus import generate_page  # noqa: E402
+from core.man_files import ManFile  # noqa: E402
+
+FORMATS = (
+    ("plain", "", open, lambda data: data),
+    ("gzip", ".gz", gzip.open, gzip.compress),
+    ("bz2", ".bz2", bz2.open, bz2.compress),
+    ("xz", ".xz", lzma.open, lzma.compress),
+)
+
+
+def count_lines(opener, path):
+    with opener(path) as f:
+        return sum(1 for _ in f)
+
+
+def run(lines, repeat):
+    data = "".join(generate_page("mixed", lines)).encode("utf-8")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, suffix, text_open, compress in FORMATS:
+            path = os.path.join(directory, "bench.1" + suffix)
+            with open(path, "wb") as f:
+                f.write(compress(data))
+
+            def text_mode():
+                return count_lines(
+                    lambda p: text_open(p, "rt", encoding="utf-8"), path)
+
+            def chunked():
+                return count_lines(lambda p: ManFile(p, "utf-8"), path)
+
+            assert text_mode() == chunked()
+            before = min(timeit.repeat(text_mode, number=1, repeat=repeat))
+            after = min(timeit.repeat(chunked, number=1, repeat=repeat))
+            print("{:<6} text mode {:7.1f} ms, ManFile {:7.1f} ms, "
+                  "{:.2f}x".format(name, before * 1000, after * 1000,
+                                   before / after))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=200000,
+                        help="Page size in lines")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Repeats per measurement, the best is taken")
+    args = parser.parse_args()
+    run(args.lines, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Время запуска утилиты: импорт man2html по данным python -X importtime
+и полный перевод маленькой страницы отдельным процессом. Завершается с
+кодом 1, если импорт не уложился в бюджет или загрузил модули, которые
+должны импортироваться только по необходимости.
+
+    python benchmarks/bench_startup.py [-r REPEAT] [--budget-ms 30]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+SCRIPT = os.path.join(ROOT, "man2html.py")
+
+# модули, которые не должны загружаться при импорте man2html
+LAZY_MODULES = ("dominate", "asyncio", "concurrent.futures", "core.batch",
+                "core.man2html_translator", "core.man_index")
+SAMPLE_PAGE = ".TH BENCH 1\n.SH NAME\nbench \\- startup benchmark\n"
+
+
+def import_time_us():
+    """Суммарное время импорта man2html в микросекундах и список всех
+    загруженных при этом модулей."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import man2html"],
+        cwd=ROOT, stderr=subprocess.PIPE, universal_newlines=True,
+        check=True)
+    total = None
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if not cumulative.strip().isdigit():
+            continue  # заголовок таблицы
+        modules.append(name)
+        if name == "man2html":
+            total = int(cumulative)
+    return total, modules
+
+
+def translate_time(page_path):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, SCRIPT, page_path, "-o", os.devnull],
+                   cwd=ROOT, check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Runs per measurement, the best is taken")
+    parser.add_argument("--budget-ms", type=float, default=30.0,
+                        help="Import time budget of man2html in ms")
+    args = parser.parse_args()
+
+    measurements = [import_time_us() for _ in range(args.repeat)]
+    import_us = min(total for total, _ in measurements)
+    loaded = set(measurements[0][1])
+
+    with tempfile.TemporaryDirectory() as directory:
+        page_path = os.path.join(directory, "bench.1")
+        with open(page_path, "w", encoding="utf-8") as page:
+            page.write(SAMPLE_PAGE)
+        translate_s = min(translate_time(page_path)
+                          for _ in range(args.repeat))
+
+    print("import man2html: {:.1f} ms (budget {:.1f} ms)".format(
+        import_us / 1000, args.budget_ms))
+    print("translate a file: {:.1f} ms".format(translate_s * 1000))
+
+    failed = False
+    eager = [module for module in LAZY_MODULES if module in loaded]
+    if eager:
+        print("imported eagerly: " + ", ".join(eager))
+        failed = True
+    if import_us / 1000 > args.budget_ms:
+        print("import time is over budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Детерминированный генератор синтетических man-страниц разной формы."""
+import random
+
+WORDS = ("file", "directory", "list", "print", "option", "value", "the",
+         "of", "and", "to", "is", "default", "output", "entries", "size",
+         "with", "not", "by", "each", "format", "when", "sort", "time")
+
+SHAPES = ("options", "fonts", "macros", "prose", "mixed")
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _option(rng):
+    name = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz")
+                   for _ in range(rng.randint(3, 10)))
+    return [".TP",
+            ".BR \\-\\-{} \" {}\"".format(name, rng.choice(WORDS)),
+            _sentence(rng),
+            _sentence(rng, 8)]
+
+
+def _fonts(rng):
+    return [rng.choice((".B", ".I", ".BR", ".RB", ".IR", ".RI")) + " " +
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 5)))
+            for _ in range(4)]
+
+
+def _macro_definition(rng, number):
+    body = [".de M{}".format(number)]
+    for _ in range(rng.randint(5, 15)):
+        body.append(rng.choice((".B \\\\$1", ".I \\\\$2", ".BR \\\\$1 (\\\\$2)",
+                                "\\\\$* " + _sentence(rng, 4),
+                                ".\\\" " + _sentence(rng, 3))))
+    body.append("..")
+    return body
+
+
+def _prose(rng):
+    return [_sentence(rng, rng.randint(8, 16)) for _ in range(4)] + [""]
+
+
+def generate_page(shape: str, lines: int, seed: int = 0):
+    """Возвращает список строк страницы формы shape длиной не меньше
+    lines. Одинаковые аргументы дают одинаковую страницу."""
+    if shape not in SHAPES:
+        raise ValueError("unknown shape {}".format(shape))
+    rng = random.Random("{}:{}:{}".format(shape, lines, seed))
+    page = [".TH BENCH 1 \"January 2020\" \"bench 1.0\" \"User Commands\"",
+            ".SH NAME", "bench \\- synthetic page", ".SH DESCRIPTION"]
+    macros = 0
+    while len(page) < lines:
+        kind = shape
+        if shape == "mixed":
+            kind = rng.choice(("options", "fonts", "macros", "prose"))
+        if rng.random() < 0.02:
+            page.append(".SH " + rng.choice(WORDS).upper())
+        if kind == "options":
+            page.extend(_option(rng))
+        elif kind == "fonts":
+            page.extend(_fonts(rng))
+        elif kind == "macros":
+            if macros == 0 or rng.random() < 0.2:
+                page.extend(_macro_definition(rng, macros))
+                macros += 1
+            page.append(".M{} {} {}".format(rng.randrange(macros),
+                                            rng.choice(WORDS),
+                                            rng.choice(WORDS)))
+        else:
+            page.extend(_prose(rng))
+    return [line + "\n" for line in page]
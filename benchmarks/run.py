@@ -0,0 +1,165 @@
+"""Бенчмарк транслятора на синтетическом корпусе: отдельно разбор строк
+(ArgsParser), перевод (Man2HtmlTranslator.process) и рендеринг
+(compile_page), плюс пиковая память полного перевода.
+
+    python benchmarks/run.py [--lines 2000 20000] [-o results.json]
+    python benchmarks/run.py --compare old.json new.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from benchmarks.corpus import SHAPES, generate_page  # noqa: E402
+from core.args_parser import ArgsParser  # noqa: E402
+from core.man2html_translator import Man2HtmlTranslator  # noqa: E402
+
+RESULTS_FORMAT_VERSION = 1
+STAGES = ("tokenize", "translate", "render")
+
+
+def _best_of(repeat, measure):
+    return min(measure() for _ in range(repeat))
+
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def _new_translator():
+    return Man2HtmlTranslator(ArgsParser(), strict_mode=False)
+
+
+def measure_page(lines, repeat):
+    parser = ArgsParser()
+    translator = _new_translator()
+
+    def tokenize():
+        for line in lines:
+            parser.parse_args(line)
+
+    def render():
+        state = translator.process(lines)
+        return _timed(translator.compile_page, state)
+
+    seconds = {
+        "tokenize": _best_of(repeat, lambda: _timed(tokenize)),
+        "translate": _best_of(repeat,
+                              lambda: _timed(translator.process, lines)),
+        "render": _best_of(repeat, render),
+    }
+
+    tracemalloc.start()
+    html = _new_translator().translate(lines)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "lines": len(lines),
+        "output_bytes": len(html.encode("utf-8")),
+        "peak_memory_bytes": peak,
+    }
+    for stage in STAGES:
+        result[stage + "_seconds"] = seconds[stage]
+        result[stage + "_lines_per_second"] = len(lines) / seconds[stage]
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(shapes, sizes, repeat):
+    results = {
+        "version": RESULTS_FORMAT_VERSION,
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "pages": dict(),
+    }
+    for shape in shapes:
+        for size in sizes:
+            key = "{}-{}".format(shape, size)
+            results["pages"][key] = measure_page(generate_page(shape, size),
+                                                 repeat)
+    return results
+
+
+def format_results(results):
+    header = "{:<16}{:>14}{:>14}{:>14}{:>12}".format(
+        "page", "tokenize l/s", "translate l/s", "render l/s", "peak KiB")
+    lines = [header]
+    for key, page in results["pages"].items():
+        lines.append("{:<16}{:>14.0f}{:>14.0f}{:>14.0f}{:>12.0f}".format(
+            key, page["tokenize_lines_per_second"],
+            page["translate_lines_per_second"],
+            page["render_lines_per_second"],
+            page["peak_memory_bytes"] / 1024))
+    return "\n".join(lines)
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def format_comparison(old, new):
+    """Отношения новых показателей к старым: больше 1 - быстрее для
+    скоростей, меньше 1 - экономнее для памяти."""
+    lines = ["{:<16}{:>14}{:>14}{:>14}{:>12}".format(
+        "page", "tokenize", "translate", "render", "peak mem")]
+    for key, page in new["pages"].items():
+        if key not in old["pages"]:
+            continue
+        before = old["pages"][key]
+        ratios = [page[stage + "_lines_per_second"] /
+                  before[stage + "_lines_per_second"] for stage in STAGES]
+        ratios.append(page["peak_memory_bytes"] /
+                      before["peak_memory_bytes"])
+        lines.append("{:<16}{:>13.2f}x{:>13.2f}x{:>13.2f}x{:>11.2f}x".format(
+            key, *ratios))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES,
+                        default=list(SHAPES), help="Page shapes to measure")
+    parser.add_argument("--lines", nargs="+", type=int, default=[2000],
+                        help="Page sizes in lines")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Repeats per measurement, the best is taken")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="Write results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        old, new = [load_results(path) for path in args.compare]
+        print(format_comparison(old, new))
+        return
+
+    results = run(args.shapes, args.lines, args.repeat)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import re
+
+
 class ArgsParser(object):
     def __init__(self):
         self.ESCAPE_CHAR = '\\'
@@ -11,8 +14,36 @@ class ArgsParser(object):
             'c': ""
         }
 
+        self._escape_pattern = re.compile(
+            re.escape(self.ESCAPE_CHAR) + '([' +
+            ''.join(re.escape(char) for char in self.ESCAPED_MEANING) + '])')
+        self._escaped_space = self.ESCAPE_CHAR + ' '
+
     def parse_args(self, line: str):
-        """Парсит строку на аргументы Man pages. Двойные кавычки,
+        """Парсит строку на аргументы Man pages и возвращает их списком.
+        Строки без двойных кавычек и экранированных пробелов, то есть
+        подавляющее большинство строк, разбиваются за один проход
+        str.split и регулярного выражения. Остальные разбираются
+        посимвольно в _parse_args_exact, результат в обоих случаях
+        одинаков."""
+        if self.DOUBLE_QUOTE in line:
+            return list(self._parse_args_exact(line))
+        if self.ESCAPE_CHAR not in line:
+            return line.split()
+        if self._escaped_space in line:
+            return list(self._parse_args_exact(line))
+
+        if line[-1] == self.ESCAPE_CHAR:
+            # обратный слеш в конце строки ничего не экранирует и теряется
+            line = line[:-1]
+        return [self._escape_pattern.sub(self._unescape, arg)
+                for arg in line.split()]
+
+    def _unescape(self, match):
+        return self.ESCAPED_MEANING[match.group(1)]
+
+    def _parse_args_exact(self, line: str):
+        r"""Парсит строку на аргументы Man pages. Двойные кавычки,
         первая из которых должна быть либо первым символом строки,
         либо следовать за пробельным символом, окружают
         текст, который нужно считать одним аргументом. Символ обратного
@@ -0,0 +1,475 @@
+import concurrent.futures
+import functools
+import os
+import pathlib
+import time
+
+from core.args_parser import ArgsParser
+from core.cross_references import CrossReferenceLinker, BATCH_HREF_FORMAT
+from core.html_renderer import make_renderer, format_rules
+from core.man2html_translator import Man2HtmlTranslator
+from core.man_files import open_man_file, strip_compression_suffix, \
+    is_man_directory, read_man_bytes, decompress_man_bytes, iter_lines, \
+    slice_chunks, GZ_SUFFIX
+from core.pipeline import Pipeline
+from core.precompressed import compress_output, gzip_bytes, gzip_path
+from core.reproducible import HashManifest, page_clock, source_date_epoch
+from core.search_index import SearchIndex
+from core.settings import STYLES_ATTRIBUTES, STYLES_SHARED, \
+    DEFAULT_READERS
+from core.stats import TranslationStats
+from core.translation_cache import TranslationCache, DEFAULT_MAX_SIZE
+
+HTML_SUFFIX = '.html'
+# длина очередей между стадиями конвейера
+DEFAULT_QUEUE_SIZE = 64
+STYLESHEET_NAME = 'man2html.css'
+# страницы лежат в каталогах manN прямо под корнем вывода
+STYLESHEET_HREF = '../' + STYLESHEET_NAME
+
+# транслятор и кеш рабочего процесса, создаются один раз в init_worker
+_translator = None
+_cache = None
+# делить ли страницы на оглавление и файлы разделов
+_split = False
+# ставить ли в подвал время SOURCE_DATE_EPOCH или изменения исходника
+# вместо текущего
+_reproducible = False
+_epoch = None
+# сжимать ли результаты в .html.gz рядом с html
+_compress = False
+
+
+def find_man_pages(roots):
+    """Обходит каталоги manN в каждом из корней и возвращает пары
+    (корень, путь страницы относительно корня). Если одна и та же
+    страница есть в нескольких корнях, берётся первая, как это делает
+    man."""
+    seen = set()
+    for root in roots:
+        root = pathlib.Path(root)
+        try:
+            directories = sorted(root.iterdir())
+        except OSError:
+            continue
+        for directory in directories:
+            if not is_man_directory(directory):
+                continue
+            try:
+                pages = sorted(directory.iterdir())
+            except OSError:
+                continue
+            for page in pages:
+                relative = page.relative_to(root)
+                if relative in seen or not page.is_file():
+                    continue
+                seen.add(relative)
+                yield root, relative
+
+
+def output_path_for(relative: pathlib.Path, output_root):
+    """Путь html-файла в зеркальном дереве: man1/ls.1.gz -> man1/ls.1.html"""
+    name = strip_compression_suffix(relative.name)
+    return pathlib.Path(output_root, relative.parent, name + HTML_SUFFIX)
+
+
+def init_worker(strict_mode, cache_dir=None, cache_size=DEFAULT_MAX_SIZE,
+                collect_stats=False, styles=STYLES_ATTRIBUTES, split=False,
+                linker=None, collect_text=False, budget=None,
+                reproducible=False, compress=False):
+    global _translator, _cache, _split, _reproducible, _epoch, _compress
+    _translator = Man2HtmlTranslator(
+        ArgsParser(), strict_mode=strict_mode,
+        stats=TranslationStats() if collect_stats else None,
+        renderer=make_renderer(styles, STYLESHEET_HREF), linker=linker,
+        collect_text=collect_text, budget=budget)
+    if cache_dir is not None:
+        _cache = TranslationCache(cache_dir, cache_size)
+    _split = split
+    _reproducible = reproducible
+    _epoch = source_date_epoch() if reproducible else None
+    _compress = compress
+
+
+def set_page_clock(source):
+    """В воспроизводимом режиме ставит транслятору рабочего процесса
+    часы страницы source."""
+    if _reproducible:
+        _translator.clock = page_clock(source, _epoch)
+
+
+def translate_source(source, encoding):
+    """Переводит страницу source транслятором рабочего процесса и
+    возвращает html. Процесс должен быть инициализирован init_worker."""
+    set_page_clock(source)
+    if _cache is not None:
+        return _cache.translate_file(_translator, source, encoding)
+    return _translator.translate_file(source, encoding)
+
+
+class PageResult(object):
+    """Итог перевода одной страницы в рабочем процессе. cache_hit равен
+    None, если кеш не используется, stats - None, если статистика не
+    собирается. style_rules - css-правила, которые страница добавила в
+    общую таблицу стилей. В конвейере run_batch результат несёт и сам
+    перевод до стадии записи: destination, html, файлы разделов
+    sections и сжатые спутники compressed."""
+    def __init__(self, source: str, error=None, cache_hit=None, stats=None,
+                 style_rules=None):
+        self.source = source
+        self.error = error
+        self.cache_hit = cache_hit
+        self.stats = stats
+        self.style_rules = style_rules
+        self.destination = None
+        self.output_encoding = None
+        self.html = None
+        self.sections = None
+        # текст страницы для поискового индекса: PageText.fields()
+        self.text = None
+        # пары (путь файла, содержимое его .gz или None, если
+        # существующий .gz не изменился)
+        self.compressed = None
+
+
+def collect_worker_state(result: PageResult):
+    """Переносит в result правила общей таблицы стилей и статистику,
+    накопленные транслятором рабочего процесса, и обнуляет их."""
+    renderer = _translator.renderer
+    if renderer is not None and renderer.href is not None and \
+            renderer.rules:
+        result.style_rules = renderer.rules
+        renderer.rules = dict()
+    if _translator.stats is not None:
+        result.stats = _translator.stats.to_dict()
+        _translator.stats = TranslationStats()
+    if _translator.page_text is not None:
+        if result.error is None:
+            result.text = _translator.page_text.fields()
+        _translator.page_text = None
+
+
+def translate_page(task):
+    source, destination, encoding, output_encoding = task
+    result = PageResult(str(source))
+    try:
+        if _split:
+            set_page_clock(source)
+            with open_man_file(source, encoding) as f:
+                html, sections = _translator.translate_sections(
+                    f, sections_directory(destination).name)
+            write_sections(destination, sections, output_encoding)
+        else:
+            hits = _cache.hits if _cache is not None else 0
+            html = translate_source(source, encoding)
+            if _cache is not None:
+                result.cache_hit = _cache.hits > hits
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        with open(str(destination), 'w', encoding=output_encoding) as output:
+            output.write(html)
+    except Exception as e:
+        result.error = format_error(e)
+    collect_worker_state(result)
+    return result
+
+
+def format_error(e: Exception):
+    return "{}: {}".format(type(e).__name__, e)
+
+
+def read_page(task, decompress=True):
+    """Стадия чтения конвейера, выполняется в потоке главного процесса.
+    Возвращает задачу с прочитанными байтами: распакованными или, если
+    decompress ложно, как есть - в таком виде их ждёт кеш. Ошибка
+    чтения сразу превращается в PageResult."""
+    source = task[0]
+    try:
+        data = read_man_bytes(source)
+        if decompress:
+            data = decompress_man_bytes(data, source)
+    except Exception as e:
+        return PageResult(str(source), error=format_error(e))
+    return task, data
+
+
+def translate_pages(items):
+    """Стадия перевода конвейера, выполняется в рабочем процессе над
+    пачкой прочитанных read_page страниц. Ничего не пишет на диск."""
+    return [translate_data(task, data) for task, data in items]
+
+
+def translate_data(task, data: bytes):
+    source, destination, encoding, output_encoding = task
+    result = PageResult(str(source))
+    result.destination = destination
+    result.output_encoding = output_encoding
+    try:
+        set_page_clock(source)
+        if _cache is not None:
+            hits = _cache.hits
+            result.html = _cache.translate(_translator, data, source,
+                                           encoding)
+            result.cache_hit = _cache.hits > hits
+        elif _split:
+            result.html, result.sections = _translator.translate_sections(
+                iter_lines(slice_chunks(data), encoding),
+                sections_directory(destination).name)
+        else:
+            result.html = _translator.translate(
+                iter_lines(slice_chunks(data), encoding))
+        if _compress:
+            result.compressed = compress_page(result)
+    except Exception as e:
+        result.error = format_error(e)
+    collect_worker_state(result)
+    return result
+
+
+def compress_page(result: PageResult):
+    """Сжимает в рабочем процессе страницу и её файлы разделов, пропуская
+    те, у которых уже есть .gz с тем же содержимым."""
+    files = [(result.destination, result.html)]
+    if result.sections is not None:
+        directory = sections_directory(result.destination)
+        files.extend((directory / name, html)
+                     for name, html in result.sections)
+    return [(path, compress_output(path,
+                                   html.encode(result.output_encoding)))
+            for path, html in files]
+
+
+def write_pages(results, report, search_index=None, manifest=None):
+    """Стадия записи конвейера: записывает переведённые страницы,
+    добавляет их текст в search_index и учитывает их в report.
+    Если задан HashManifest manifest, файлы пишутся через него.
+    Вызывается одним потоком для пачки результатов."""
+    for result in results:
+        if result.error is None:
+            try:
+                write_page(result, manifest)
+                if search_index is not None and result.text is not None:
+                    search_index.add(result.source, result.text)
+            except Exception as e:
+                result.error = format_error(e)
+        result.html = result.sections = result.text = None
+        report.add(result)
+        result.compressed = None
+
+
+def write_page(result: PageResult, manifest=None):
+    destination = result.destination
+    if result.sections is not None:
+        write_sections(destination, result.sections, result.output_encoding,
+                       manifest)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    write_output(destination, result.html, result.output_encoding, manifest)
+    if result.compressed is not None:
+        for path, data in result.compressed:
+            write_compressed(path, data, manifest)
+
+
+def write_output(path, text, encoding, manifest=None):
+    """Записывает text в файл path сам или через HashManifest."""
+    if manifest is not None:
+        manifest.write(path, text, encoding)
+        return
+    with open(str(path), 'w', encoding=encoding) as output:
+        output.write(text)
+
+
+def write_compressed(path, data, manifest=None):
+    """Записывает .gz-спутник файла path. data равно None, если спутник
+    уже содержит то же самое и его нужно оставить как есть."""
+    path = gzip_path(path)
+    if manifest is None:
+        if data is not None:
+            with open(str(path), 'wb') as output:
+                output.write(data)
+    elif data is None:
+        manifest.keep(path)
+    else:
+        manifest.write_bytes(path, data)
+
+
+def sections_directory(destination: pathlib.Path):
+    """Каталог файлов разделов страницы: man1/ls.1.html -> man1/ls.1"""
+    return destination.with_name(destination.name[:-len(HTML_SUFFIX)])
+
+
+def write_sections(destination: pathlib.Path, sections, output_encoding,
+                   manifest=None):
+    """Записывает файлы разделов страницы destination и удаляет файлы
+    разделов, оставшиеся от прошлого перевода."""
+    directory = sections_directory(destination)
+    directory.mkdir(parents=True, exist_ok=True)
+    names = set(name for name, _ in sections)
+    for path in directory.glob("*" + HTML_SUFFIX):
+        if path.name not in names:
+            path.unlink()
+    for path in directory.glob("*" + HTML_SUFFIX + GZ_SUFFIX):
+        if path.name[:-len(GZ_SUFFIX)] not in names:
+            path.unlink()
+    for name, html in sections:
+        write_output(directory / name, html, output_encoding, manifest)
+
+
+def write_stylesheet(rules, output_root, manifest=None, compress=False):
+    path = pathlib.Path(output_root, STYLESHEET_NAME)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    text = format_rules(rules) + "\n"
+    write_output(path, text, "utf-8", manifest)
+    if compress:
+        write_compressed(path, gzip_bytes(text.encode("utf-8")), manifest)
+
+
+class BatchReport(object):
+    def __init__(self):
+        self.pages = 0
+        self.failures = []
+        self.elapsed = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.stats = None
+        self.style_rules = dict()
+        # метрики стадий конвейера: StageMetrics по имени стадии
+        self.stages = dict()
+        # файлы, не перезаписанные по манифесту хешей, или None
+        self.unchanged = None
+        # записанные и оставленные как есть .gz-спутники
+        self.compressed = 0
+        self.compressed_unchanged = 0
+
+    def add(self, result: PageResult):
+        self.pages += 1
+        if result.error is not None:
+            self.failures.append((result.source, result.error))
+        if result.cache_hit is True:
+            self.cache_hits += 1
+        elif result.cache_hit is False:
+            self.cache_misses += 1
+        if result.stats is not None and self.stats is not None:
+            self.stats.merge(result.stats)
+        if result.style_rules is not None:
+            self.style_rules.update(result.style_rules)
+        if result.compressed is not None and result.error is None:
+            for _, data in result.compressed:
+                if data is None:
+                    self.compressed_unchanged += 1
+                else:
+                    self.compressed += 1
+
+    @property
+    def pages_per_second(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.pages / self.elapsed
+
+    def format(self):
+        lines = ["Translated {} pages in {:.2f} s ({:.1f} pages/sec), "
+                 "{} failed".format(self.pages, self.elapsed,
+                                    self.pages_per_second,
+                                    len(self.failures))]
+        if self.cache_hits or self.cache_misses:
+            lines.append("Cache: {} hits, {} misses".format(
+                self.cache_hits, self.cache_misses))
+        if self.unchanged is not None:
+            lines.append("Unchanged: {} files".format(self.unchanged))
+        if self.compressed or self.compressed_unchanged:
+            lines.append("Compressed: {} written, {} unchanged".format(
+                self.compressed, self.compressed_unchanged))
+        for metrics in self.stages.values():
+            lines.append("  " + metrics.format(self.elapsed))
+        for source, error in self.failures:
+            lines.append("  {}: {}".format(source, error))
+        return "\n".join(lines)
+
+
+def run_batch(roots, output_root, jobs=None, strict_mode=False,
+              encoding="utf-8", output_encoding="utf-8", chunk_size=16,
+              cache_dir=None, cache_size=DEFAULT_MAX_SIZE,
+              collect_stats=False, styles=STYLES_ATTRIBUTES, split=False,
+              readers=DEFAULT_READERS, queue_size=DEFAULT_QUEUE_SIZE,
+              pages=None, search_index=None, budget=None,
+              reproducible=False, compress=False):
+    """Переводит все страницы из каталогов manN корней roots в дерево
+    output_root с сохранением структуры каталогов. Работа идёт
+    конвейером: readers потоков читают и распаковывают страницы, пул
+    процессов, каждый из которых переиспользует один транслятор,
+    переводит их пачками по chunk_size, поток записи пишет результаты.
+    Стадии связаны очередями длиной queue_size, их метрики попадают в
+    report.stages.
+    Если задан cache_dir, результаты берутся из TranslationCache. Если
+    collect_stats истинно, в report.stats собирается TranslationStats
+    всех рабочих процессов. styles - один из STYLE_MODES; при
+    STYLES_SHARED правила всех страниц записываются в STYLESHEET_NAME в
+    корне output_root, кеш в этом режиме не используется, потому что из
+    готового html правила не восстановить. При split страницы делятся
+    на оглавление и файлы разделов .SH, кеш тоже не используется. Если
+    задан PageSet pages, ссылки на страницы из него становятся
+    гиперссылками внутри дерева output_root. Если задан путь
+    search_index, по тексту страниц, собранному во время перевода,
+    строится поисковый индекс SearchIndex; он заменяет старый файл
+    только после окончания перевода. С кешем индекс не строится, потому
+    что страницы из кеша не разбираются. budget - TranslationBudget
+    для каждой страницы. Если reproducible истинно, в подвал страниц
+    ставится время SOURCE_DATE_EPOCH или изменения исходника, а хеши
+    записанных файлов сохраняются в HASH_MANIFEST_NAME в корне
+    output_root; файлы, не изменившиеся с прошлого запуска, не
+    перезаписываются. Если compress истинно, рядом с каждым файлом
+    пишется его копия .gz, сжатая в рабочих процессах; .gz, который уже
+    содержит то же самое, не сжимается заново."""
+    if styles == STYLES_SHARED and cache_dir is not None:
+        raise ValueError("shared stylesheet can not be used with cache")
+    if split and cache_dir is not None:
+        raise ValueError("split pages can not be used with cache")
+    if search_index is not None and cache_dir is not None:
+        raise ValueError("search index can not be built with cache")
+    manifest = None
+    if reproducible:
+        source_date_epoch()  # неверное значение - ошибка до запуска пула
+        manifest = HashManifest.load(output_root)
+    tasks = [(root / relative, output_path_for(relative, output_root),
+              encoding, output_encoding)
+             for root, relative in find_man_pages(roots)]
+
+    linker = None
+    if pages is not None:
+        linker = CrossReferenceLinker(pages, BATCH_HREF_FORMAT)
+
+    report = BatchReport()
+    if collect_stats:
+        report.stats = TranslationStats()
+    index = None
+    if search_index is not None:
+        index = SearchIndex.create(str(search_index) + ".tmp")
+    started = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=init_worker,
+            initargs=(strict_mode, cache_dir, cache_size,
+                      collect_stats, styles, split, linker,
+                      index is not None, budget,
+                      reproducible, compress)) as executor:
+        pipeline = Pipeline(
+            functools.partial(read_page, decompress=cache_dir is None),
+            translate_pages,
+            functools.partial(write_pages, report=report,
+                              search_index=index, manifest=manifest),
+            executor,
+            is_result=lambda item: isinstance(item, PageResult),
+            readers=readers, queue_size=queue_size, chunk_size=chunk_size)
+        pipeline.run(tasks)
+    report.stages = dict((metrics.name, metrics)
+                         for metrics in pipeline.stages)
+    if styles == STYLES_SHARED:
+        write_stylesheet(report.style_rules, output_root, manifest,
+                         compress)
+    if manifest is not None:
+        manifest.save()
+        report.unchanged = manifest.unchanged
+    if index is not None:
+        index.optimize()
+        index.close()
+        os.replace(index.path, str(search_index))
+    report.elapsed = time.perf_counter() - started
+    return report
@@ -0,0 +1,86 @@
+import time
+
+# Предел вложенности макросов и .if, который действует и без
+# TranslationBudget, как предел стека ввода в groff: без него
+# рекурсивный макрос переводился бы бесконечно.
+DEFAULT_MAX_DEPTH = 1000
+
+
+class BudgetExceeded(Exception):
+    """Перевод страницы превысил один из пределов TranslationBudget.
+    limit - значение превышенного предела."""
+    reason = "budget exceeded"
+
+    def __init__(self, limit):
+        super().__init__("{} (limit {})".format(self.reason, limit))
+        self.limit = limit
+
+
+class TooManyLines(BudgetExceeded):
+    reason = "too many lines"
+
+
+class TooManyNodes(BudgetExceeded):
+    reason = "too many nodes"
+
+
+class TooDeep(BudgetExceeded):
+    reason = "macro or .if nesting too deep"
+
+
+class DeadlineExceeded(BudgetExceeded):
+    reason = "deadline exceeded"
+
+
+class TranslationBudget(object):
+    """Пределы работы над одной страницей, чтобы испорченная или
+    враждебная страница не занимала транслятор надолго:
+    max_lines - строк, включая строки раскрытых макросов;
+    max_nodes - узлов страницы верхнего уровня и в текущем абзаце;
+    max_depth - вложенности макросов и .if, без него действует
+    DEFAULT_MAX_DEPTH;
+    seconds - времени на страницу.
+    None снимает предел. При превышении транслятор бросает подкласс
+    BudgetExceeded, а если truncate истинно - обрывает страницу на
+    этом месте и дописывает в конец абзац с причиной."""
+    def __init__(self, max_lines=None, max_nodes=None, max_depth=None,
+                 seconds=None, truncate=False):
+        self.max_lines = max_lines
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.seconds = seconds
+        self.truncate = truncate
+
+    @property
+    def variant(self):
+        """Отличает в ключах кеша страницы, которые могли быть оборваны
+        по пределам, кроме времени."""
+        return "budget:{}:{}:{}".format(self.max_lines, self.max_nodes,
+                                        self.max_depth)
+
+    def deadline(self):
+        if self.seconds is None:
+            return None
+        return time.monotonic() + self.seconds
+
+    def check(self, state):
+        """Вызывается транслятором перед каждой строкой страницы."""
+        if self.max_lines is not None and state.index > self.max_lines:
+            raise TooManyLines(self.max_lines)
+        if self.max_nodes is not None and state.flushed_nodes + \
+                len(state.nodes) + len(state.paragraph) > self.max_nodes:
+            raise TooManyNodes(self.max_nodes)
+        if state.deadline is not None and time.monotonic() > state.deadline:
+            raise DeadlineExceeded(self.seconds)
+
+    def check_depth(self, depth):
+        check_depth(depth, self.max_depth)
+
+
+def check_depth(depth, max_depth=None):
+    """Бросает TooDeep, если вложенность depth больше max_depth или,
+    если он не задан, DEFAULT_MAX_DEPTH."""
+    if max_depth is None:
+        max_depth = DEFAULT_MAX_DEPTH
+    if depth > max_depth:
+        raise TooDeep(max_depth)
@@ -0,0 +1,283 @@
+import os
+import pathlib
+import sqlite3
+
+from core.args_parser import ArgsParser
+from core.budget import TranslationBudget
+from core.man2html_translator import Man2HtmlTranslator
+from core.man_files import open_man_file, is_man_directory, \
+    MAN_DIRECTORY_PREFIX
+from core.man_index import default_cache_path, split_page_name
+from core.page_text import plain_text
+from core.search_index import search_query
+
+# Версия схемы каталога, хранится в PRAGMA user_version. Каталог другой
+# версии перестраивается заново.
+CATALOG_VERSION = 1
+CATALOG_NAME = "catalog.sqlite"
+# отделяет имена страниц от описания в разделе NAME: ls \- list ...
+DESCRIPTION_SEPARATOR = " - "
+# Пределы разбора начала страницы. Испорченная страница, например с
+# рекурсивным макросом перед NAME, попадает в каталог только с именем и
+# разделом вместо того, чтобы остановить обновление каталога.
+NAME_SECTION_MAX_LINES = 10000
+NAME_SECTION_MAX_DEPTH = 64
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS directories ("
+    "path TEXT PRIMARY KEY, mtime INTEGER)",
+    "CREATE TABLE IF NOT EXISTS files ("
+    "id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, "
+    "directory TEXT NOT NULL, mtime INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS files_directory ON files (directory)",
+    "CREATE TABLE IF NOT EXISTS pages ("
+    "id INTEGER PRIMARY KEY, file INTEGER NOT NULL, "
+    "name TEXT NOT NULL, section TEXT NOT NULL, "
+    "description TEXT NOT NULL, source TEXT NOT NULL, "
+    "date TEXT NOT NULL, alias INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS pages_name ON pages (name, section)",
+    "CREATE INDEX IF NOT EXISTS pages_section ON pages (section, name)",
+    "CREATE INDEX IF NOT EXISTS pages_file ON pages (file)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS keywords USING fts5("
+    "name, description)",
+)
+
+
+def default_catalog_path():
+    return default_cache_path().with_name(CATALOG_NAME)
+
+
+def section_pattern(section: str):
+    """Шаблон GLOB раздела: 3 находит и 3p. В отличие от LIKE, GLOB
+    по префиксу использует индекс."""
+    escaped = "".join("[{}]".format(c) if c in "*?[" else c
+                      for c in str(section))
+    return escaped + "*"
+
+
+def split_name_line(text: str):
+    """Разбирает текст раздела NAME на имена страниц и описание:
+    'gzip, gunzip - compress' -> (['gzip', 'gunzip'], 'compress')."""
+    names, separator, description = text.partition(DESCRIPTION_SEPARATOR)
+    if not separator:
+        return [], text.strip()
+    names = [name.strip() for name in names.split(',')]
+    return [name for name in names if name and ' ' not in name], \
+        description.strip()
+
+
+class PageMetadata(object):
+    """Данные страницы для каталога: имена из имени файла и раздела
+    NAME, раздел, однострочное описание и поля source и date из .TH."""
+    def __init__(self, names, section: str, description="", source="",
+                 date=""):
+        self.names = names
+        self.section = section
+        self.description = description
+        self.source = source
+        self.date = date
+
+
+class CatalogEntry(object):
+    def __init__(self, name: str, section: str, description: str,
+                 source: str, date: str, path: str):
+        self.name = name
+        self.section = section
+        self.description = description
+        self.source = source
+        self.date = date
+        self.path = path
+
+    def format(self):
+        """Строка в формате whatis: ls (1) - list directory contents"""
+        return "{:<20} - {}".format(
+            "{} ({})".format(self.name, self.section), self.description)
+
+
+class Catalog(object):
+    """Каталог страниц для whatis и apropos в базе SQLite: имя, раздел,
+    описание из раздела NAME, source и date из .TH. Страницы разбираются
+    транслятором только до конца раздела NAME, без построения html.
+    update перечитывает только каталоги manN, время изменения которых
+    поменялось, и в них - только изменившиеся файлы."""
+    def __init__(self, path, translator: Man2HtmlTranslator = None,
+                 encoding="utf-8"):
+        self.path = str(path)
+        if translator is None:
+            translator = Man2HtmlTranslator(
+                ArgsParser(), strict_mode=False,
+                budget=TranslationBudget(max_lines=NAME_SECTION_MAX_LINES,
+                                         max_depth=NAME_SECTION_MAX_DEPTH))
+        self.translator = translator
+        self.encoding = encoding
+        pathlib.Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        version = self.connection.execute("PRAGMA user_version") \
+            .fetchone()[0]
+        if version not in (0, CATALOG_VERSION):
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS directories; "
+                "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS pages; "
+                "DROP TABLE IF EXISTS keywords")
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.connection.execute(
+            "PRAGMA user_version = {}".format(CATALOG_VERSION))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def read_metadata(self, path, directory_section: str):
+        """Данные страницы path или None, если это не файл страницы.
+        Страница, которую транслятор не разобрал, попадает в каталог
+        только с именем и разделом из имени файла."""
+        parsed = split_page_name(pathlib.Path(path).name, directory_section)
+        if parsed is None:
+            return None
+        name, section = parsed
+        try:
+            with open_man_file(path, self.encoding) as f:
+                state = self.translator.read_name_section(f)
+        except Exception:
+            return PageMetadata([name], section)
+        names, description = split_name_line(
+            plain_text(" ".join(state.text.body)))
+        if name in names:
+            names.remove(name)
+        names.insert(0, name)
+        return PageMetadata(names, section, description, state.source,
+                            state.date)
+
+    def update(self, roots):
+        """Приводит каталог в соответствие с каталогами manN корней
+        roots. Возвращает число перечитанных файлов."""
+        known = dict(self.connection.execute(
+            "SELECT path, mtime FROM directories"))
+        seen = set()
+        changed = 0
+        for root in roots:
+            try:
+                directories = sorted(pathlib.Path(root).iterdir())
+            except OSError:
+                continue
+            for directory in directories:
+                if not is_man_directory(directory):
+                    continue
+                path = str(directory)
+                seen.add(path)
+                try:
+                    mtime = directory.stat().st_mtime_ns
+                except OSError:
+                    continue
+                if known.get(path) == mtime:
+                    continue
+                changed += self._update_directory(directory)
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO directories VALUES (?, ?)",
+                    (path, mtime))
+        for path in set(known) - seen:
+            self._remove_directory(path)
+        self.connection.commit()
+        return changed
+
+    def _update_directory(self, directory: pathlib.Path):
+        directory_section = directory.name[len(MAN_DIRECTORY_PREFIX):]
+        known = dict((path, (file_id, mtime)) for file_id, path, mtime in
+                     self.connection.execute(
+                         "SELECT id, path, mtime FROM files "
+                         "WHERE directory = ?", (str(directory),)))
+        changed = 0
+        try:
+            entries = list(os.scandir(str(directory)))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                if not entry.is_file():
+                    continue
+                mtime = entry.stat().st_mtime_ns
+            except OSError:
+                continue
+            file_id, known_mtime = known.pop(entry.path, (None, None))
+            if known_mtime == mtime:
+                continue
+            if file_id is not None:
+                self._remove_file(file_id)
+            metadata = self.read_metadata(entry.path, directory_section)
+            if metadata is not None:
+                self._add(entry.path, str(directory), mtime, metadata)
+                changed += 1
+        for file_id, _ in known.values():
+            self._remove_file(file_id)
+        return changed
+
+    def _add(self, path, directory, mtime, metadata: PageMetadata):
+        file_id = self.connection.execute(
+            "INSERT INTO files (path, directory, mtime) VALUES (?, ?, ?)",
+            (path, directory, mtime)).lastrowid
+        # первое имя - из имени файла, остальные - из раздела NAME
+        for alias, name in enumerate(metadata.names):
+            page_id = self.connection.execute(
+                "INSERT INTO pages (file, name, section, description, "
+                "source, date, alias) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (file_id, name, metadata.section, metadata.description,
+                 metadata.source, metadata.date, min(alias, 1))).lastrowid
+            self.connection.execute(
+                "INSERT INTO keywords (rowid, name, description) "
+                "VALUES (?, ?, ?)", (page_id, name, metadata.description))
+
+    def _remove_file(self, file_id):
+        self.connection.execute(
+            "DELETE FROM keywords WHERE rowid IN "
+            "(SELECT id FROM pages WHERE file = ?)", (file_id,))
+        self.connection.execute("DELETE FROM pages WHERE file = ?",
+                                (file_id,))
+        self.connection.execute("DELETE FROM files WHERE id = ?",
+                                (file_id,))
+
+    def _remove_directory(self, directory):
+        for file_id, in list(self.connection.execute(
+                "SELECT id FROM files WHERE directory = ?", (directory,))):
+            self._remove_file(file_id)
+        self.connection.execute("DELETE FROM directories WHERE path = ?",
+                                (directory,))
+
+    def _select(self, where, parameters, section=None, joins=""):
+        """Одна запись на имя и раздел. Одну страницу часто описывают
+        несколько файлов - ссылки и страницы, назвавшие её в разделе NAME;
+        берётся файл с тем же именем, что у страницы, если он есть: у
+        SQLite столбцы вне агрегата берутся из строки с min(alias)."""
+        sql = "SELECT p.name, p.section, p.description, p.source, " \
+              "p.date, f.path, min(p.alias) FROM pages AS p " \
+              "JOIN files AS f ON f.id = p.file" + joins + " WHERE " + where
+        parameters = list(parameters)
+        if section is not None:
+            sql += " AND p.section GLOB ?"
+            parameters.append(section_pattern(section))
+        sql += " GROUP BY p.name, p.section ORDER BY p.name, p.section"
+        return [CatalogEntry(*row[:-1]) for row in
+                self.connection.execute(sql, parameters)]
+
+    def whatis(self, name: str, section=None):
+        """Страницы с именем name."""
+        return self._select("p.name = ?", (name,), section)
+
+    def apropos(self, words, section=None):
+        """Страницы, в имени или описании которых есть все слова words;
+        без слов - все страницы раздела section."""
+        query = search_query(words)
+        if not query:
+            return self._select("1", (), section)
+        return self._select("keywords MATCH ?", (query,), section,
+                            " JOIN keywords ON keywords.rowid = p.id")
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT count(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,99 @@
+import hashlib
+import pathlib
+import re
+
+from core.man_files import strip_compression_suffix
+from core.nodes import Element
+
+# раздел в аргументе, следующем за именем страницы: .BR ls (1),
+REFERENCE_PATTERN = re.compile(r'^\((\w+)\)')
+
+# ссылки между страницами зеркального дерева пакетного перевода:
+# man1/ls.1.html -> ../man5/passwd.5.html
+BATCH_HREF_FORMAT = "../{directory}/{file}.html"
+# адреса страниц core.server
+SERVER_HREF_FORMAT = "/man/{section}/{name}"
+
+
+class PageSet(object):
+    """Множество существующих страниц: (имя, раздел) -> (раздел,
+    каталог manN, имя файла без суффикса сжатия). Строится один раз из
+    индекса страниц, после чего проверка ссылки не обращается к файловой
+    системе. Раздел ссылки сравнивается точно, а если такой страницы
+    нет - по первой цифре, как в ManIndex.find: (3) находит и 3p."""
+    def __init__(self, targets=None):
+        self.targets = targets if targets is not None else dict()
+        self._digest = None
+
+    @classmethod
+    def from_index(cls, index):
+        targets = dict()
+        prefixed = []
+        for name, entries in index.pages.items():
+            for section, path in entries:
+                path = pathlib.Path(path)
+                target = (section, path.parent.name,
+                          strip_compression_suffix(path.name))
+                targets.setdefault((name, section), target)
+                prefixed.append(((name, section[:1]), target))
+        # записи индекса идут в порядке предпочтения разделов
+        for key, target in prefixed:
+            targets.setdefault(key, target)
+        return cls(targets)
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __contains__(self, page):
+        return page in self.targets
+
+    def find(self, name: str, section: str):
+        return self.targets.get((name, section))
+
+    @property
+    def digest(self):
+        """Хеш множества страниц: от него зависит разметка переводов,
+        поэтому он входит в ключ кеша."""
+        if self._digest is None:
+            sha = hashlib.sha256()
+            for key, target in sorted(self.targets.items()):
+                sha.update("\0".join(key + target).encode("utf-8"))
+                sha.update(b"\n")
+            self._digest = sha.hexdigest()
+        return self._digest
+
+
+class CrossReferenceLinker(object):
+    """Превращает ссылки вида .BR ls (1) в гиперссылки, если страница
+    есть в PageSet. href_format получает поля name, section, directory
+    и file найденной страницы."""
+    def __init__(self, pages: PageSet, href_format=BATCH_HREF_FORMAT):
+        self.pages = pages
+        self.href_format = href_format
+
+    @property
+    def variant(self):
+        return "links:" + hashlib.sha256(
+            (self.pages.digest + self.href_format).encode("utf-8")) \
+            .hexdigest()[:16]
+
+    def href(self, name: str, section: str):
+        target = self.pages.find(name, section)
+        if target is None:
+            return None
+        section, directory, file = target
+        return self.href_format.format(name=name, section=section,
+                                       directory=directory, file=file)
+
+    def link(self, args, nodes):
+        """Оборачивает в <a> узлы nodes, построенные из аргументов args
+        чередующего макроса, за которыми следует аргумент с разделом."""
+        for i in range(len(args) - 1):
+            match = REFERENCE_PATTERN.match(args[i + 1])
+            if match is None:
+                continue
+            href = self.href(args[i], match.group(1))
+            if href is not None:
+                nodes[i] = Element('a', nodes[i],
+                                   attributes={"href": href})
+        return nodes
@@ -0,0 +1,206 @@
+import hashlib
+
+from core.nodes import escape, format_attributes, INDENT, INLINE_TAGS
+from core.page_ir import PageIr, TEXT, HEADING, PARAGRAPH, LIST, ITEM_TAG, \
+    ITEM_BODY, FONT, BREAK, ELEMENT, VOID, END
+from core.settings import STYLES_INLINE, STYLES_SHARED
+
+# уровень вложенности содержимого страницы: html > body
+CONTENT_LEVEL = 2
+FOOTER_TIME_FORMAT = "Time: %H:%M:%S %Z, %B %d, %Y"
+
+FONT_TAGS = {'B': 'b', 'I': 'i', 'R': 'span'}
+BLOCK_TAGS = {PARAGRAPH: 'p', LIST: 'dl', ITEM_TAG: 'dt', ITEM_BODY: 'dd'}
+
+
+class HtmlRenderer(object):
+    """Рендерит PageIr в html. Разметка побайтно совпадает с тем, что
+    строит Man2HtmlTranslator.compile_page. Подклассы
+    могут переопределять отдельные методы, чтобы менять оформление без
+    повторного разбора исходника roff."""
+    # отличает результат рендерера в ключах кеша
+    variant = "html"
+
+    def render(self, page: PageIr, time):
+        sb = []
+        self.render_head(page, sb)
+        self.render_content(page.instructions, sb)
+        self.render_footer(page, time, sb)
+        return ''.join(sb)
+
+    def render_head(self, page: PageIr, sb):
+        sb.append('<!DOCTYPE html>\n<html>\n')
+        sb.append(INDENT + '<head>\n')
+        self.render_head_elements(page, sb)
+        sb.append(INDENT + '</head>\n')
+        sb.append(INDENT + '<body>')
+        sb.append(escape("Section: {} ({})".format(page.manual,
+                                                    page.section)))
+        sb.append('<br>')
+        sb.append(escape("Source: {}".format(page.source)))
+        sb.append('<br>')
+        sb.append(escape("Updated: {}".format(page.date)))
+        sb.append('\n' + INDENT * CONTENT_LEVEL + '<hr>')
+
+    def render_head_elements(self, page: PageIr, sb):
+        sb.append(INDENT * 2 + '<title>')
+        sb.append(escape("Man page for {}".format(page.title)))
+        sb.append('</title>\n')
+
+    def render_footer(self, page: PageIr, time, sb):
+        sb.append('\n' + INDENT * CONTENT_LEVEL + '<hr>')
+        sb.append(escape(time.strftime(FOOTER_TIME_FORMAT)))
+        sb.append('\n' + INDENT + '</body>\n</html>')
+
+    def render_content(self, instructions, sb):
+        if len(instructions) == 0:
+            self.open_tag(sb, 'p', (), CONTENT_LEVEL)
+            sb.append('</p>')
+            return
+        # для каждого открытого блока: тег и был ли в нём блочный потомок
+        stack = []
+        for instruction in instructions:
+            code = instruction[0]
+            level = CONTENT_LEVEL + len(stack)
+            if stack:
+                parent = stack[-1]
+            else:
+                parent = None
+                if code == TEXT:
+                    text = instruction[1]
+                    if text[0].isalnum():
+                        sb.append('\n')
+                    sb.append(escape(text))
+                    continue
+                if code != END:
+                    sb.append('\n')
+
+            if code == TEXT:
+                sb.append(escape(instruction[1]))
+            elif code == END:
+                tag, has_blocks = stack.pop()
+                if has_blocks:
+                    sb.append('\n' + INDENT * (level - 1))
+                sb.append('</{}>'.format(tag))
+            elif code == HEADING:
+                self._mark_block(parent)
+                self.open_tag(sb, 'h{}'.format(instruction[1]), (), level)
+                sb.append(escape(instruction[2]))
+                sb.append('</h{}>'.format(instruction[1]))
+            elif code == FONT:
+                tag = FONT_TAGS[instruction[1]]
+                if tag not in INLINE_TAGS:
+                    self._mark_block(parent)
+                self.open_tag(sb, tag, (), level)
+                sb.append(escape(instruction[2]))
+                sb.append('</{}>'.format(tag))
+            elif code == BREAK:
+                sb.append('<br>')
+            elif code == VOID:
+                if instruction[1] not in INLINE_TAGS:
+                    self._mark_block(parent)
+                self.open_tag(sb, instruction[1], instruction[2], level)
+            else:
+                tag, attributes = self.block_tag(instruction)
+                if tag not in INLINE_TAGS:
+                    self._mark_block(parent)
+                self.open_tag(sb, tag, attributes, level)
+                stack.append([tag, False])
+
+    def block_tag(self, instruction):
+        """Тег и атрибуты html для инструкции, открывающей блок."""
+        code = instruction[0]
+        if code == PARAGRAPH:
+            return 'p', (('style', instruction[1]),)
+        if code == ITEM_BODY:
+            return 'dd', (('text-indent', instruction[1]),)
+        if code == ELEMENT:
+            return instruction[1], instruction[2]
+        return BLOCK_TAGS[code], ()
+
+    @staticmethod
+    def _mark_block(parent):
+        if parent is not None:
+            parent[1] = True
+
+    @staticmethod
+    def open_tag(sb, tag, attributes, level):
+        if tag not in INLINE_TAGS:
+            sb.append('\n' + INDENT * level)
+        sb.append('<{}{}>'.format(tag, format_attributes(attributes)))
+
+
+def style_class(declarations: str):
+    """Имя класса для набора css-объявлений. Зависит только от
+    объявлений, поэтому одинаково на всех страницах и годится для общей
+    таблицы стилей."""
+    return "s" + hashlib.sha1(declarations.encode("utf-8")).hexdigest()[:6]
+
+
+def format_rules(rules):
+    return "\n".join(".{}{{{}}}".format(name, declarations)
+                     for name, declarations in sorted(rules.items()))
+
+
+class StylesheetHtmlRenderer(HtmlRenderer):
+    """Вместо атрибутов style у абзацев и text-indent у элементов
+    списков ставит классы, а правила для них выводит один раз: блоком
+    <style> в заголовке страницы или, если задан href, во внешней
+    таблице стилей, на которую страница ссылается. Все правила,
+    встреченные за время жизни рендерера, копятся в rules."""
+    def __init__(self, href=None):
+        self.href = href
+        self.rules = dict()
+        self._page_rules = dict()
+
+    @property
+    def variant(self):
+        if self.href is None:
+            return "stylesheet"
+        return "stylesheet:" + self.href
+
+    def render(self, page: PageIr, time):
+        self._page_rules = dict()
+        content = []
+        self.render_content(page.instructions, content)
+        sb = []
+        self.render_head(page, sb)
+        sb.extend(content)
+        self.render_footer(page, time, sb)
+        return ''.join(sb)
+
+    def render_head_elements(self, page: PageIr, sb):
+        HtmlRenderer.render_head_elements(self, page, sb)
+        if self.href is not None:
+            sb.append(INDENT * 2 + '<link{}>\n'.format(format_attributes(
+                (('rel', 'stylesheet'), ('href', self.href)))))
+        elif self._page_rules:
+            sb.append(INDENT * 2 + '<style>')
+            sb.append(format_rules(self._page_rules))
+            sb.append('</style>\n')
+
+    def block_tag(self, instruction):
+        code = instruction[0]
+        if code == PARAGRAPH:
+            return 'p', (('class', self.intern(instruction[1])),)
+        if code == ITEM_BODY:
+            return 'dd', (('class', self.intern(
+                'text-indent:' + instruction[1])),)
+        return HtmlRenderer.block_tag(self, instruction)
+
+    def intern(self, declarations: str):
+        name = style_class(declarations)
+        self._page_rules[name] = declarations
+        self.rules[name] = declarations
+        return name
+
+
+def make_renderer(styles: str, href=None):
+    """Рендерер для варианта оформления styles из STYLE_MODES. None
+    означает рендеринг узлов страницы с атрибутами style. href -
+    ссылка на общий файл стилей для STYLES_SHARED."""
+    if styles == STYLES_INLINE:
+        return StylesheetHtmlRenderer()
+    if styles == STYLES_SHARED:
+        return StylesheetHtmlRenderer(href)
+    return None
@@ -0,0 +1,50 @@
+from core.man_process_state import ManProcessState
+
+
+class HtmlStreamWriter(object):
+    """Пишет страницу в поток по частям, как только узлы state.nodes
+    становятся окончательными. Последний узел остаётся в памяти, потому
+    что handle_TP может дописать элементы в уже добавленный список dl.
+    Результат побайтно совпадает с Man2HtmlTranslator.compile_page."""
+    def __init__(self, translator, state: ManProcessState, output):
+        self.translator = translator
+        self.state = state
+        self.output = output
+        self.started = False
+        self.written_nodes = 0
+
+    def flush(self, keep=1):
+        """Выводит все узлы, кроме последних keep."""
+        count = len(self.state.nodes) - keep
+        if count <= 0:
+            return
+        if not self.started:
+            self._write_head()
+        self._write_nodes(self.state.nodes[:count])
+        del self.state.nodes[:count]
+        self.written_nodes += count
+        self.state.flushed_nodes += count
+
+    def finish(self):
+        self.state.close_paragraph()
+        if not self.started and len(self.state.nodes) == 0:
+            self._write_head()
+            sb = []
+            self.translator.add_content(sb, self.state)
+            self.output.write(''.join(sb))
+        self.flush(keep=0)
+        sb = []
+        self.translator.add_footer(sb, self.state)
+        self.output.write(''.join(sb))
+
+    def _write_head(self):
+        self.started = True
+        sb = []
+        self.translator.add_hat(sb, self.state)
+        self.output.write(''.join(sb))
+        self.output.flush()
+
+    def _write_nodes(self, nodes):
+        sb = []
+        self.translator.render_nodes(nodes, sb)
+        self.output.write(''.join(sb))
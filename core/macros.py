@@ -0,0 +1,118 @@
+import collections
+import re
+
+# \$1 ... \$9, \$* и \$@; в теле .de обратный слеш обычно удвоен
+ARGUMENT_PATTERN = re.compile(r'\\\\?\$([1-9*@])')
+ALL_ARGUMENTS = -1
+DEFAULT_MACRO_CACHE_SIZE = 256
+
+
+def _compile_token(token: str):
+    """Строка без ссылок на аргументы остаётся строкой, иначе токен
+    превращается в кортеж из строк и номеров аргументов."""
+    if '$' not in token:
+        return token
+    parts = ARGUMENT_PATTERN.split(token)
+    if len(parts) == 1:
+        return token
+    compiled = []
+    for number, part in enumerate(parts):
+        if number % 2 == 0:
+            if part:
+                compiled.append(part)
+        elif part in '*@':
+            compiled.append(ALL_ARGUMENTS)
+        else:
+            compiled.append(int(part) - 1)
+    return tuple(compiled)
+
+
+def _substitute(part, args):
+    if type(part) is str:
+        return part
+    if part == ALL_ARGUMENTS:
+        return ' '.join(args)
+    if part < len(args):
+        return args[part]
+    return ''
+
+
+class ExpandedLine(list):
+    """Строка раскрытого макроса, разбитая на аргументы, с глубиной
+    вложенности макросов, из которых она получена."""
+    __slots__ = ('depth',)
+
+    def __init__(self, args, depth: int):
+        super().__init__(args)
+        self.depth = depth
+
+
+class Macro(object):
+    """Макрос, определённый через .de. Строки тела разбиваются на
+    аргументы один раз при определении, при вызове в них только
+    подставляются аргументы вызова."""
+    def __init__(self, lines):
+        self.lines = tuple(lines)
+
+    @classmethod
+    def compile(cls, lines, args_parser):
+        compiled = []
+        for line in lines:
+            tokens = line if isinstance(line, list) else \
+                args_parser.parse_args(line)
+            tokens = tuple(_compile_token(token) for token in tokens)
+            is_static = all(type(token) is str for token in tokens)
+            compiled.append((is_static, tokens))
+        return cls(compiled)
+
+    def expand(self, args):
+        """Возвращает строки тела, разбитые на аргументы, с подставленными
+        аргументами вызова. Токен, состоящий только из \\$* или \\$@,
+        раскрывается в отдельные аргументы, а токен, оказавшийся пустым
+        из-за недостающих аргументов, отбрасывается."""
+        result = []
+        for is_static, tokens in self.lines:
+            if is_static:
+                result.append(list(tokens))
+                continue
+            expanded = []
+            for token in tokens:
+                if type(token) is str:
+                    expanded.append(token)
+                elif token == (ALL_ARGUMENTS,):
+                    expanded.extend(args)
+                else:
+                    # как в groff, аргумент, раскрывшийся в пустую
+                    # строку, пропадает, а не становится пустым токеном
+                    value = ''.join(_substitute(part, args)
+                                    for part in token)
+                    if value:
+                        expanded.append(value)
+            result.append(expanded)
+        return result
+
+
+class MacroCache(object):
+    """Скомпилированные макросы по тексту тела. Транслятор живёт дольше
+    одной страницы, поэтому одинаковые наборы макросов в преамбулах
+    страниц одного пакетного прогона компилируются один раз."""
+    def __init__(self, max_size=DEFAULT_MACRO_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.macros = collections.OrderedDict()
+
+    def compile(self, lines, args_parser):
+        key = tuple(line if isinstance(line, str) else tuple(line)
+                    for line in lines)
+        macro = self.macros.get(key)
+        if macro is not None:
+            self.macros.move_to_end(key)
+            self.hits += 1
+            return macro
+        self.misses += 1
+        macro = Macro.compile(lines, args_parser)
+        self.macros[key] = macro
+        if len(self.macros) > self.max_size:
+            self.macros.popitem(last=False)
+        return macro
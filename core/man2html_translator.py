@@ -1,15 +1,31 @@
 import datetime
-
-import dominate
-from dominate import document
-from dominate.tags import *
+import logging
+import time
+from types import FunctionType, MappingProxyType
 
 from core.args_parser import ArgsParser
+from core.html_renderer import HtmlRenderer
+from core.html_stream import HtmlStreamWriter
+from core.budget import TranslationBudget, BudgetExceeded, \
+    DeadlineExceeded, check_depth
+from core.macros import MacroCache, ExpandedLine
+from core.man_files import open_man_file, decode_man_bytes
 from core.man_process_state import ManProcessState
+from core.nodes import Element, text_element, bold, italic, roman, \
+    render_children
+from core.page_ir import PageIr
+from core.page_split import SplitHtmlRenderer
+from core.page_text import PageText
 from core.settings import DEFAULT_SETTINGS, TranslationModes
+from core.stats import TranslationStats, TEXT_KEY
 from core.utility import empty, first
 
 dot_like_punctuation = ',.?!;:'
+control_characters = ".'"
+# уровень вложенности содержимого страницы: html > body
+CONTENT_LEVEL = 2
+
+logger = logging.getLogger(__name__)
 
 
 def now():
@@ -39,50 +55,122 @@ def checks_for_word_break(func):
     return result
 
 
+class Command(object):
+    """Команда roff: обработчик, вызываемый как action(translator,
+    state, *args), и закрывает ли команда текущий абзац."""
+    __slots__ = ('action', 'breaks', 'resets')
+
+    def __init__(self, action, breaks: bool, resets: bool = False):
+        self.action = action
+        self.breaks = breaks
+        self.resets = resets
+
+
 # noinspection PyMethodMayBeStatic
 class Man2HtmlTranslator(object):
-    def __init__(self, args_parser: ArgsParser, strict_mode=True):
+    """Транслятор страниц man в html. Все данные страницы хранятся в
+    ManProcessState, таблица команд commands неизменяема и общая для
+    всех экземпляров, время в подвале берётся из clock. Поэтому один
+    экземпляр можно переиспользовать для любого числа страниц, а
+    создание нового почти ничего не стоит. Одновременно из нескольких
+    потоков экземпляр использовать нельзя: stats, кеш макросов и
+    рендерер меняются при переводе. Для потоков есть
+    core.translator_pool.TranslatorPool."""
+    def __init_subclass__(cls, **kwargs):
+        """Таблица commands хранит функции, а не имена, поэтому для
+        подкласса, переопределившего обработчики handle_*, она
+        пересобирается с его обработчиками один раз при создании
+        класса - разбор команд остаётся без поиска атрибутов."""
+        super().__init_subclass__(**kwargs)
+        names = dict()
+        for parent in reversed(cls.__mro__[1:]):
+            for name, value in vars(parent).items():
+                if isinstance(value, FunctionType):
+                    names[value] = name
+        commands = dict()
+        for key, command in cls.commands.items():
+            action = command.action
+            if action in names:
+                action = getattr(cls, names[action])
+            commands[key] = command if action is command.action else \
+                Command(action, command.breaks, command.resets)
+        cls.commands = MappingProxyType(commands)
+
+    def __init__(self, args_parser: ArgsParser, strict_mode=True,
+                 stats: TranslationStats = None,
+                 renderer: HtmlRenderer = None, linker=None,
+                 collect_text=False, clock=None,
+                 budget: TranslationBudget = None):
         self.args_parser = args_parser
-        self.commands = dict()
+        self.macro_cache = MacroCache()
+        # сбор статистики включается передачей объекта TranslationStats
+        self.stats = stats
+        # если рендерер задан, страница рендерится им из PageIr, а не
+        # напрямую из узлов
+        self.renderer = renderer
+        # CrossReferenceLinker, если ссылки на другие страницы нужно
+        # превращать в гиперссылки
+        self.linker = linker
+        # если collect_text истинно, текст каждой страницы для
+        # поискового индекса собирается в PageText и остаётся в
+        # page_text до следующей страницы
+        self.collect_text = collect_text
+        self.page_text = None
 
         self.strict_mode = strict_mode
-
-        self.apply_default_setting()
+        # функция без аргументов, возвращающая время для подвала
+        # страницы; по умолчанию - now этого модуля. Если у неё есть
+        # атрибут variant, он входит в output_variant
+        self.clock = clock
+        # пределы работы над страницей, None - без пределов
+        self.budget = budget
+        # ложно, если последняя страница оборвана по времени: такой
+        # результат зависит от нагрузки и не должен попадать в кеш
+        self.cacheable = True
+
+    def current_time(self):
+        if self.clock is not None:
+            return self.clock()
+        return now()
 
     def compile_page(self, state: ManProcessState):
         state.close_paragraph()
-        doc = dominate.document()
-        self.add_hat(doc, state)
-        self.add_content(doc, state)
-        self.add_footer(doc, state)
-
-        return doc.render()
-
-    def add_hat(self, doc: document, state: ManProcessState):
-        doc.set_title("Man page for {}".format(state.title))
-        doc.add("Section: {} ({})".format(state.manual, state.section),
-                br(),
-                "Source: {}".format(state.source),
-                br(),
-                "Updated: {}".format(state.date),
-                hr())
-
-    def add_content(self, doc: document, state: ManProcessState):
+        sb = []
+        self.add_hat(sb, state)
+        self.add_content(sb, state)
+        self.add_footer(sb, state)
+
+        return ''.join(sb)
+
+    def add_hat(self, sb, state: ManProcessState):
+        HtmlRenderer().render_head(self._page_header(state), sb)
+
+    def add_content(self, sb, state: ManProcessState):
         if len(state.nodes) == 0:
-            doc.add(p())
+            render_children([Element('p')], sb, CONTENT_LEVEL)
             return
-        for node in state.nodes:
+        self.render_nodes(state.nodes, sb)
+
+    def render_nodes(self, nodes, sb):
+        """Дописывает в sb узлы верхнего уровня страницы, каждый с новой
+        строки."""
+        children = []
+        for node in nodes:
             if type(node) is str and not str.isalnum(node[0]):
-                doc.add(node)
+                children.append(node)
                 continue
-            doc.add('\n')
-            doc.add(node)
+            children.append('\n')
+            children.append(node)
+        render_children(children, sb, CONTENT_LEVEL)
+
+    def add_footer(self, sb, state: ManProcessState):
+        HtmlRenderer().render_footer(self._page_header(state),
+                                     self.current_time(), sb)
 
-    # noinspection PyUnusedLocal
-    def add_footer(self, doc: document, state: ManProcessState):
-        doc.add(hr())
-        current_time = now()
-        doc.add(current_time.strftime("Time: %H:%M:%S %Z, %B %d, %Y"))
+    @staticmethod
+    def _page_header(state: ManProcessState):
+        return PageIr(state.title, state.section, state.date, state.source,
+                      state.manual)
 
     def translate(self, lines):
         """Принять строки разметки man и вернуть рузультат преобразования в
@@ -90,11 +178,149 @@ class Man2HtmlTranslator(object):
         if lines is None:
             raise ValueError("lines should not be null")
 
+        state = self.process(lines)
+        if self.renderer is not None:
+            return self.renderer.render(PageIr.from_state(state),
+                                        self.current_time())
+        return self.compile_page(state)
+
+    def translate_file(self, name, encoding="utf-8"):
+        """Перевести файл страницы name, сжатый или нет"""
+        with open_man_file(name, encoding) as f:
+            return self.translate(f)
+
+    def translate_bytes(self, data: bytes, encoding="utf-8", name=""):
+        """Перевести содержимое файла страницы, прочитанное как есть.
+        Сжатие определяется по сигнатуре, а если её нет - по суффиксу
+        имени name"""
+        return self.translate(decode_man_bytes(data, name, encoding))
+
+    @property
+    def output_variant(self):
+        """Вариант разметки результата, отличает записи кеша переводов."""
+        if self.renderer is None:
+            variant = HtmlRenderer.variant
+        else:
+            variant = self.renderer.variant
+        if self.linker is not None:
+            variant += "+" + self.linker.variant
+        if self.budget is not None and self.budget.truncate:
+            variant += "+" + self.budget.variant
+        clock_variant = getattr(self.clock, "variant", None)
+        if clock_variant is not None:
+            variant += "+" + clock_variant
+        # без строгого режима неизвестные команды попадают в текст, а в
+        # строгом перевод падает, поэтому результаты не взаимозаменяемы
+        if not self.strict_mode:
+            variant += "+lenient"
+        return variant
+
+    def process(self, lines):
+        """Разобрать строки разметки man и вернуть состояние с готовыми
+        узлами страницы, не рендеря их"""
+        if lines is None:
+            raise ValueError("lines should not be null")
+
+        state = self.new_state(lines)
+        try:
+            while state.has_more_lines():
+                self.accept_line(state)
+        except BudgetExceeded as e:
+            self.truncate(state, e)
+
+        state.close_paragraph()
+        self._count_page(len(state.nodes))
+        return state
+
+    def new_state(self, lines):
         state = ManProcessState(lines)
-        while state.has_more_lines():
-            self.accept_line(state)
+        self.cacheable = True
+        if self.collect_text:
+            state.text = self.page_text = PageText()
+        if self.budget is not None:
+            state.deadline = self.budget.deadline()
+        return state
+
+    def truncate(self, state: ManProcessState, error: BudgetExceeded):
+        """Обрывает страницу по превышенному пределу или, если бюджет не
+        разрешает обрывать страницы, пробрасывает ошибку дальше."""
+        if self.budget is None or not self.budget.truncate:
+            raise error
+        if isinstance(error, DeadlineExceeded):
+            self.cacheable = False
+        state.close_paragraph()
+        state.nodes.append(text_element('p', "Page truncated: {}".format(
+            error)))
+
+    def compile_ir(self, lines):
+        """Принять строки разметки man и вернуть промежуточное
+        представление страницы, которое можно сохранить и позже
+        отрендерить методом render_ir"""
+        return PageIr.from_state(self.process(lines))
+
+    def translate_sections(self, lines, base: str):
+        """Принять строки разметки man и вернуть html оглавления и
+        список пар (имя файла, html) разделов .SH, которые должны лежать
+        в каталоге base рядом с файлом оглавления base.html"""
+        splitter = SplitHtmlRenderer(self.renderer)
+        return splitter.render(self.compile_ir(lines), self.current_time(),
+                               base)
+
+    def render_ir(self, page: PageIr, renderer: HtmlRenderer = None):
+        if renderer is None:
+            renderer = HtmlRenderer()
+        return renderer.render(page, self.current_time())
+
+    def translate_to_stream(self, lines, output):
+        """Принять строки разметки man и записать результат преобразования
+        в поток output по частям, не дожидаясь конца страницы"""
+        if lines is None:
+            raise ValueError("lines should not be null")
+        if self.renderer is not None:
+            # рендереру нужна вся страница целиком
+            output.write(self.translate(lines))
+            return
 
-        return self.compile_page(state)
+        state = self.new_state(lines)
+        writer = HtmlStreamWriter(self, state, output)
+        try:
+            while state.has_more_lines():
+                self.accept_line(state)
+                writer.flush()
+        except BudgetExceeded as e:
+            self.truncate(state, e)
+        writer.finish()
+        self._count_page(writer.written_nodes)
+
+    def read_name_section(self, lines):
+        """Разобрать только начало страницы: .TH и первый раздел .SH,
+        обычно NAME, - и вернуть состояние с данными .TH, не читая строк
+        после следующего заголовка. Текст раздела собирается в
+        state.text.body"""
+        if lines is None:
+            raise ValueError("lines should not be null")
+
+        state = self.new_state(lines)
+        text = state.text = PageText()
+        start = None
+        try:
+            while state.has_more_lines() and len(text.headings) < 2:
+                self.accept_line(state)
+                if start is None and text.headings:
+                    start = len(text.body)
+        except BudgetExceeded:
+            pass
+        # текст до первого заголовка, а без заголовков - весь текст, не
+        # относится к разделу
+        del text.body[:start]
+        if self.collect_text:
+            self.page_text = None
+        return state
+
+    def _count_page(self, nodes_produced):
+        if self.stats is not None:
+            self.stats.pages += 1
+            self.stats.nodes_produced += nodes_produced
 
     def handle_translation_mode(self, state: ManProcessState, mode: str, *_,
                                 **__):
@@ -117,12 +343,18 @@ class Man2HtmlTranslator(object):
     # noinspection PyPep8Naming
     def handle_SH(self, state: ManProcessState, *args, **__):
         """Заголовок."""
-        state.nodes.append(h2(" ".join(args)))
+        text = " ".join(args)
+        if state.text is not None:
+            state.text.add_heading(text)
+        state.nodes.append(text_element('h2', text))
 
     # noinspection PyPep8Naming
     def handle_SS(self, state: ManProcessState, *args, **__):
         """Подзаголовок."""
-        state.nodes.append(h3(" ".join(args)))
+        text = " ".join(args)
+        if state.text is not None:
+            state.text.add_heading(text)
+        state.nodes.append(text_element('h3', text))
 
     def handle_comment(self, state: ManProcessState, *_, **__):
         """Строка с комментарием."""
@@ -132,44 +364,59 @@ class Man2HtmlTranslator(object):
     @checks_for_word_break
     def handle_B(self, state: ManProcessState, *args, **__):
         """Bold."""
-        state.paragraph.add(b(args))
+        text = ''.join(args)
+        if state.text is not None:
+            state.text.add(text)
+        state.paragraph.add(bold(text))
 
     # noinspection PyPep8Naming
     @checks_for_word_break
     def handle_I(self, state: ManProcessState, *args, **__):
         """Italic."""
-        state.paragraph.add(i(args))
+        text = ''.join(args)
+        if state.text is not None:
+            state.text.add(text)
+        state.paragraph.add(italic(text))
 
     # noinspection PyPep8Naming
     @checks_for_word_break
     def handle_BR(self, state: ManProcessState, *args, **__):
         """Чередование Bold и Roman."""
-        state.paragraph.add(alternate_map(b, span, args))
+        self.alternate(state, bold, roman, args)
 
     # noinspection PyPep8Naming
     @checks_for_word_break
     def handle_RB(self, state: ManProcessState, *args, **__):
         """Чередование Roman и Bold."""
-        state.paragraph.add(alternate_map(span, b, args))
+        self.alternate(state, roman, bold, args)
 
     # noinspection PyPep8Naming
     @checks_for_word_break
     def handle_IR(self, state: ManProcessState, *args, **__):
         """Чередование Italic и Roman."""
-        state.paragraph.add(alternate_map(i, identical, args))
+        self.alternate(state, italic, identical, args)
 
     # noinspection PyPep8Naming
     @checks_for_word_break
     def handle_RI(self, state: ManProcessState, *args, **__):
         """Чередование Roman и Italic"""
-        state.paragraph.add(alternate_map(span, i, args))
+        self.alternate(state, roman, italic, args)
+
+    def alternate(self, state: ManProcessState, first_func, second_func,
+                  args):
+        if state.text is not None:
+            state.text.add(''.join(args))
+        nodes = list(alternate_map(first_func, second_func, args))
+        if self.linker is not None:
+            self.linker.link(args, nodes)
+        state.paragraph.add(nodes)
 
     def handle_page_char(self, state: ManProcessState, *args, **kwargs):
         pass  # todo actually handle it
 
     def handle_br(self, state: ManProcessState, *_, **__):
         """Перенос строки."""
-        state.nodes.append(br())
+        state.nodes.append(Element('br'))
 
     def handle_de(self, state: ManProcessState, *args, **__):
         """Определение макроса"""
@@ -178,19 +425,20 @@ class Man2HtmlTranslator(object):
         stop = ".."
         if len(args) > 1:
             stop = "." + args[1]
-        stop_index = state.index
-        while str.strip(state.lines[stop_index]) != stop:
-            stop_index += 1
-        macros_lines = state.lines[state.index:stop_index]
-        self.register_macros(args[0], macros_lines)
-
-        state.index = stop_index + 1
+        macros_lines = state.pop_lines_until(stop)
+        self.register_macros(state, args[0], macros_lines)
 
     def handle_if(self, state: ManProcessState, condition, *args,
                   **__):
         """Условный оператор."""
-        if self._calc_condition(state, condition):
+        if not self._calc_condition(state, condition):
+            return
+        state.if_depth += 1
+        try:
+            self.check_depth(state.if_depth)
             self.accept_line(state, *args)
+        finally:
+            state.if_depth -= 1
 
     # noinspection PyPep8Naming
     def handle_PP(self, state: ManProcessState, *_, **__):
@@ -209,29 +457,33 @@ class Man2HtmlTranslator(object):
                 indent = 5
 
         prev_nodes_num = len(state.nodes)
+        if state.text is not None:
+            state.text.begin_option()
         while state.has_more_lines() and empty(state.paragraph):
             self.accept_line(state)
-        tag = dt(list(state.paragraph))
+        if state.text is not None:
+            state.text.end_option()
+        tag = Element('dt', list(state.paragraph))
         state.reset_paragraph()
 
         while state.has_more_lines():
-            cur_args = self.args_parser.parse_args(state.peek_line())
+            cur_args = self.parse_line(state.peek_line())
             arg = first(cur_args)
             if arg is not None and arg in self.commands.keys() and \
                     self.commands[arg].breaks:
                 break
             self.accept_line(state)
-        par = dd(state.paragraph)
+        par = Element('dd', state.paragraph)
         state.reset_paragraph()
 
-        par.attributes["text-indent"] = str(indent) + "en"
+        par.set_attribute("text-indent", str(indent) + "en")
         if prev_nodes_num != 0 and \
-                isinstance(state.nodes[prev_nodes_num - 1], dl):
+                getattr(state.nodes[prev_nodes_num - 1], 'tag', None) == 'dl':
             element = state.nodes[prev_nodes_num - 1]
             element.add(tag)
             element.add(par)
         else:
-            element = dl()
+            element = Element('dl')
             element.add(tag)
             element.add(par)
             state.nodes.insert(prev_nodes_num, element)
@@ -256,43 +508,64 @@ class Man2HtmlTranslator(object):
         """Отступ перед первой строкой параграфа."""
         pass  # todo
 
-    def apply_default_setting(self):
-        self.commands[".\\\""] = Command(self.handle_comment, False)
-        self.commands["'\\\""] = Command(self.handle_translation_mode, False)
-        self.commands[".TH"] = Command(self.handle_TH, False)
-        self.commands[".SH"] = Command(self.handle_SH, True, True)
-        self.commands[".SS"] = Command(self.handle_SS, True)
-        self.commands[".B"] = Command(self.handle_B, False)
-        self.commands[".I"] = Command(self.handle_I, False)
-        self.commands[".BR"] = Command(self.handle_BR, False)
-        self.commands[".RB"] = Command(self.handle_RB, False)
-        self.commands[".RI"] = Command(self.handle_RI, False)
-        self.commands[".IR"] = Command(self.handle_IR, False)
-        self.commands[".pc"] = Command(self.handle_page_char, False)
-        self.commands[".br"] = Command(self.handle_br, True)
-        self.commands[".de"] = Command(self.handle_de, False)
-        self.commands[".if"] = Command(self.handle_if, False)
-        self.commands[".PP"] = Command(self.handle_PP, True, True)
-        self.commands[".TP"] = Command(self.handle_TP, True)
-        self.commands[".PD"] = Command(self.handle_PD, False)
-        self.commands[".SM"] = Command(self.handle_SM, False)
-
-    def register_macros(self, macros_name: str, macros_lines: list):
-        pass  # todo actually register macros
+    def check_depth(self, depth):
+        """Вложенность макросов и .if ограничена и без бюджета."""
+        if self.budget is None:
+            check_depth(depth)
+        else:
+            self.budget.check_depth(depth)
+
+    def register_macros(self, state: ManProcessState, macros_name: str,
+                        macros_lines: list):
+        state.macros[macros_name] = self.macro_cache.compile(
+            macros_lines, self.args_parser)
+
+    def find_macros(self, state: ManProcessState, name: str):
+        if name[0] not in control_characters:
+            return None
+        return state.macros.get(name[1:])
+
+    def parse_line(self, line):
+        """Строки раскрытых макросов уже разбиты на аргументы."""
+        if isinstance(line, list):
+            return line
+        if self.stats is not None:
+            self.stats.lines_tokenized += 1
+        return self.args_parser.parse_args(line)
 
     def accept_line(self, state: ManProcessState, *args):
         if empty(args):
             line = state.pop_line()
-            args = list(self.args_parser.parse_args(line))
+            if self.budget is not None:
+                self.budget.check(state)
+            state.depth = getattr(line, 'depth', 0)
+            args = self.parse_line(line)
 
         if len(args) == 0:
             state.close_paragraph()
             return
 
+        if self.stats is None:
+            self._dispatch(state, args)
+            return
+        started = time.perf_counter()
+        self._dispatch(state, args)
+        name = args[0] if args[0][0] in control_characters else TEXT_KEY
+        self.stats.record_command(name, time.perf_counter() - started)
+
+    def _dispatch(self, state: ManProcessState, args):
         if args[0] not in self.commands.keys():
+            macros = self.find_macros(state, args[0])
+            if macros is not None:
+                depth = state.depth + 1
+                self.check_depth(depth)
+                state.push_lines([ExpandedLine(line, depth)
+                                  for line in macros.expand(args[1:])])
+                return
             if args[0][0] == '.':
-                import sys
-                print(' '.join(args), file=sys.stderr)
+                logger.warning("unknown command: %s", ' '.join(args))
+                if self.stats is not None:
+                    self.stats.record_unknown_command(args[0])
             if args[0][0] == '.' and self.strict_mode:
                 raise NotImplementedError(' '.join(args))
             self.default_handle(state, *args)
@@ -303,11 +576,14 @@ class Man2HtmlTranslator(object):
 
         if man_command.breaks:
             state.close_paragraph()
-        man_command.action(state, *args)
+        man_command.action(self, state, *args)
 
     @checks_for_word_break
     def default_handle(self, state, *args):
-        state.paragraph.add(" ".join(args))
+        text = " ".join(args)
+        if state.text is not None:
+            state.text.add(text)
+        state.paragraph.add(text)
 
     def _calc_condition(self, state: ManProcessState, condition):
         if condition[0] == '!':
@@ -321,9 +597,27 @@ class Man2HtmlTranslator(object):
 
         raise NotImplementedError()  # todo
 
-
-class Command:
-    def __init__(self, action, breaks: bool, resets: bool = False):
-        self.action = action
-        self.breaks = breaks
-        self.resets = resets
+    # таблица команд создаётся один раз при загрузке модуля и общая для
+    # всех трансляторов; подкласс может заменить её своей, а его
+    # обработчики handle_* попадают в неё в __init_subclass__
+    commands = MappingProxyType({
+        ".\\\"": Command(handle_comment, False),
+        "'\\\"": Command(handle_translation_mode, False),
+        ".TH": Command(handle_TH, False),
+        ".SH": Command(handle_SH, True, True),
+        ".SS": Command(handle_SS, True),
+        ".B": Command(handle_B, False),
+        ".I": Command(handle_I, False),
+        ".BR": Command(handle_BR, False),
+        ".RB": Command(handle_RB, False),
+        ".RI": Command(handle_RI, False),
+        ".IR": Command(handle_IR, False),
+        ".pc": Command(handle_page_char, False),
+        ".br": Command(handle_br, True),
+        ".de": Command(handle_de, False),
+        ".if": Command(handle_if, False),
+        ".PP": Command(handle_PP, True, True),
+        ".TP": Command(handle_TP, True),
+        ".PD": Command(handle_PD, False),
+        ".SM": Command(handle_SM, False),
+    })
@@ -0,0 +1,218 @@
+import bz2
+import codecs
+import io
+import itertools
+import lzma
+import mmap
+import pathlib
+import zlib
+
+GZ_SUFFIX = '.gz'
+BZ2_SUFFIX = '.bz2'
+XZ_SUFFIX = '.xz'
+MAN_DIRECTORY_PREFIX = 'man'
+
+# файл читается и декодируется кусками такого размера, а не по строкам
+CHUNK_SIZE = 16 * 1024
+# байтов в начале файла достаточно, чтобы узнать любую сигнатуру
+MAGIC_SIZE = 8
+# кроме перевода строки str.splitlines разбивает строки по этим символам
+EXTRA_LINE_BREAKS = ('\x0b', '\x0c', '\x1c', '\x1d', '\x1e', '\x85',
+                     '\u2028', '\u2029')
+
+
+class Compression(object):
+    """Формат сжатия страниц: суффикс файла, сигнатура в начале файла и
+    фабрика объектов распаковки с интерфейсом zlib, bz2 и lzma:
+    decompress(data), eof и unused_data."""
+    def __init__(self, suffix: str, magic: bytes, decompressor):
+        self.suffix = suffix
+        self.magic = magic
+        self.decompressor = decompressor
+
+
+COMPRESSIONS = []
+
+
+def register_compression(suffix: str, magic: bytes, decompressor):
+    COMPRESSIONS.append(Compression(suffix, magic, decompressor))
+
+
+# wbits для zlib: формат gzip с окном максимального размера
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+register_compression(GZ_SUFFIX, b'\x1f\x8b',
+                     lambda: zlib.decompressobj(GZIP_WBITS))
+register_compression(BZ2_SUFFIX, b'BZh', bz2.BZ2Decompressor)
+register_compression(XZ_SUFFIX, b'\xfd7zXZ\x00', lzma.LZMADecompressor)
+
+
+def is_man_directory(path: pathlib.Path):
+    name = path.name
+    return name.startswith(MAN_DIRECTORY_PREFIX) and \
+        len(name) > len(MAN_DIRECTORY_PREFIX) and \
+        name[len(MAN_DIRECTORY_PREFIX)].isalnum() and path.is_dir()
+
+
+def strip_compression_suffix(file_name: str):
+    lowered = file_name.lower()
+    for compression in COMPRESSIONS:
+        if lowered.endswith(compression.suffix):
+            return file_name[:-len(compression.suffix)]
+    return file_name
+
+
+def find_compression(name, head: bytes):
+    """Формат сжатия по сигнатуре в начале файла head, а если она не
+    узнана - по суффиксу имени. None для несжатого файла."""
+    for compression in COMPRESSIONS:
+        if head.startswith(compression.magic):
+            return compression
+    suffix = pathlib.Path(str(name)).suffix.lower()
+    for compression in COMPRESSIONS:
+        if suffix == compression.suffix:
+            return compression
+    return None
+
+
+def slice_chunks(data, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def read_chunks(f, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def decompress_chunks(chunks, compression: Compression):
+    """Распаковывает поток кусков. Несколько сжатых потоков подряд, как
+    в склеенных файлах gzip, распаковываются друг за другом."""
+    decompressor = compression.decompressor()
+    received = False
+    for chunk in chunks:
+        received = True
+        while chunk:
+            if decompressor.eof:
+                decompressor = compression.decompressor()
+            yield decompressor.decompress(chunk)
+            chunk = decompressor.unused_data if decompressor.eof else b''
+    if received and not decompressor.eof:
+        raise EOFError("compressed file ended before the end-of-stream "
+                       "marker was reached")
+
+
+def split_lines(text: str):
+    """Делит текст с переводами строк '\\n' на строки с сохранением
+    переводов, как при чтении файла. str.splitlines быстрее, но делит и
+    по другим символам, поэтому используется, только если их нет."""
+    for line_break in EXTRA_LINE_BREAKS:
+        if line_break in text:
+            lines = [line + '\n' for line in text.split('\n')]
+            lines[-1] = lines[-1][:-1]
+            if not lines[-1]:
+                lines.pop()
+            return lines
+    return text.splitlines(True)
+
+
+def decode_chunks(chunks, encoding: str):
+    """Декодирует поток кусков байтов и возвращает списки готовых строк.
+    Переводы строк '\\r\\n' и '\\r' заменяются на '\\n', как в
+    текстовом режиме open."""
+    decoder = io.IncrementalNewlineDecoder(
+        codecs.getincrementaldecoder(encoding)(), translate=True)
+    pending = ''
+    for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        lines = split_lines(text)
+        if lines and lines[-1][-1] != '\n':
+            pending = lines.pop()
+        else:
+            pending = ''
+        yield lines
+    text = pending + decoder.decode(b'', final=True)
+    if text:
+        yield split_lines(text)
+
+
+def iter_lines(chunks, encoding: str):
+    return itertools.chain.from_iterable(decode_chunks(chunks, encoding))
+
+
+class ManFile(object):
+    """Файл страницы, открытый для чтения по строкам. Сжатый файл
+    распаковывается и декодируется большими кусками, несжатый
+    отображается в память. Формат сжатия определяется по сигнатуре, а
+    для нераспознанных файлов - по суффиксу."""
+    def __init__(self, name, encoding: str, chunk_size=CHUNK_SIZE):
+        self.name = name
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self._file = open(str(name), 'rb')
+        self._mapped = None
+        try:
+            self.compression = find_compression(
+                name, self._file.peek(MAGIC_SIZE)[:MAGIC_SIZE])
+        except BaseException:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __iter__(self):
+        return iter_lines(self.chunks(), self.encoding)
+
+    def chunks(self):
+        if self.compression is not None:
+            return decompress_chunks(
+                read_chunks(self._file, self.chunk_size), self.compression)
+        try:
+            self._mapped = mmap.mmap(self._file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # пустой файл, канал или файл, который нельзя отобразить
+            return read_chunks(self._file, self.chunk_size)
+        return slice_chunks(self._mapped, self.chunk_size)
+
+    def close(self):
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+        self._file.close()
+
+
+def open_man_file(name, encoding):
+    return ManFile(name, encoding)
+
+
+def read_man_bytes(name):
+    """Читает файл страницы как есть, без распаковки."""
+    with open(str(name), 'rb') as f:
+        return f.read()
+
+
+def decompress_man_bytes(data: bytes, name):
+    """Распаковывает содержимое файла name, прочитанное read_man_bytes.
+    Несжатые данные возвращаются как есть."""
+    compression = find_compression(name, data[:MAGIC_SIZE])
+    if compression is None:
+        return data
+    return b''.join(decompress_chunks(slice_chunks(data), compression))
+
+
+def decode_man_bytes(data: bytes, name, encoding):
+    """Распаковывает содержимое файла name, прочитанное read_man_bytes,
+    и возвращает поток строк, как при чтении open_man_file."""
+    chunks = slice_chunks(data)
+    compression = find_compression(name, data[:MAGIC_SIZE])
+    if compression is not None:
+        chunks = decompress_chunks(chunks, compression)
+    return iter_lines(chunks, encoding)
@@ -0,0 +1,160 @@
+import json
+import os
+import pathlib
+
+from core.man_files import MAN_DIRECTORY_PREFIX, is_man_directory, \
+    strip_compression_suffix
+
+INDEX_FORMAT_VERSION = 1
+
+# порядок поиска разделов по умолчанию, как в man-db
+SECTION_ORDER = ('1', 'n', 'l', '8', '3', '0', '2', '5', '4', '9', '6', '7')
+
+
+def default_cache_path():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return pathlib.Path(cache_home, "man2html", "index.json")
+
+
+def split_page_name(file_name: str, directory_section: str):
+    """Разбирает имя файла страницы на имя и раздел:
+    printf.3p.gz -> ('printf', '3p'). Раздел должен начинаться
+    с раздела каталога manN, иначе возвращается None."""
+    name, dot, section = strip_compression_suffix(file_name).rpartition('.')
+    if not dot or not name or not section.startswith(directory_section):
+        return None
+    return name, section
+
+
+def _section_rank(section: str):
+    try:
+        return SECTION_ORDER.index(section[0])
+    except ValueError:
+        return len(SECTION_ORDER)
+
+
+def _directory_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ManIndex(object):
+    """Индекс страниц man: имя -> список пар (раздел, путь) в порядке
+    предпочтения. Поиск страницы не обращается к файловой системе.
+    Индекс устаревает, когда меняется время модификации любого корня
+    или каталога manN."""
+    def __init__(self, roots, pages=None, mtimes=None):
+        self.roots = [str(root) for root in roots]
+        self.pages = pages if pages is not None else dict()
+        self.mtimes = mtimes if mtimes is not None else dict()
+
+    @classmethod
+    def build(cls, roots):
+        index = cls(roots)
+        found = dict()
+        for root_number, root in enumerate(index.roots):
+            index.mtimes[root] = _directory_mtime(root)
+            try:
+                directories = sorted(pathlib.Path(root).iterdir())
+            except OSError:
+                continue
+            for directory in directories:
+                if not is_man_directory(directory):
+                    continue
+                index.mtimes[str(directory)] = _directory_mtime(directory)
+                directory_section = \
+                    directory.name[len(MAN_DIRECTORY_PREFIX):]
+                index._scan_directory(directory, directory_section,
+                                      root_number, found)
+
+        for name, entries in found.items():
+            entries.sort()
+            index.pages[name] = [[section, path]
+                                 for _, section, path in entries]
+        return index
+
+    def _scan_directory(self, directory, directory_section, root_number,
+                        found):
+        try:
+            entries = list(os.scandir(str(directory)))
+        except OSError:
+            return
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            parsed = split_page_name(entry.name, directory_section)
+            if parsed is None:
+                continue
+            name, section = parsed
+            key = (_section_rank(section), root_number,
+                   section != directory_section, section)
+            found.setdefault(name, []).append((key, section, entry.path))
+
+    @classmethod
+    def load(cls, roots, cache_path=None):
+        """Загружает индекс из кеша, если он актуален, иначе строит
+        его заново и сохраняет."""
+        if cache_path is None:
+            cache_path = default_cache_path()
+        index = cls._read(roots, cache_path)
+        if index is not None and index.is_fresh():
+            return index
+        index = cls.build(roots)
+        index.save(cache_path)
+        return index
+
+    @classmethod
+    def _read(cls, roots, cache_path):
+        try:
+            with open(str(cache_path), 'r', encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_FORMAT_VERSION or \
+                data.get("roots") != [str(root) for root in roots]:
+            return None
+        return cls(roots, data.get("pages"), data.get("mtimes"))
+
+    def save(self, cache_path):
+        cache_path = pathlib.Path(cache_path)
+        data = {
+            "version": INDEX_FORMAT_VERSION,
+            "roots": self.roots,
+            "mtimes": self.mtimes,
+            "pages": self.pages,
+        }
+        temporary = cache_path.with_name(cache_path.name + ".tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(str(temporary), 'w', encoding="utf-8") as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(str(temporary), str(cache_path))
+        except OSError:
+            pass  # без кеша индекс просто будет построен заново
+
+    def is_fresh(self):
+        for directory, mtime in self.mtimes.items():
+            if _directory_mtime(directory) != mtime:
+                return False
+        return True
+
+    def find(self, name: str, section=None):
+        """Возвращает путь страницы или None. Без раздела возвращается
+        первая страница в порядке SECTION_ORDER. Раздел сначала
+        сравнивается точно, затем как префикс: 3 находит и 3p."""
+        entries = self.pages.get(name)
+        if not entries:
+            return None
+        if section is None:
+            return pathlib.Path(entries[0][1])
+        section = str(section)
+        for entry_section, path in entries:
+            if entry_section == section:
+                return pathlib.Path(path)
+        for entry_section, path in entries:
+            if entry_section.startswith(section):
+                return pathlib.Path(path)
+        return None
@@ -1,14 +1,33 @@
-from dominate.tags import p
+from collections import deque
 
+from core.nodes import Element
 from core.settings import DEFAULT_SETTINGS, TranslationModes
 from core.utility import empty
 
 before_margin_property = "-webkit-margin-before"
 after_margin_property = "-webkit-margin-after"
 
+# стиль абзаца зависит только от межабзацного отступа, поэтому строка
+# собирается один раз для каждого значения
+_paragraph_styles = dict()
+
+
+def paragraph_style(inter_paragraph_indent):
+    indent = str(inter_paragraph_indent)
+    style = _paragraph_styles.get(indent)
+    if style is None:
+        style = _paragraph_styles[indent] = ";".join([
+            before_margin_property + ":" + indent + "em",
+            after_margin_property + ":" + indent + "em",
+        ])
+    return style
+
 
 class ManProcessState(object):
-    def __init__(self, lines):
+    """Состояние перевода одной страницы. Строки читаются из lines
+    лениво, через небольшой буфер просмотра вперёд, поэтому lines может
+    быть любым итератором, например открытым gzip-файлом."""
+    def __init__(self, lines=()):
         self.title = ""
         self.section = ""
         self.date = ""
@@ -16,22 +35,64 @@ class ManProcessState(object):
         self.manual = ""
         self.translation_mode = TranslationModes.TROFF
         self.index = 0
-        self.lines = lines if isinstance(lines, list) else list(lines)
+        self._lines = iter(lines)
+        self._lookahead = deque()
         self.nodes = list()
+        # PageText, если текст страницы собирается для поискового индекса
+        self.text = None
+        # для пределов TranslationBudget: время, к которому страница
+        # должна быть переведена, число узлов, уже выведенных в поток,
+        # вложенность макроса текущей строки и вложенность .if
+        self.deadline = None
+        self.flushed_nodes = 0
+        self.depth = 0
+        self.if_depth = 0
         self.inter_paragraph_indent = DEFAULT_SETTINGS[
             self.translation_mode].inter_paragraph_indent
         self.reset_paragraph()
         self.registers = dict()
+        self.macros = dict()
+
+    def _fill_lookahead(self, count):
+        while len(self._lookahead) < count:
+            try:
+                self._lookahead.append(next(self._lines))
+            except StopIteration:
+                return False
+        return True
 
     def has_more_lines(self):
-        return self.index < len(self.lines)
+        return self._fill_lookahead(1)
 
     def pop_line(self):
+        if not self._fill_lookahead(1):
+            raise IndexError("no more lines")
         self.index += 1
-        return self.lines[self.index - 1]
+        return self._lookahead.popleft()
+
+    def peek_line(self, offset=0):
+        if not self._fill_lookahead(offset + 1):
+            raise IndexError("no more lines")
+        return self._lookahead[offset]
 
-    def peek_line(self):
-        return self.lines[self.index]
+    def push_lines(self, lines):
+        """Вставляет строки перед следующей строкой страницы. Так
+        раскрывается макрос: его строки уже разбиты на аргументы и
+        приходят списками."""
+        self._lookahead.extendleft(reversed(lines))
+
+    def pop_lines_until(self, stop: str):
+        """Забирает строки до строки-терминатора stop (сам терминатор
+        пропускается) и возвращает их. Если терминатора нет, забирает все
+        оставшиеся строки."""
+        result = []
+        while self.has_more_lines():
+            line = self.pop_line()
+            if isinstance(line, str) and str.strip(line) == stop or \
+                    line == [stop]:
+                break
+            result.append(line)
+        return result
 
     def cur_paragraph_empty(self):
         return empty(self.paragraph)
@@ -44,10 +105,5 @@ class ManProcessState(object):
 
     def reset_paragraph(self):
         # noinspection PyAttributeOutsideInit
-        self.paragraph = p()
-        self.paragraph.attributes["style"] = ";".join([
-            before_margin_property + ":" +
-            str(self.inter_paragraph_indent) + "em",
-            after_margin_property + ":" +
-            str(self.inter_paragraph_indent) + "em",
-        ])
+        self.paragraph = Element('p', attributes={
+            "style": paragraph_style(self.inter_paragraph_indent)})
@@ -0,0 +1,139 @@
+"""Компактные узлы страницы. Заменяют теги dominate в обработчиках
+команд: текст хранится уже экранированным, отрезки текста одним шрифтом
+- одним объектом с двумя слотами. Разметка, которую строят узлы,
+побайтно совпадает с рендерингом тех же тегов через dominate с
+отступами."""
+
+INDENT = '  '
+# элементы, перед которыми не ставится перенос строки с отступом
+INLINE_TAGS = frozenset(('i', 'br', 'wbr'))
+# элементы без содержимого и закрывающего тега
+VOID_TAGS = frozenset(('base', 'link', 'meta', 'hr', 'br', 'wbr', 'img',
+                       'embed', 'param', 'source', 'track', 'area', 'col',
+                       'input', 'keygen', 'command'))
+
+
+def escape(text: str):
+    return text.replace("&", "&amp;").replace("<", "&lt;") \
+        .replace(">", "&gt;").replace('"', "&quot;")
+
+
+def format_attributes(attributes):
+    result = []
+    for attribute, value in sorted(attributes):
+        if value in (False, None):
+            continue
+        result.append(' {}="{}"'.format(attribute, escape(str(value))))
+    return ''.join(result)
+
+
+def render_children(children, sb, level):
+    """Дописывает в sb разметку детей на уровне отступа level и
+    возвращает истину, если среди них не было блочных элементов."""
+    inline = True
+    for child in children:
+        if type(child) is str:
+            sb.append(child)
+            continue
+        if child.tag not in INLINE_TAGS:
+            inline = False
+            sb.append('\n' + INDENT * level)
+        child.render_into(sb, level)
+    return inline
+
+
+class FontRun(object):
+    """Отрезок текста одним шрифтом: <b>, <i> или <span> с
+    экранированным текстом без вложенных элементов."""
+    __slots__ = ('tag', 'text')
+
+    def __init__(self, tag: str, text: str):
+        self.tag = tag
+        self.text = escape(text)
+
+    @property
+    def attributes(self):
+        return {}
+
+    @property
+    def children(self):
+        return [self.text]
+
+    def render_into(self, sb, level):
+        sb.append('<' + self.tag + '>' + self.text + '</' + self.tag + '>')
+
+    def render(self):
+        return '<' + self.tag + '>' + self.text + '</' + self.tag + '>'
+
+
+class Element(object):
+    """Элемент html. Дети - экранированные строки, FontRun и Element.
+    Словарь атрибутов создаётся, только если атрибуты есть."""
+    __slots__ = ('tag', 'attributes', 'children')
+
+    def __init__(self, tag: str, *args, attributes=None):
+        self.tag = tag
+        self.attributes = attributes
+        self.children = []
+        self.add(*args)
+
+    def add(self, *args):
+        """Добавляет детей так же, как dominate: строки экранируются,
+        итерируемые объекты раскрываются."""
+        children = self.children
+        for arg in args:
+            if type(arg) is str:
+                children.append(escape(arg))
+            elif isinstance(arg, (Element, FontRun)):
+                children.append(arg)
+            elif hasattr(arg, '__iter__'):
+                self.add(*arg)
+            else:
+                raise ValueError('%r not a node or string.' % (arg,))
+
+    def set_attribute(self, name: str, value):
+        if self.attributes is None:
+            self.attributes = dict()
+        self.attributes[name] = value
+
+    def __len__(self):
+        return len(self.children)
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def render_into(self, sb, level):
+        tag = self.tag
+        if self.attributes:
+            sb.append('<' + tag + format_attributes(self.attributes.items())
+                      + '>')
+        else:
+            sb.append('<' + tag + '>')
+        if tag in VOID_TAGS:
+            return
+        if not render_children(self.children, sb, level + 1):
+            sb.append('\n' + INDENT * level)
+        sb.append('</' + tag + '>')
+
+    def render(self):
+        sb = []
+        self.render_into(sb, 0)
+        return ''.join(sb)
+
+
+def text_element(tag: str, text: str):
+    element = Element(tag)
+    element.children.append(escape(text))
+    return element
+
+
+def bold(text: str):
+    return FontRun('b', text)
+
+
+def italic(text: str):
+    return FontRun('i', text)
+
+
+def roman(text: str):
+    return FontRun('span', text)
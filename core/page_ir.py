@@ -0,0 +1,115 @@
+import pickle
+
+from core.man_process_state import ManProcessState
+from core.nodes import FontRun, VOID_TAGS
+
+IR_VERSION = 1
+
+# Коды инструкций промежуточного представления страницы. Инструкции
+# идут плоским потоком, блоки открываются своей инструкцией и
+# закрываются END.
+TEXT = 0          # (TEXT, текст)
+HEADING = 1       # (HEADING, уровень, текст)
+PARAGRAPH = 2     # (PARAGRAPH, стиль) ... END
+LIST = 3          # (LIST,) ... END - список тегированных абзацев
+ITEM_TAG = 4      # (ITEM_TAG,) ... END - тег элемента списка
+ITEM_BODY = 5     # (ITEM_BODY, отступ) ... END - тело элемента списка
+FONT = 6          # (FONT, шрифт, текст) - отрезок текста одним шрифтом
+BREAK = 7         # (BREAK,)
+ELEMENT = 8       # (ELEMENT, тег, атрибуты) ... END - прочие элементы
+VOID = 9          # (VOID, тег, атрибуты) - прочие элементы без содержимого
+END = 10
+
+HEADING_TAGS = {'h2': 2, 'h3': 3}
+FONT_TAGS = {'b': 'B', 'i': 'I', 'span': 'R'}
+SIMPLE_BLOCKS = {'dl': LIST, 'dt': ITEM_TAG}
+
+
+def unescape(text: str):
+    """Обратное к nodes.escape: узлы хранят текст уже экранированным, а
+    промежуточное представление - исходный текст."""
+    return text.replace("&quot;", '"').replace("&lt;", "<") \
+        .replace("&gt;", ">").replace("&amp;", "&")
+
+
+class PageIr(object):
+    """Промежуточное представление страницы: данные .TH и плоский поток
+    инструкций содержимого. Не зависит от формата вывода, поэтому
+    может храниться в кеше и рендериться заново без исходника roff."""
+    def __init__(self, title="", section="", date="", source="", manual="",
+                 instructions=None):
+        self.title = title
+        self.section = section
+        self.date = date
+        self.source = source
+        self.manual = manual
+        self.instructions = instructions if instructions is not None \
+            else list()
+
+    @classmethod
+    def from_state(cls, state: ManProcessState):
+        state.close_paragraph()
+        page = cls(state.title, state.section, state.date, state.source,
+                   state.manual)
+        for node in state.nodes:
+            page.add_node(node)
+        return page
+
+    def add_node(self, node, nested=False):
+        out = self.instructions
+        if isinstance(node, str):
+            # соседние отрезки текста внутри блока сливаются в один
+            if nested and out and out[-1][0] == TEXT:
+                out[-1] = (TEXT, out[-1][1] + unescape(node))
+            else:
+                out.append((TEXT, unescape(node)))
+            return
+
+        if type(node) is FontRun:
+            out.append((FONT, FONT_TAGS[node.tag], unescape(node.text)))
+            return
+
+        tag = node.tag
+        attributes = node.attributes or {}
+        children = node.children
+        texts_only = all(isinstance(child, str) for child in children)
+
+        if tag in HEADING_TAGS and not attributes and texts_only:
+            out.append((HEADING, HEADING_TAGS[tag],
+                        unescape(''.join(children))))
+            return
+        if tag in FONT_TAGS and not attributes and texts_only:
+            out.append((FONT, FONT_TAGS[tag], unescape(''.join(children))))
+            return
+        if tag == 'br' and not attributes:
+            out.append((BREAK,))
+            return
+        if tag in VOID_TAGS:
+            out.append((VOID, tag, tuple(sorted(attributes.items()))))
+            return
+
+        if tag == 'p' and list(attributes) == ['style']:
+            out.append((PARAGRAPH, attributes['style']))
+        elif tag == 'dd' and list(attributes) == ['text-indent']:
+            out.append((ITEM_BODY, attributes['text-indent']))
+        elif tag in SIMPLE_BLOCKS and not attributes:
+            out.append((SIMPLE_BLOCKS[tag],))
+        else:
+            out.append((ELEMENT, tag, tuple(sorted(attributes.items()))))
+        for child in children:
+            self.add_node(child, nested=True)
+        out.append((END,))
+
+    def dumps(self):
+        return pickle.dumps(
+            (IR_VERSION, self.title, self.section, self.date, self.source,
+             self.manual, self.instructions),
+            protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def loads(cls, data: bytes):
+        version, title, section, date, source, manual, instructions = \
+            pickle.loads(data)
+        if version != IR_VERSION:
+            raise ValueError("unsupported page IR version {}".format(version))
+        return cls(title, section, date, source, manual, instructions)
@@ -0,0 +1,136 @@
+import re
+
+from core.html_renderer import HtmlRenderer
+from core.page_ir import PageIr, TEXT, HEADING, PARAGRAPH, LIST, ITEM_TAG, \
+    ITEM_BODY, ELEMENT, END
+
+HTML_SUFFIX = '.html'
+NAME_PATTERN = re.compile(r'\W+')
+# блоки, которые открываются инструкцией и закрываются END
+OPENING_CODES = frozenset((PARAGRAPH, LIST, ITEM_TAG, ITEM_BODY, ELEMENT))
+
+
+class Section(object):
+    def __init__(self, title: str, file_name: str, instructions=None):
+        self.title = title
+        self.file_name = file_name
+        self.instructions = instructions if instructions is not None \
+            else list()
+
+    def subsections(self):
+        return [instruction[2] for instruction in self.instructions
+                if instruction[0] == HEADING and instruction[1] == 3]
+
+
+def section_file_name(number: int, title: str):
+    """Имя файла раздела: номер для уникальности и заголовок в нижнем
+    регистре, например 03-see-also.html."""
+    name = NAME_PATTERN.sub('-', title.lower()).strip('-')
+    return "{:02d}-{}{}".format(number, name or "section", HTML_SUFFIX)
+
+
+def split_sections(instructions):
+    """Делит поток инструкций по заголовкам .SH верхнего уровня.
+    Возвращает инструкции до первого заголовка и список Section."""
+    preamble = []
+    sections = []
+    current = preamble
+    depth = 0
+    for instruction in instructions:
+        code = instruction[0]
+        if depth == 0 and code == HEADING and instruction[1] == 2:
+            section = Section(instruction[2], section_file_name(
+                len(sections) + 1, instruction[2]))
+            sections.append(section)
+            current = section.instructions
+        if code in OPENING_CODES:
+            depth += 1
+        elif code == END:
+            depth -= 1
+        current.append(instruction)
+    return preamble, sections
+
+
+def is_relative_href(href: str):
+    return not href.startswith(('/', '#')) and ':' not in href
+
+
+def relocate_links(instructions):
+    """Инструкции раздела для файла на уровень глубже оглавления:
+    относительные ссылки, например на другие страницы, получают
+    префикс ../"""
+    result = []
+    for instruction in instructions:
+        if instruction[0] == ELEMENT and instruction[1] == 'a':
+            instruction = (ELEMENT, 'a', tuple(
+                (name, '../' + value if name == 'href' and
+                 is_relative_href(value) else value)
+                for name, value in instruction[2]))
+        result.append(instruction)
+    return result
+
+
+def _link(href, text):
+    return [(ELEMENT, 'a', (('href', href),)), (TEXT, text), (END,)]
+
+
+class SplitHtmlRenderer(object):
+    """Рендерит страницу как оглавление и отдельные файлы разделов .SH.
+    Оглавление содержит данные .TH, текст до первого раздела и ссылки
+    на разделы, поэтому остаётся маленьким даже для огромных страниц, а
+    разделы загружаются, только когда их открывают. Файлы разделов
+    лежат в каталоге base рядом с оглавлением base.html."""
+    def __init__(self, renderer: HtmlRenderer = None):
+        self.renderer = renderer if renderer is not None \
+            else HtmlRenderer()
+
+    def render(self, page: PageIr, time, base: str):
+        """Возвращает html оглавления и список пар (имя файла раздела,
+        html раздела)."""
+        preamble, sections = split_sections(page.instructions)
+        index = self.renderer.render(
+            self._page(page, preamble + self.contents(sections, base)),
+            time)
+
+        # файлы разделов на уровень глубже оглавления
+        href = getattr(self.renderer, 'href', None)
+        if href is not None:
+            self.renderer.href = '../' + href
+        try:
+            documents = []
+            for section in sections:
+                back = _link('../' + base + HTML_SUFFIX, "{}({})".format(
+                    page.title, page.section))
+                documents.append((section.file_name, self.renderer.render(
+                    self._page(page, back + relocate_links(
+                        section.instructions)), time)))
+        finally:
+            if href is not None:
+                self.renderer.href = href
+        return index, documents
+
+    @staticmethod
+    def contents(sections, base: str):
+        """Инструкции оглавления: список ссылок на разделы с вложенными
+        списками подразделов .SS."""
+        result = [(ELEMENT, 'ul', ())]
+        for section in sections:
+            href = base + '/' + section.file_name
+            result.append((ELEMENT, 'li', ()))
+            result.extend(_link(href, section.title))
+            subsections = section.subsections()
+            if subsections:
+                result.append((ELEMENT, 'ul', ()))
+                for title in subsections:
+                    result.append((ELEMENT, 'li', ()))
+                    result.extend(_link(href, title))
+                    result.append((END,))
+                result.append((END,))
+            result.append((END,))
+        result.append((END,))
+        return result
+
+    @staticmethod
+    def _page(page: PageIr, instructions):
+        return PageIr(page.title, page.section, page.date, page.source,
+                      page.manual, instructions)
@@ -0,0 +1,39 @@
+import re
+
+# переключения шрифта и невидимые символы roff, которые транслятор
+# оставляет в тексте: \fB, \f(CW, \f[I], \&, \, и подобные
+ROFF_ESCAPE_PATTERN = re.compile(r'\\(f(\(..|\[[^\]]*\]|.)|[,/&|^])')
+
+
+class PageText(object):
+    """Текст страницы для поискового индекса, который транслятор
+    собирает во время разбора: заголовки .SH и .SS, теги абзацев .TP
+    (обычно это опции) и остальной текст."""
+    def __init__(self):
+        self.headings = []
+        self.options = []
+        self.body = []
+        self._target = self.body
+
+    def add_heading(self, text: str):
+        self.headings.append(text)
+
+    def add(self, text: str):
+        self._target.append(text)
+
+    def begin_option(self):
+        self._target = self.options
+
+    def end_option(self):
+        self._target = self.body
+
+    def fields(self):
+        """Текст столбцов headings, options и body индекса без
+        управляющих последовательностей roff."""
+        return (plain_text("\n".join(self.headings)),
+                plain_text("\n".join(self.options)),
+                plain_text(" ".join(self.body)))
+
+
+def plain_text(text: str):
+    return ROFF_ESCAPE_PATTERN.sub('', text)
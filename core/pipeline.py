@@ -0,0 +1,221 @@
+import functools
+import queue
+import threading
+import time
+
+# признак конца потока элементов в очередях между стадиями
+_DONE = object()
+
+
+class StageMetrics(object):
+    """Счётчики стадии конвейера: число обработанных элементов, время
+    работы стадии (суммарно по всем её потокам) и глубина входной
+    очереди, замеренная при каждом получении элемента."""
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+
+    def record(self, items, seconds):
+        with self._lock:
+            self.items += items
+            self.seconds += seconds
+
+    def sample_depth(self, depth):
+        with self._lock:
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+    @property
+    def mean_depth(self):
+        if self._depth_samples == 0:
+            return 0.0
+        return self._depth_total / self._depth_samples
+
+    def to_dict(self, elapsed):
+        return {
+            "items": self.items,
+            "seconds": self.seconds,
+            "items_per_second": self.items / elapsed if elapsed > 0 else 0.0,
+            "max_queue_depth": self.max_depth,
+            "mean_queue_depth": self.mean_depth,
+        }
+
+    def format(self, elapsed):
+        return "{:<10}{:>8} items {:>9.1f}/s busy {:>7.2f} s " \
+               "queue max {:>4} mean {:>6.1f}".format(
+                   self.name, self.items,
+                   self.items / elapsed if elapsed > 0 else 0.0,
+                   self.seconds, self.max_depth, self.mean_depth)
+
+
+class Pipeline(object):
+    """Конвейер из трёх стадий, связанных очередями ограниченной длины:
+    потоки чтения вызывают read для каждой задачи, пул executor
+    выполняет translate над пачками прочитанного, поток записи вызывает
+    write для пачек готовых результатов. Пока одни страницы читаются с
+    медленного диска, другие переводятся и записываются.
+
+    read(task) возвращает элемент для translate или готовый результат,
+    если перевод не нужен (например, при ошибке чтения); такой
+    результат отличает предикат is_result. translate(items) выполняется
+    в executor и возвращает список результатов."""
+    def __init__(self, read, translate, write, executor, is_result,
+                 readers=4, queue_size=64, chunk_size=16, window=None):
+        self.read = read
+        self.translate = translate
+        self.write = write
+        self.executor = executor
+        self.is_result = is_result
+        self.readers = readers
+        self.chunk_size = chunk_size
+        # пачек в работе у executor одновременно
+        self.window = window if window is not None else 2 * readers
+        self._read_queue = queue.Queue(queue_size)
+        self._write_queue = queue.Queue(queue_size)
+        self._stop = threading.Event()
+        # пачки, отправленные в executor, результаты которых ещё не
+        # попали в очередь записи
+        self._pending = 0
+        self._pending_changed = threading.Condition()
+        self._errors = []
+        self.stages = [StageMetrics("read"), StageMetrics("translate"),
+                       StageMetrics("write")]
+
+    def run(self, tasks):
+        tasks = iter(tasks)
+        tasks_lock = threading.Lock()
+        readers = [threading.Thread(target=self._read_loop,
+                                    args=(tasks, tasks_lock), daemon=True)
+                   for _ in range(self.readers)]
+        writer = threading.Thread(target=self._write_loop, daemon=True)
+        for thread in readers:
+            thread.start()
+        writer.start()
+        try:
+            self._translate_loop()
+        finally:
+            self._stop.set()
+            # потоки чтения могут ждать места в очереди
+            while any(thread.is_alive() for thread in readers):
+                try:
+                    self._read_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._write_queue.put(_DONE)
+            writer.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def _read_loop(self, tasks, tasks_lock):
+        metrics = self.stages[0]
+        while not self._stop.is_set():
+            with tasks_lock:
+                task = next(tasks, _DONE)
+            if task is _DONE:
+                break
+            started = time.perf_counter()
+            item = self.read(task)
+            metrics.record(1, time.perf_counter() - started)
+            self._read_queue.put(item)
+        self._read_queue.put(_DONE)
+
+    def _translate_loop(self):
+        window = threading.Semaphore(self.window)
+        finished_readers = 0
+        while finished_readers < self.readers and not self._errors:
+            window.acquire()
+            chunk, finished = self._take_chunk()
+            finished_readers += finished
+            if not chunk:
+                window.release()
+                continue
+            future = self.executor.submit(self.translate, chunk)
+            with self._pending_changed:
+                self._pending += 1
+            future.add_done_callback(functools.partial(
+                self._translated, window, len(chunk), time.perf_counter()))
+        # concurrent.futures.wait вернулся бы раньше, чем отработают
+        # колбэки, и конец потока обогнал бы последние результаты
+        with self._pending_changed:
+            self._pending_changed.wait_for(lambda: self._pending == 0)
+
+    def _translated(self, window, count, started, future):
+        """Вызывается executor, когда пачка переведена: отправляет
+        результаты на запись и освобождает место в окне. Пачка перестаёт
+        считаться в работе только после того, как результаты уже в
+        очереди записи."""
+        try:
+            error = future.exception()
+            if error is not None:
+                self._errors.append(error)
+            else:
+                self.stages[1].record(count, time.perf_counter() - started)
+                self._write_queue.put(future.result())
+        finally:
+            window.release()
+            with self._pending_changed:
+                self._pending -= 1
+                self._pending_changed.notify_all()
+
+    def _take_chunk(self):
+        """Забирает из очереди чтения до chunk_size элементов: первый с
+        ожиданием, остальные - только уже готовые. Готовые результаты
+        сразу уходят на запись. Возвращает пачку и число потоков чтения,
+        которые закончили работу."""
+        metrics = self.stages[1]
+        chunk = []
+        finished = 0
+        block = True
+        while len(chunk) < self.chunk_size:
+            metrics.sample_depth(self._read_queue.qsize())
+            try:
+                item = self._read_queue.get(block)
+            except queue.Empty:
+                break
+            block = False
+            if item is _DONE:
+                finished += 1
+                break
+            if self.is_result(item):
+                self._write_queue.put([item])
+            else:
+                chunk.append(item)
+        return chunk, finished
+
+    def _write_loop(self):
+        metrics = self.stages[2]
+        done = failed = False
+        while not done:
+            metrics.sample_depth(self._write_queue.qsize())
+            batch = [self._write_queue.get()]
+            # всё, что уже накопилось, записывается одной пачкой
+            while True:
+                try:
+                    batch.append(self._write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            results = []
+            for results_chunk in batch:
+                if results_chunk is _DONE:
+                    done = True
+                else:
+                    results.extend(results_chunk)
+            # после ошибки записи очередь только вычерпывается до конца,
+            # иначе колбэки executor навсегда встали бы на put
+            if not results or failed:
+                continue
+            started = time.perf_counter()
+            try:
+                self.write(results)
+            except Exception as e:
+                self._errors.append(e)
+                self._stop.set()
+                failed = True
+                continue
+            metrics.record(len(results), time.perf_counter() - started)
@@ -0,0 +1,49 @@
+import struct
+import zlib
+
+from core.man_files import GZ_SUFFIX, GZIP_WBITS
+
+# готовые страницы сжимаются один раз, а отдаются много раз
+COMPRESSION_LEVEL = 9
+# CRC32 и длина несжатых данных в конце файла gzip
+GZIP_TRAILER = struct.Struct('<II')
+
+
+def gzip_path(path):
+    """Путь сжатого спутника файла: man1/ls.1.html -> man1/ls.1.html.gz"""
+    return path.with_name(path.name + GZ_SUFFIX)
+
+
+def gzip_bytes(data: bytes):
+    """data в формате gzip без имени файла и времени в заголовке, так
+    что одинаковые данные всегда сжимаются в одинаковые байты."""
+    compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED,
+                                  GZIP_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def gzip_is_current(path, data: bytes):
+    """Содержит ли уже сжатый файл path ровно data. Сначала сравниваются
+    CRC32 и длина из конца файла, и только если они совпали, файл
+    распаковывается - это всё равно намного дешевле сжатия."""
+    try:
+        with open(str(path), 'rb') as f:
+            existing = f.read()
+    except OSError:
+        return False
+    trailer = GZIP_TRAILER.pack(zlib.crc32(data) & 0xffffffff,
+                                len(data) & 0xffffffff)
+    if not existing.endswith(trailer):
+        return False
+    try:
+        return zlib.decompress(existing, GZIP_WBITS) == data
+    except zlib.error:
+        return False
+
+
+def compress_output(path, data: bytes):
+    """Сжатые data для спутника файла path или None, если спутник уже
+    есть и содержит те же данные."""
+    if gzip_is_current(gzip_path(path), data):
+        return None
+    return gzip_bytes(data)
@@ -0,0 +1,113 @@
+import datetime
+import hashlib
+import os
+import pathlib
+
+# переменная окружения с временем сборки, см.
+# https://reproducible-builds.org/specs/source-date-epoch/
+SOURCE_DATE_EPOCH = "SOURCE_DATE_EPOCH"
+# список sha256 файлов дерева вывода в формате sha256sum
+HASH_MANIFEST_NAME = "SHA256SUMS"
+
+
+def source_date_epoch(environ=None):
+    """Время из SOURCE_DATE_EPOCH в секундах или None, если переменная
+    не задана или пуста."""
+    if environ is None:
+        environ = os.environ
+    value = environ.get(SOURCE_DATE_EPOCH, "")
+    if value == "":
+        return None
+    if not value.isdigit():
+        raise ValueError("{} must be a non-negative integer, got {!r}"
+                         .format(SOURCE_DATE_EPOCH, value))
+    return int(value)
+
+
+class FixedClock(object):
+    """Часы для подвала страницы, всегда показывающие одно время в UTC.
+    С ними один и тот же исходник переводится в одни и те же байты
+    независимо от момента перевода и часового пояса машины."""
+    def __init__(self, timestamp):
+        self.timestamp = int(timestamp)
+
+    def __call__(self):
+        return datetime.datetime.fromtimestamp(self.timestamp,
+                                               datetime.timezone.utc)
+
+    @property
+    def variant(self):
+        """Время входит в разметку, поэтому отличает записи кеша."""
+        return "time:{}".format(self.timestamp)
+
+
+def page_clock(source, epoch=None):
+    """Часы для страницы source: время epoch, если оно задано, иначе
+    время изменения файла."""
+    if epoch is None:
+        epoch = os.stat(str(source)).st_mtime
+    return FixedClock(epoch)
+
+
+class HashManifest(object):
+    """sha256 файлов, записанных в дерево root, в формате sha256sum:
+    по нему синхронизация забирает только изменившиеся файлы. Файл,
+    хеш которого совпадает с записанным в прошлом манифесте, не
+    перезаписывается, так что у него остаётся прежнее время изменения."""
+    def __init__(self, root, previous=None):
+        self.root = pathlib.Path(root)
+        self.path = self.root / HASH_MANIFEST_NAME
+        self.previous = previous if previous is not None else dict()
+        self.hashes = dict()
+        self.unchanged = 0
+
+    @classmethod
+    def load(cls, root):
+        """Манифест дерева root с хешами прошлого запуска, если он
+        есть."""
+        manifest = cls(root)
+        try:
+            with open(str(manifest.path), 'r', encoding="utf-8") as f:
+                for line in f:
+                    digest, _, name = line.rstrip("\n").partition("  ")
+                    if name:
+                        manifest.previous[name] = digest
+        except (OSError, UnicodeDecodeError):
+            pass
+        return manifest
+
+    def name(self, path):
+        return pathlib.Path(path).relative_to(self.root).as_posix()
+
+    def write(self, path, text: str, encoding: str):
+        """Записывает text в файл path дерева и запоминает его хеш."""
+        self.write_bytes(path, text.encode(encoding))
+
+    def write_bytes(self, path, data: bytes):
+        digest = hashlib.sha256(data).hexdigest()
+        name = self.name(path)
+        self.hashes[name] = digest
+        if self.previous.get(name) == digest and os.path.isfile(str(path)):
+            self.unchanged += 1
+            return
+        with open(str(path), 'wb') as output:
+            output.write(data)
+
+    def keep(self, path):
+        """Запоминает хеш файла path, оставленного как есть."""
+        name = self.name(path)
+        digest = self.previous.get(name)
+        if digest is None:
+            with open(str(path), 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        self.hashes[name] = digest
+        self.unchanged += 1
+
+    def save(self):
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(str(temporary), 'w', encoding="utf-8",
+                  newline="\n") as f:
+            for name in sorted(self.hashes):
+                f.write("{}  {}\n".format(self.hashes[name], name))
+        os.replace(str(temporary), str(self.path))
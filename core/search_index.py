@@ -0,0 +1,211 @@
+import os
+import pathlib
+import sqlite3
+
+from core.man_files import strip_compression_suffix
+
+# Версия схемы индекса, хранится в PRAGMA user_version. Индекс другой
+# версии перестраивается заново.
+SEARCH_INDEX_VERSION = 1
+DEFAULT_LIMIT = 20
+# дефис и подчёркивание - часть слова, чтобы искались опции вроде
+# --dereference-command-line
+TOKENIZER = "unicode61 tokenchars '-_'"
+# веса столбцов name, headings, options, body в bm25
+COLUMN_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+SNIPPET_TOKENS = 12
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS documents ("
+    "id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, "
+    "name TEXT NOT NULL, section TEXT NOT NULL)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5("
+    "name, headings, options, body, tokenize=\"{}\")".format(TOKENIZER),
+)
+
+
+class IndexVersionError(Exception):
+    """Индекс построен другой версией и открыт только для чтения, поэтому
+    не может быть перестроен: его нужно построить заново."""
+    def __init__(self, path, version):
+        super().__init__(
+            "search index {} has version {}, expected {}; rebuild the "
+            "index".format(path, version, SEARCH_INDEX_VERSION))
+        self.path = path
+        self.version = version
+
+
+def page_name(path):
+    """Имя и раздел страницы по имени файла: ls.1.gz -> ('ls', '1')"""
+    name, dot, section = strip_compression_suffix(
+        pathlib.Path(str(path)).name).rpartition('.')
+    if not dot:
+        return section, ""
+    return name, section
+
+
+def search_query(words):
+    """Запрос FTS5 из слов пользователя: каждое слово ищется как есть,
+    без синтаксиса запросов, страница должна содержать все слова.
+    Слово со звёздочкой на конце ищется как префикс."""
+    terms = []
+    for word in words:
+        prefix = word.endswith('*')
+        if prefix:
+            word = word[:-1]
+        if not word:
+            continue
+        terms.append('"{}"'.format(word.replace('"', '""')) +
+                     ('*' if prefix else ''))
+    return " ".join(terms)
+
+
+class SearchResult(object):
+    def __init__(self, name: str, section: str, path: str, snippet: str,
+                 rank: float):
+        self.name = name
+        self.section = section
+        self.path = path
+        self.snippet = snippet
+        self.rank = rank
+
+    def format(self):
+        return "{}({})  {}\n    {}".format(self.name, self.section,
+                                          self.path,
+                                          " ".join(self.snippet.split()))
+
+
+class SearchIndex(object):
+    """Полнотекстовый индекс страниц в базе SQLite с таблицей FTS5.
+    Страница заменяется целиком по пути файла, индексы, построенные
+    отдельно, сливаются методом merge. Соединение можно передавать
+    между потоками, но использовать одновременно только из одного.
+    Индекс, открытый с read_only, не создаётся и не меняется, а индекс
+    другой версии вызывает IndexVersionError вместо перестройки."""
+    def __init__(self, path, read_only=False):
+        self.path = str(path)
+        if read_only:
+            self.connection = sqlite3.connect(
+                pathlib.Path(self.path).resolve().as_uri() + "?mode=ro",
+                uri=True, check_same_thread=False)
+        else:
+            self.connection = sqlite3.connect(self.path,
+                                              check_same_thread=False)
+        version = self.connection.execute("PRAGMA user_version") \
+            .fetchone()[0]
+        if read_only:
+            if version != SEARCH_INDEX_VERSION:
+                self.connection.close()
+                raise IndexVersionError(self.path, version)
+            return
+        if version not in (0, SEARCH_INDEX_VERSION):
+            self.connection.executescript(
+                "DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS pages")
+        for statement in SCHEMA:
+            self.connection.execute(statement)
+        self.connection.execute(
+            "PRAGMA user_version = {}".format(SEARCH_INDEX_VERSION))
+
+    @classmethod
+    def create(cls, path):
+        """Новый пустой индекс на месте path. Старый файл удаляется."""
+        try:
+            os.remove(str(path))
+        except FileNotFoundError:
+            pass
+        return cls(path)
+
+    @classmethod
+    def open(cls, path):
+        """Существующий индекс path только для поиска."""
+        return cls(path, read_only=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def add(self, path, fields):
+        """Добавляет или заменяет страницу path. fields - результат
+        PageText.fields()."""
+        path = str(path)
+        name, section = page_name(path)
+        self.remove(path)
+        cursor = self.connection.execute(
+            "INSERT INTO documents (path, name, section) VALUES (?, ?, ?)",
+            (path, name, section))
+        self.connection.execute(
+            "INSERT INTO pages (rowid, name, headings, options, body) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (cursor.lastrowid, name) + tuple(fields))
+
+    def remove(self, path):
+        row = self.connection.execute(
+            "SELECT id FROM documents WHERE path = ?", (str(path),)) \
+            .fetchone()
+        if row is None:
+            return
+        self.connection.execute("DELETE FROM pages WHERE rowid = ?", row)
+        self.connection.execute("DELETE FROM documents WHERE id = ?", row)
+
+    def merge(self, other_path):
+        """Добавляет страницы индекса other_path, заменяя страницы с
+        теми же путями."""
+        self.commit()
+        self.connection.execute("ATTACH DATABASE ? AS other",
+                                (str(other_path),))
+        try:
+            rows = self.connection.execute(
+                "SELECT d.path, p.headings, p.options, p.body "
+                "FROM other.documents AS d "
+                "JOIN other.pages AS p ON p.rowid = d.id")
+            for path, headings, options, body in rows:
+                self.add(path, (headings, options, body))
+            self.commit()
+        finally:
+            self.connection.execute("DETACH DATABASE other")
+
+    def search(self, words, section=None, limit=DEFAULT_LIMIT):
+        """Страницы, содержащие все слова words, от более подходящих к
+        менее подходящим."""
+        query = search_query(words)
+        if not query:
+            return []
+        sql = "SELECT d.name, d.section, d.path, " \
+              "snippet(pages, -1, '[', ']', '...', {}), " \
+              "bm25(pages, {}) AS rank " \
+              "FROM pages JOIN documents AS d ON d.id = pages.rowid " \
+              "WHERE pages MATCH ?".format(
+                  SNIPPET_TOKENS, ", ".join(map(str, COLUMN_WEIGHTS)))
+        parameters = [query]
+        if section is not None:
+            sql += " AND d.section LIKE ?"
+            parameters.append(str(section) + "%")
+        # bm25 в FTS5 насыщается по сумме взвешенных вхождений всех
+        # столбцов, поэтому вес имени не поднимает страницу с таким
+        # именем над длинными страницами, где слово часто встречается
+        names = [word for word in words if not word.endswith('*')]
+        sql += " ORDER BY d.name IN ({}) DESC, rank LIMIT ?".format(
+            ", ".join("?" * len(names)))
+        parameters.extend(names)
+        parameters.append(limit)
+        return [SearchResult(*row) for row in
+                self.connection.execute(sql, parameters)]
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT count(*) FROM documents").fetchone()[0]
+
+    def optimize(self):
+        """Сливает сегменты FTS5 в один, чтобы индекс занимал меньше
+        места и быстрее отвечал."""
+        self.connection.execute("INSERT INTO pages(pages) VALUES('optimize')")
+        self.commit()
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
@@ -0,0 +1,207 @@
+import asyncio
+import collections
+import hashlib
+import re
+import urllib.parse
+
+from core.batch import translate_source
+from core.settings import DEFAULT_PAGE_CACHE_SIZE
+
+PAGE_PATH_PATTERN = re.compile(r'^/man/([^/]+)/([^/]+)/?$')
+MAX_HEADERS = 100
+CONTENT_TYPE = "text/html; charset=utf-8"
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+class Page(object):
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"{}"'.format(hashlib.sha256(body).hexdigest()[:32])
+
+
+class PageLru(object):
+    """Переведённые страницы в памяти. Суммарный размер тел ограничен
+    max_size байт, при переполнении вытесняются давно не запрошенные."""
+    def __init__(self, max_size=DEFAULT_PAGE_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.pages = collections.OrderedDict()
+
+    def get(self, key):
+        page = self.pages.get(key)
+        if page is not None:
+            self.pages.move_to_end(key)
+        return page
+
+    def put(self, key, page: Page):
+        if len(page.body) > self.max_size:
+            return
+        old = self.pages.pop(key, None)
+        if old is not None:
+            self.size -= len(old.body)
+        self.pages[key] = page
+        self.size += len(page.body)
+        while self.size > self.max_size:
+            _, evicted = self.pages.popitem(last=False)
+            self.size -= len(evicted.body)
+
+
+def etag_matches(if_none_match: str, etag: str):
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ManPageServer(object):
+    """HTTP-сервер страниц man на потоках asyncio. Страница
+    /man/<section>/<name> ищется функцией lookup(name, section) и
+    переводится в executor, поэтому цикл событий не блокируется.
+    executor - пул процессов, инициализированных core.batch.init_worker:
+    транслятор рабочего процесса один на модуль и не годится для
+    нескольких потоков, так что пул потоков допустим только из одного
+    потока. Готовые страницы хранятся в PageLru, а повторные запросы с
+    совпадающим If-None-Match получают 304."""
+    def __init__(self, lookup, executor, encoding="utf-8",
+                 cache_size=DEFAULT_PAGE_CACHE_SIZE):
+        self.lookup = lookup
+        self.executor = executor
+        self.encoding = encoding
+        self.pages = PageLru(cache_size)
+        self._pending = dict()
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def get_page(self, section: str, name: str):
+        key = (section, name)
+        page = self.pages.get(key)
+        if page is not None:
+            return page
+        pending = self._pending.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+            # первый запрос отменён, страница переводится заново
+            return await self.get_page(section, name)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            page = await self._translate(section, name)
+        except Exception as e:
+            future.set_exception(e)
+            # исключение получит тот, кто ждёт эту же страницу
+            future.exception()
+            raise
+        else:
+            future.set_result(page)
+        finally:
+            del self._pending[key]
+            # запрос отменён: ждущие этой же страницы не должны зависнуть
+            if not future.done():
+                future.cancel()
+        if page is not None:
+            self.pages.put(key, page)
+        return page
+
+    async def _translate(self, section, name):
+        path = self.lookup(name, section)
+        if path is None:
+            return None
+        html = await asyncio.get_running_loop().run_in_executor(
+            self.executor, translate_source, str(path), self.encoding)
+        return Page(html.encode("utf-8"))
+
+    async def handle(self, reader, writer):
+        try:
+            await self._handle_request(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, reader, writer):
+        request_line = (await reader.readline()).decode("latin-1").split()
+        headers = dict()
+        for _ in range(MAX_HEADERS):
+            line = (await reader.readline()).decode("latin-1")
+            if line in ('\r\n', '\n', ''):
+                break
+            header, _, value = line.partition(':')
+            headers[header.strip().lower()] = value.strip()
+
+        if len(request_line) != 3:
+            await self._respond(writer, 400)
+            return
+        method, target, _ = request_line
+        if method not in ("GET", "HEAD"):
+            await self._respond(writer, 405, extra={"Allow": "GET, HEAD"})
+            return
+
+        path = urllib.parse.unquote(urllib.parse.urlsplit(target).path)
+        match = PAGE_PATH_PATTERN.match(path)
+        if match is None:
+            await self._respond(writer, 404)
+            return
+        section, name = match.groups()
+        try:
+            page = await self.get_page(section, name)
+        except Exception:
+            await self._respond(writer, 500)
+            return
+        if page is None:
+            await self._respond(writer, 404)
+            return
+
+        if etag_matches(headers.get("if-none-match", ""), page.etag):
+            await self._respond(writer, 304, extra={"ETag": page.etag})
+            return
+        body = page.body if method == "GET" else b""
+        await self._respond(writer, 200, body,
+                            extra={"ETag": page.etag,
+                                   "Content-Type": CONTENT_TYPE},
+                            content_length=len(page.body))
+
+    async def _respond(self, writer, status, body=b"", extra=None,
+                       content_length=None):
+        if content_length is None:
+            content_length = len(body)
+        lines = ["HTTP/1.1 {} {}".format(status, REASONS[status]),
+                 "Connection: close"]
+        if status != 304:
+            lines.append("Content-Length: {}".format(content_length))
+        for header, value in (extra or dict()).items():
+            lines.append("{}: {}".format(header, value))
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        writer.write(body)
+        await writer.drain()
+
+
+def serve(lookup, executor, host, port, encoding="utf-8",
+          cache_size=DEFAULT_PAGE_CACHE_SIZE):
+    """Запускает сервер и обслуживает запросы до прерывания."""
+    server = ManPageServer(lookup, executor, encoding, cache_size)
+
+    async def run():
+        listener = await server.start(host, port)
+        async with listener:
+            await listener.serve_forever()
+
+    asyncio.run(run())
@@ -1,5 +1,30 @@
 from enum import Enum, auto
 
+# Версия результата перевода. Увеличивается при любом изменении html,
+# который получается из одной и той же страницы, чтобы сбросить кеши.
+TRANSLATOR_VERSION = "1"
+
+# Пределы размера кешей по умолчанию, в байтах. Объявлены здесь, а не в
+# модулях кешей, чтобы разбор аргументов командной строки не загружал
+# транслятор.
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+DEFAULT_PAGE_CACHE_SIZE = 64 * 1024 * 1024
+
+# Потоков чтения и распаковки в конвейере пакетного перевода.
+DEFAULT_READERS = 4
+
+# Пределы работы над одной страницей в HTTP-сервере по умолчанию:
+# секунд на страницу и вложенность макросов и .if.
+DEFAULT_SERVER_DEADLINE = 10.0
+DEFAULT_SERVER_MAX_DEPTH = 64
+
+# Варианты оформления абзацев: атрибуты style у каждого элемента, классы
+# с блоком <style> в каждой странице или классы с общим файлом стилей.
+STYLES_ATTRIBUTES = 'attributes'
+STYLES_INLINE = 'inline'
+STYLES_SHARED = 'shared'
+STYLE_MODES = (STYLES_ATTRIBUTES, STYLES_INLINE, STYLES_SHARED)
+
 
 class Setting():
     def __init__(self, inter_paragraph_indent):
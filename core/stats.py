@@ -0,0 +1,66 @@
+import json
+
+# ключ статистики для строк текста без команды
+TEXT_KEY = "(text)"
+
+
+class CommandStats(object):
+    def __init__(self, calls=0, seconds=0.0):
+        self.calls = calls
+        self.seconds = seconds
+
+
+class TranslationStats(object):
+    """Счётчики работы транслятора: число вызовов и суммарное время
+    каждой команды, неизвестные команды, число разобранных строк и
+    созданных узлов верхнего уровня. Время команды включает время
+    вложенных в неё строк, например строк абзаца, который забирает
+    handle_TP."""
+    def __init__(self):
+        self.pages = 0
+        self.lines_tokenized = 0
+        self.nodes_produced = 0
+        self.commands = dict()
+        self.unknown_commands = dict()
+
+    def record_command(self, name: str, seconds: float):
+        command = self.commands.get(name)
+        if command is None:
+            command = self.commands[name] = CommandStats()
+        command.calls += 1
+        command.seconds += seconds
+
+    def record_unknown_command(self, name: str):
+        self.unknown_commands[name] = self.unknown_commands.get(name, 0) + 1
+
+    def to_dict(self):
+        commands = sorted(self.commands.items(),
+                          key=lambda item: item[1].seconds, reverse=True)
+        return {
+            "pages": self.pages,
+            "lines_tokenized": self.lines_tokenized,
+            "nodes_produced": self.nodes_produced,
+            "commands": dict((name, {"calls": command.calls,
+                                     "seconds": command.seconds})
+                             for name, command in commands),
+            "unknown_commands": dict(sorted(self.unknown_commands.items())),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def merge(self, data: dict):
+        """Добавляет счётчики, полученные через to_dict, например из
+        рабочего процесса пакетного перевода."""
+        self.pages += data["pages"]
+        self.lines_tokenized += data["lines_tokenized"]
+        self.nodes_produced += data["nodes_produced"]
+        for name, command in data["commands"].items():
+            own = self.commands.get(name)
+            if own is None:
+                own = self.commands[name] = CommandStats()
+            own.calls += command["calls"]
+            own.seconds += command["seconds"]
+        for name, count in data["unknown_commands"].items():
+            self.unknown_commands[name] = \
+                self.unknown_commands.get(name, 0) + count
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import pathlib
+
+from core.man_files import read_man_bytes, decode_man_bytes
+from core.settings import TRANSLATOR_VERSION, DEFAULT_CACHE_SIZE
+
+CACHE_SUFFIX = '.html'
+DEFAULT_MAX_SIZE = DEFAULT_CACHE_SIZE
+# при вытеснении кеш сжимается до этой доли предела, чтобы не
+# перебирать каталог на каждой следующей записи
+EVICTION_TARGET = 0.9
+
+
+class TranslationCache(object):
+    """Кеш результатов перевода на диске. Ключ - хеш исходных байтов
+    страницы, кодировки, версии транслятора и варианта разметки, поэтому
+    при попадании страница не разбирается и не рендерится вовсе.
+    Суммарный размер ограничен max_size байт, первыми вытесняются
+    записи, к которым дольше всего не обращались."""
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = pathlib.Path(directory)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+
+    def key(self, data: bytes, encoding: str, variant: str = "html"):
+        digest = hashlib.sha256()
+        digest.update(TRANSLATOR_VERSION.encode())
+        digest.update(b'\0')
+        digest.update(variant.encode())
+        digest.update(b'\0')
+        digest.update(encoding.encode())
+        digest.update(b'\0')
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str):
+        return self.directory / key[:2] / (key + CACHE_SUFFIX)
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(str(path), 'r', encoding="utf-8") as f:
+                result = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(str(path))  # отметка последнего обращения для LRU
+        except OSError:
+            pass
+        self.hits += 1
+        return result
+
+    def put(self, key: str, html: str):
+        path = self._path(key)
+        temporary = path.with_name(
+            "{}.{}.tmp".format(path.name, os.getpid()))
+        data = html.encode("utf-8")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(str(temporary), 'wb') as f:
+                f.write(data)
+            os.replace(str(temporary), str(path))
+        except OSError:
+            return  # кеш не должен ломать перевод
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += len(data)
+        if self._size > self.max_size:
+            self.evict()
+
+    def translate(self, translator, data: bytes, name, encoding: str):
+        """Переводит содержимое файла name, прочитанное как есть, или
+        берёт готовый результат из кеша. Результат, который транслятор
+        пометил как не подлежащий кешированию, не сохраняется."""
+        key = self.key(data, encoding, translator.output_variant)
+        result = self.get(key)
+        if result is None:
+            result = translator.translate(
+                decode_man_bytes(data, name, encoding))
+            if getattr(translator, "cacheable", True):
+                self.put(key, result)
+        return result
+
+    def translate_file(self, translator, name, encoding: str):
+        return self.translate(translator, read_man_bytes(name), name,
+                              encoding)
+
+    def _entries(self):
+        entries = []
+        for path in self.directory.glob("*/*" + CACHE_SUFFIX):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """Удаляет давно не использованные записи, пока размер кеша
+        не станет меньше EVICTION_TARGET от предела."""
+        entries = self._entries()
+        entries.sort()
+        size = sum(size for _, size, _ in entries)
+        target = self.max_size * EVICTION_TARGET
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
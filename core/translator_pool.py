@@ -0,0 +1,61 @@
+import contextlib
+import threading
+
+from core.args_parser import ArgsParser
+from core.man2html_translator import Man2HtmlTranslator
+
+# сколько свободных трансляторов пул хранит для повторного использования
+DEFAULT_POOL_SIZE = 16
+
+
+def default_translator():
+    return Man2HtmlTranslator(ArgsParser(), strict_mode=False)
+
+
+class TranslatorPool(object):
+    """Пул трансляторов для многопоточных приложений, например WSGI.
+    Каждый поток на время перевода получает транслятор в монопольное
+    пользование, после перевода транслятор возвращается в пул вместе с
+    кешем макросов. Транслятор создаётся функцией factory, только когда
+    все имеющиеся заняты; свободных хранится не больше max_idle."""
+    def __init__(self, factory=default_translator,
+                 max_idle=DEFAULT_POOL_SIZE):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def translator(self):
+        with self._lock:
+            translator = self._idle.pop() if self._idle else None
+        if translator is None:
+            translator = self.factory()
+        try:
+            yield translator
+        finally:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(translator)
+
+    def translate_file(self, name, encoding="utf-8"):
+        with self.translator() as translator:
+            return translator.translate_file(name, encoding)
+
+    def translate_bytes(self, data: bytes, encoding="utf-8", name=""):
+        with self.translator() as translator:
+            return translator.translate_bytes(data, encoding, name)
+
+
+_default_pool = TranslatorPool()
+
+
+def translate_file(name, encoding="utf-8"):
+    """Перевести файл страницы name. Можно вызывать из любых потоков."""
+    return _default_pool.translate_file(name, encoding)
+
+
+def translate_bytes(data: bytes, encoding="utf-8", name=""):
+    """Перевести содержимое файла страницы, прочитанное как есть. Можно
+    вызывать из любых потоков."""
+    return _default_pool.translate_bytes(data, encoding, name)
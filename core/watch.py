@@ -0,0 +1,367 @@
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import pathlib
+import select
+import struct
+import sys
+import time
+
+from core.batch import output_path_for, translate_page
+from core.man_files import is_man_directory
+
+MANIFEST_NAME = '.man2html-manifest.json'
+MANIFEST_FORMAT_VERSION = 1
+
+# события inotify из <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | \
+    IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+EVENTS_BUFFER_SIZE = 64 * 1024
+
+
+def _mtime(path):
+    try:
+        return os.stat(str(path)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _list_man_directories(root):
+    try:
+        directories = sorted(pathlib.Path(root).iterdir())
+    except OSError:
+        return []
+    return [directory.name for directory in directories
+            if is_man_directory(directory)]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(str(path), 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest(object):
+    """Состояние дерева вывода: для каждой страницы (путь относительно
+    корня man) - исходный файл, его размер, время модификации, хеш и
+    путь html-файла, а также время модификации корней и каталогов
+    manN на момент последней синхронизации."""
+    def __init__(self, path, pages=None, mtimes=None):
+        self.path = pathlib.Path(path)
+        self.pages = pages if pages is not None else dict()
+        self.mtimes = mtimes if mtimes is not None else dict()
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(str(path), 'r', encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != MANIFEST_FORMAT_VERSION:
+            return cls(path)
+        return cls(path, data.get("pages"), data.get("mtimes"))
+
+    def save(self):
+        data = {
+            "version": MANIFEST_FORMAT_VERSION,
+            "mtimes": self.mtimes,
+            "pages": self.pages,
+        }
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(str(temporary), 'w', encoding="utf-8") as f:
+            json.dump(data, f, separators=(',', ':'), sort_keys=True)
+        os.replace(str(temporary), str(self.path))
+
+
+class SyncReport(object):
+    def __init__(self):
+        self.translated = 0
+        self.removed = 0
+        self.failures = []
+        self.elapsed = 0.0
+
+    @property
+    def changed(self):
+        return self.translated + self.removed + len(self.failures) > 0
+
+    def format(self):
+        lines = ["Translated {} pages, removed {} in {:.2f} s, "
+                 "{} failed".format(self.translated, self.removed,
+                                    self.elapsed, len(self.failures))]
+        for source, error in self.failures:
+            lines.append("  {}: {}".format(source, error))
+        return "\n".join(lines)
+
+
+class Watcher(object):
+    """Поддерживает дерево html-файлов в соответствии с деревьями man.
+    Каталоги, время модификации которых не изменилось, не перечитываются,
+    а страница переводится заново, только если изменились её размер,
+    время модификации и хеш, поэтому стоимость синхронизации
+    пропорциональна числу изменений. Без уведомлений об изменениях
+    файлов poll проверяет размер и время модификации каждого файла.
+    Страницы переводит executor - пул процессов, инициализированных
+    batch.init_worker, или пул из одного потока, так как транслятор
+    рабочего процесса не годится для нескольких потоков."""
+    def __init__(self, roots, output_root, executor, encoding="utf-8",
+                 output_encoding="utf-8", manifest_path=None):
+        self.roots = [os.path.normpath(str(root)) for root in roots]
+        self.output_root = pathlib.Path(output_root)
+        self.executor = executor
+        self.encoding = encoding
+        self.output_encoding = output_encoding
+        if manifest_path is None:
+            manifest_path = self.output_root / MANIFEST_NAME
+        self.manifest = Manifest.load(manifest_path)
+
+    def directories(self):
+        """Каталоги, изменения в которых нужно отслеживать."""
+        return list(self.manifest.mtimes.keys())
+
+    def sync(self, changed=(), full=False):
+        """Приводит вывод в соответствие с исходниками. changed - каталоги,
+        об изменении которых известно заранее (например, от inotify):
+        правка файла на месте не меняет время модификации каталога. При
+        full проверяются все каталоги."""
+        started = time.perf_counter()
+        report = SyncReport()
+        changed = set(os.path.normpath(str(path)) for path in changed)
+        mtimes = dict(self.manifest.mtimes)
+        dirty = self._dirty_directories(changed, full)
+        tasks = []
+        updated = 0
+        for directory in sorted(dirty):
+            updated += self._sync_directory(directory, tasks, report)
+        results = self.executor.map(translate_page,
+                                    [task for _, task in tasks])
+        for (relative, _), result in zip(tasks, results):
+            if result.error is not None:
+                # запись остаётся, чтобы при удалении исходника удалился
+                # и прежний html, а отметка failed заставляет переводить
+                # страницу заново при каждой синхронизации
+                self.manifest.pages[relative]["failed"] = True
+                report.failures.append((result.source, result.error))
+                continue
+            report.translated += 1
+        if updated or mtimes != self.manifest.mtimes:
+            self.manifest.save()
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def poll(self):
+        """Синхронизация без уведомлений об изменениях: правка файла на
+        месте не меняет время модификации каталога, поэтому
+        проверяются все файлы, но переводятся по-прежнему только
+        изменившиеся."""
+        return self.sync(full=True)
+
+    def _dirty_directories(self, changed, full):
+        """Имена каталогов manN, которые нужно перечитать во всех
+        корнях."""
+        mtimes = self.manifest.mtimes
+        dirty = set()
+        known = set()
+        for relative, page in self.manifest.pages.items():
+            known.add(relative.split('/', 1)[0])
+            if page.get("failed"):
+                dirty.add(relative.split('/', 1)[0])
+        # каталоги корней, которых больше нет в списке
+        for path in list(mtimes):
+            if path not in self.roots and \
+                    os.path.dirname(path) not in self.roots:
+                del mtimes[path]
+        for root in self.roots:
+            mtime = _mtime(root)
+            if full or root in changed or mtimes.get(root) != mtime:
+                names = _list_man_directories(root)
+                mtimes[root] = mtime
+                for path in list(mtimes):
+                    if os.path.dirname(path) == root and \
+                            os.path.basename(path) not in names:
+                        del mtimes[path]
+                        dirty.add(os.path.basename(path))
+                for name in names:
+                    mtimes.setdefault(os.path.join(root, name), None)
+            for path in list(mtimes):
+                if os.path.dirname(path) != root:
+                    continue
+                mtime = _mtime(path)
+                if full or path in changed or mtimes[path] != mtime:
+                    mtimes[path] = mtime
+                    dirty.add(os.path.basename(path))
+        # каталоги, которые пропали из всех корней
+        present = set(os.path.basename(path) for path in mtimes
+                      if path not in self.roots)
+        dirty.update(known - present)
+        return dirty
+
+    def _sync_directory(self, directory, tasks, report):
+        """Добавляет в tasks страницы каталога directory, которые нужно
+        перевести, и возвращает число изменённых записей манифеста."""
+        updated = 0
+        pages = dict()
+        for root in self.roots:
+            try:
+                entries = sorted(os.scandir(os.path.join(root, directory)),
+                                 key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                relative = directory + '/' + entry.name
+                # если страница есть в нескольких корнях, берётся первая
+                if relative not in pages and entry.is_file():
+                    pages[relative] = (root, entry)
+
+        for relative in [relative for relative in self.manifest.pages
+                         if relative.startswith(directory + '/') and
+                         relative not in pages]:
+            self._remove(relative)
+            report.removed += 1
+            updated += 1
+
+        for relative, (root, entry) in pages.items():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            old = self.manifest.pages.get(relative)
+            source = entry.path
+            if old is not None and old["source"] == source and \
+                    old["size"] == stat.st_size and \
+                    old["mtime"] == stat.st_mtime_ns and \
+                    not old.get("failed"):
+                continue
+            try:
+                digest = file_hash(source)
+            except OSError:
+                continue
+            output = output_path_for(pathlib.PurePosixPath(relative),
+                                     self.output_root)
+            new = {"source": source, "size": stat.st_size,
+                   "mtime": stat.st_mtime_ns, "hash": digest,
+                   "output": str(output)}
+            updated += 1
+            if old is not None and old["source"] == source and \
+                    old["hash"] == digest and not old.get("failed") and \
+                    os.path.exists(old["output"]):
+                self.manifest.pages[relative] = new
+                continue
+            self.manifest.pages[relative] = new
+            tasks.append((relative, (pathlib.Path(source), output,
+                                     self.encoding, self.output_encoding)))
+        return updated
+
+    def _remove(self, relative):
+        entry = self.manifest.pages.pop(relative)
+        try:
+            os.remove(entry["output"])
+        except OSError:
+            pass
+
+
+class Inotify(object):
+    """Уведомления об изменениях каталогов через inotify(7), вызываемый
+    из libc через ctypes. Доступен только в Linux."""
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p,
+                                    ctypes.c_uint32)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._directories = dict()
+        self._watched = set()
+
+    def watch(self, directory):
+        directory = str(directory)
+        if directory in self._watched:
+            return
+        descriptor = self._add_watch(self.fd, os.fsencode(directory),
+                                     WATCH_MASK)
+        if descriptor < 0:
+            return  # каталога уже нет, его изменения заметит опрос
+        self._directories[descriptor] = directory
+        self._watched.add(directory)
+
+    def wait(self, timeout):
+        """Ждёт событий не дольше timeout секунд и возвращает множество
+        изменившихся каталогов. None означает, что очередь событий
+        переполнилась и нужно проверить всё."""
+        changed = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+        while True:
+            try:
+                data = os.read(self.fd, EVENTS_BUFFER_SIZE)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, _, length = EVENT_HEADER.unpack_from(
+                    data, offset)
+                offset += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                directory = self._directories.get(descriptor)
+                if directory is None:
+                    continue
+                changed.add(directory)
+                if mask & IN_IGNORED:
+                    del self._directories[descriptor]
+                    self._watched.discard(directory)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_inotify():
+    """Inotify или None, если платформа его не поддерживает."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return Inotify()
+    except (OSError, AttributeError):
+        return None
+
+
+def watch(watcher: Watcher, interval=2.0, notifier=None, output=sys.stderr):
+    """Синхронизирует вывод, затем следит за изменениями: с notifier
+    (Inotify) реагирует на его события сразу и каждые interval секунд
+    проверяет время модификации каталогов, а без него каждые interval
+    секунд проверяет все файлы методом Watcher.poll."""
+    report = watcher.sync(full=True)
+    print(report.format(), file=output)
+    while True:
+        if notifier is None:
+            time.sleep(interval)
+            report = watcher.poll()
+        else:
+            for directory in watcher.directories():
+                notifier.watch(directory)
+            changed = notifier.wait(interval)
+            if changed is None:
+                report = watcher.sync(full=True)
+            else:
+                report = watcher.sync(changed)
+        if report.changed:
+            print(report.format(), file=output)
@@ -1,14 +1,15 @@
 import argparse
-import gzip
-import logging
+import os
 import sys
 
-import pathlib
-
-import os
+from core.settings import DEFAULT_CACHE_SIZE, DEFAULT_PAGE_CACHE_SIZE, \
+    DEFAULT_READERS, DEFAULT_SERVER_DEADLINE, DEFAULT_SERVER_MAX_DEPTH, \
+    STYLE_MODES, STYLES_ATTRIBUTES, STYLES_INLINE, \
+    STYLES_SHARED
 
-from core.args_parser import ArgsParser
-from core.man2html_translator import Man2HtmlTranslator
+# Модули транслятора, кешей и сервера импортируются внутри функций, когда
+# они действительно нужны: запуск утилиты для одной страницы не должен
+# платить за загрузку dominate и asyncio до разбора аргументов.
 
 __version__ = "1.0"
 __author__ = 'Aidar Islamov'
@@ -16,31 +17,128 @@ __email__ = 'lowgear1000@gmail.com'
 
 ERROR_EXCEPTION = 1
 
-GZ_SUFFIX = '.gz'
+BATCH_COMMAND = "batch"
+SERVE_COMMAND = "serve"
+WATCH_COMMAND = "watch"
+SEARCH_COMMAND = "search"
+WHATIS_COMMAND = "whatis"
+APROPOS_COMMAND = "apropos"
 
+MEGABYTE = 1024 * 1024
+STDERR_PATH = "-"
 
-def get_man_path():
+MANPATH_CONFIG_PATH = '/etc/manpath.config'
+_man_path = None
+_man_index = None
+
+
+def read_man_path(config_path=MANPATH_CONFIG_PATH, path=None):
+    """Каталоги man из config_path: все MANDATORY_MANPATH и те
+    MANPATH_MAP, чей каталог программ есть в path (по умолчанию $PATH)."""
+    if path is None:
+        path = os.environ.get("PATH", "")
+    directories = path.split(os.pathsep)
+    result = []
     try:
-        with open(MANPATH_CONFIG_PATH, 'r') as f:
-            result = []
+        with open(config_path, 'r') as f:
             for line in f:
                 line = line.strip()
-                if line[0] == '#':
+                if not line or line[0] == '#':
                     continue
                 parts = line.split(maxsplit=3)
                 mapping = parts[0]
                 if mapping == "MANDATORY_MANPATH" and len(parts) >= 2:
                     result.append(parts[1])
                 elif mapping == "MANPATH_MAP" and len(parts) >= 3 and \
-                        parts[1] in sys.path:
+                        parts[1] in directories:
                     result.append(parts[2])
-        return result
-    except:
+    except (OSError, UnicodeDecodeError):
         return []
+    # один каталог может встретиться в нескольких записях
+    return list(dict.fromkeys(result))
+
+
+def get_man_path():
+    """Каталоги man, прочитанные при первом обращении."""
+    global _man_path
+    if _man_path is None:
+        _man_path = read_man_path()
+    return _man_path
+
+
+def is_file_path(name: str):
+    """NAME с разделителем каталогов - путь к файлу, а не имя страницы,
+    поэтому искать его в MAN_PATH не нужно."""
+    return os.sep in name or (os.altsep is not None and os.altsep in name)
+
+
+def add_budget_arguments(parser, deadline=None, max_depth=None):
+    parser.add_argument(
+        "--max-lines",
+        metavar='LINES',
+        type=int,
+        default=None,
+        help="Stop translating a page after LINES lines, "
+             "including lines of expanded macros")
+
+    parser.add_argument(
+        "--max-nodes",
+        metavar='NODES',
+        type=int,
+        default=None,
+        help="Stop translating a page after NODES top level nodes")
 
+    parser.add_argument(
+        "--max-depth",
+        metavar='DEPTH',
+        type=int,
+        default=max_depth,
+        help="Maximum nesting of macros and .if requests")
+
+    parser.add_argument(
+        "--deadline",
+        metavar='SECONDS',
+        type=float,
+        default=deadline,
+        help="Stop translating a page after SECONDS")
 
-MANPATH_CONFIG_PATH = pathlib.Path('/etc/manpath.config')
-MAN_PATH = get_man_path()
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="Write the page translated so far instead of failing when "
+             "a limit is exceeded")
+
+
+def add_reproducible_argument(parser, details=""):
+    parser.add_argument(
+        "--reproducible",
+        action="store_true",
+        help="Put the SOURCE_DATE_EPOCH time or, if it is not set, "
+             "the source file modification time into the page footer "
+             "instead of the current time, so identical input gives "
+             "identical html" + details)
+
+
+def check_reproducible(parser, args):
+    """Проверяет SOURCE_DATE_EPOCH, если задан --reproducible, чтобы
+    неверное значение было ошибкой аргументов, а не перевода."""
+    if not args.reproducible:
+        return
+    from core.reproducible import source_date_epoch
+    try:
+        source_date_epoch()
+    except ValueError as e:
+        parser.error(str(e))
+
+
+def make_budget(args):
+    """TranslationBudget из аргументов add_budget_arguments или None,
+    если пределы не заданы."""
+    limits = (args.max_lines, args.max_nodes, args.max_depth, args.deadline)
+    if all(limit is None for limit in limits):
+        return None
+    from core.budget import TranslationBudget
+    return TranslationBudget(*limits, truncate=args.truncate)
 
 
 def parse_args():
@@ -61,9 +159,9 @@ def parse_args():
         "-s",
         "--section",
         metavar='SECTION',
-        type=int,
-        default=1,
-        help="Man page section")
+        type=str,
+        default=None,
+        help="Man page section. The first found section if not specified")
 
     parser.add_argument(
         "-e",
@@ -93,47 +191,717 @@ def parse_args():
         default="utf-8",
         help="Output file encoding")
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Write html while translating instead of building "
+             "the whole page in memory. Not used with --cache-dir")
+
+    parser.add_argument(
+        "--cache-dir",
+        metavar='CACHE_DIR',
+        type=str,
+        default=None,
+        help="Directory of the translation cache. No cache if not specified")
 
+    parser.add_argument(
+        "--cache-size",
+        metavar='MEGABYTES',
+        type=int,
+        default=DEFAULT_CACHE_SIZE // MEGABYTE,
+        help="Translation cache size limit in megabytes")
 
-def get_file_from_man_path(name: str, section: int):
-    if not section or section < 1 or section > 8:
-        return None
+    parser.add_argument(
+        "--stats",
+        metavar='STATS_FILE',
+        type=str,
+        nargs='?',
+        const=STDERR_PATH,
+        default=None,
+        help="Write translation statistics as JSON to STATS_FILE, "
+             "stderr if the file is not specified")
+
+    parser.add_argument(
+        "--styles",
+        metavar='STYLES',
+        type=str,
+        choices=(STYLES_ATTRIBUTES, STYLES_INLINE),
+        default=STYLES_ATTRIBUTES,
+        help="Paragraph styles: '{}' on every element or '{}' css classes "
+             "in one <style> block".format(STYLES_ATTRIBUTES, STYLES_INLINE))
+
+    parser.add_argument(
+        "--split",
+        action="store_true",
+        help="Write a table of contents to OUTPUT.html and every .SH "
+             "section to its own file in the OUTPUT directory. "
+             "Requires --output, not used with --cache-dir and --stream")
+
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Also write OUTPUT.gz compressed at the maximum level "
+             "for static serving. Requires --output, not used with "
+             "--stream")
+
+    add_budget_arguments(parser)
+    add_reproducible_argument(parser)
+
+    args = parser.parse_args()
+    check_reproducible(parser, args)
+    if args.split and (not args.output or args.cache_dir or args.stream):
+        parser.error("--split requires --output and is not used with "
+                     "--cache-dir and --stream")
+    if args.gzip and (not args.output or args.stream):
+        parser.error("--gzip requires --output and is not used with "
+                     "--stream")
+    return args
+
+
+def parse_batch_args(argv):
+    parser = argparse.ArgumentParser(
+        usage="%(prog)s {} [OPTIONS] -o OUTPUT_DIR".format(BATCH_COMMAND),
+        description="Translate every page of the man tree into a mirrored "
+                    "tree of html files")
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar='OUTPUT_DIR',
+        type=str,
+        required=True,
+        help="Output directory")
+
+    parser.add_argument(
+        "-r",
+        "--root",
+        metavar='ROOT',
+        type=str,
+        action="append",
+        default=None,
+        help="Man tree root containing manN directories. "
+             "MAN_PATH is used if not specified")
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar='JOBS',
+        type=int,
+        default=None,
+        help="Number of worker processes. CPU count if not specified")
+
+    parser.add_argument(
+        "-e",
+        "--encoding",
+        metavar='ENCODING',
+        type=str,
+        default="utf-8",
+        help="Input files encoding")
+
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Fail on unknown commands")
+
+    parser.add_argument(
+        "--output-encoding",
+        metavar='OUTPUT_ENCODING',
+        type=str,
+        default="utf-8",
+        help="Output files encoding")
+
+    parser.add_argument(
+        "--cache-dir",
+        metavar='CACHE_DIR',
+        type=str,
+        default=None,
+        help="Directory of the translation cache. No cache if not specified")
+
+    parser.add_argument(
+        "--cache-size",
+        metavar='MEGABYTES',
+        type=int,
+        default=DEFAULT_CACHE_SIZE // MEGABYTE,
+        help="Translation cache size limit in megabytes")
+
+    parser.add_argument(
+        "--stats",
+        metavar='STATS_FILE',
+        type=str,
+        nargs='?',
+        const=STDERR_PATH,
+        default=None,
+        help="Write translation statistics as JSON to STATS_FILE, "
+             "stderr if the file is not specified")
+
+    parser.add_argument(
+        "--styles",
+        metavar='STYLES',
+        type=str,
+        choices=STYLE_MODES,
+        default=STYLES_ATTRIBUTES,
+        help="Paragraph styles: '{}' on every element, '{}' css classes "
+             "in every page or '{}' stylesheet for all pages. "
+             "'{}' is not used with --cache-dir".format(
+                 STYLES_ATTRIBUTES, STYLES_INLINE, STYLES_SHARED,
+                 STYLES_SHARED))
+
+    parser.add_argument(
+        "--split",
+        action="store_true",
+        help="Write a table of contents to man1/NAME.html and every .SH "
+             "section to its own file in man1/NAME/. "
+             "Not used with --cache-dir")
+
+    parser.add_argument(
+        "--readers",
+        metavar='READERS',
+        type=int,
+        default=DEFAULT_READERS,
+        help="Number of threads reading and decompressing pages while "
+             "worker processes translate")
+
+    parser.add_argument(
+        "--links",
+        action="store_true",
+        help="Turn references like '.BR ls (1)' into links to the pages "
+             "found in the translated roots")
+
+    parser.add_argument(
+        "--search-index",
+        metavar='INDEX',
+        type=str,
+        default=None,
+        help="Build a full-text search index of the translated pages "
+             "in the INDEX file for the '{}' command. "
+             "Not used with --cache-dir".format(SEARCH_COMMAND))
+
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Also write every html file compressed to .html.gz at the "
+             "maximum level for static serving. Files whose .gz already "
+             "has the same content are not compressed again")
+
+    add_budget_arguments(parser)
+    add_reproducible_argument(
+        parser, ". Hashes of the written files are kept in SHA256SUMS in "
+                "OUTPUT_DIR and files that did not change are not "
+                "rewritten")
+
+    args = parser.parse_args(argv)
+    check_reproducible(parser, args)
+    if args.readers < 1:
+        parser.error("--readers must be positive")
+    if args.styles == STYLES_SHARED and args.cache_dir is not None:
+        parser.error("--styles {} is not used with --cache-dir".format(
+            STYLES_SHARED))
+    if args.split and args.cache_dir is not None:
+        parser.error("--split is not used with --cache-dir")
+    if args.search_index is not None and args.cache_dir is not None:
+        parser.error("--search-index is not used with --cache-dir")
+    return args
+
+
+def parse_serve_args(argv):
+    parser = argparse.ArgumentParser(
+        usage="%(prog)s {} [OPTIONS]".format(SERVE_COMMAND),
+        description="Serve translated man pages over HTTP "
+                    "at /man/SECTION/NAME")
+
+    parser.add_argument(
+        "--host",
+        metavar='HOST',
+        type=str,
+        default="127.0.0.1",
+        help="Address to listen on")
+
+    parser.add_argument(
+        "-p",
+        "--port",
+        metavar='PORT',
+        type=int,
+        default=8080,
+        help="Port to listen on")
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar='JOBS',
+        type=int,
+        default=None,
+        help="Number of translating processes. CPU count if not specified")
+
+    parser.add_argument(
+        "-e",
+        "--encoding",
+        metavar='ENCODING',
+        type=str,
+        default="utf-8",
+        help="Input files encoding")
+
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Fail on unknown commands")
+
+    parser.add_argument(
+        "--memory-cache-size",
+        metavar='MEGABYTES',
+        type=int,
+        default=DEFAULT_PAGE_CACHE_SIZE // MEGABYTE,
+        help="Size limit of translated pages kept in memory in megabytes")
+
+    parser.add_argument(
+        "--links",
+        action="store_true",
+        help="Turn references like '.BR ls (1)' into links to the pages "
+             "found in MAN_PATH")
 
-    file_name = name + '.' + str(section) + '.gz'
-    section = "man" + str(section)
-    for directory in MAN_PATH:
-        possible_path = pathlib.Path(directory, section, file_name)
-        if possible_path.is_file() and os.access(str(possible_path), os.R_OK):
-            return possible_path
+    add_budget_arguments(parser, DEFAULT_SERVER_DEADLINE,
+                         DEFAULT_SERVER_MAX_DEPTH)
+    add_reproducible_argument(
+        parser, " and the same ETag after a restart")
+
+    args = parser.parse_args(argv)
+    check_reproducible(parser, args)
+    return args
+
+
+def parse_watch_args(argv):
+    parser = argparse.ArgumentParser(
+        usage="%(prog)s {} [OPTIONS] -o OUTPUT_DIR".format(WATCH_COMMAND),
+        description="Keep a mirrored tree of html files up to date, "
+                    "translating only added and changed pages")
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar='OUTPUT_DIR',
+        type=str,
+        required=True,
+        help="Output directory")
+
+    parser.add_argument(
+        "-r",
+        "--root",
+        metavar='ROOT',
+        type=str,
+        action="append",
+        default=None,
+        help="Man tree root containing manN directories. "
+             "MAN_PATH is used if not specified")
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar='JOBS',
+        type=int,
+        default=None,
+        help="Number of worker processes. CPU count if not specified")
+
+    parser.add_argument(
+        "-e",
+        "--encoding",
+        metavar='ENCODING',
+        type=str,
+        default="utf-8",
+        help="Input files encoding")
+
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Fail on unknown commands")
+
+    parser.add_argument(
+        "--output-encoding",
+        metavar='OUTPUT_ENCODING',
+        type=str,
+        default="utf-8",
+        help="Output files encoding")
+
+    parser.add_argument(
+        "--interval",
+        metavar='SECONDS',
+        type=float,
+        default=2.0,
+        help="Seconds between checks of the man directories")
+
+    parser.add_argument(
+        "--no-inotify",
+        action="store_true",
+        help="Only poll directories even if inotify is available")
+
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Synchronize the output once and exit")
+
+    add_reproducible_argument(parser)
+
+    args = parser.parse_args(argv)
+    check_reproducible(parser, args)
+    return args
+
+
+def parse_search_args(argv):
+    parser = argparse.ArgumentParser(
+        usage="%(prog)s {} -i INDEX [OPTIONS] WORD [WORD ...]".format(
+            SEARCH_COMMAND),
+        description="Find pages containing all the words in the index "
+                    "built by '{} --search-index'".format(BATCH_COMMAND))
+
+    parser.add_argument(
+        "words",
+        metavar='WORD',
+        type=str,
+        nargs='+',
+        help="Word to search for, a trailing '*' matches a prefix")
+
+    parser.add_argument(
+        "-i",
+        "--index",
+        metavar='INDEX',
+        type=str,
+        required=True,
+        help="Search index file")
+
+    parser.add_argument(
+        "-s",
+        "--section",
+        metavar='SECTION',
+        type=str,
+        default=None,
+        help="Only pages of the section")
+
+    parser.add_argument(
+        "-n",
+        "--limit",
+        metavar='LIMIT',
+        type=int,
+        default=20,
+        help="Maximum number of pages to show")
+
+    return parser.parse_args(argv)
+
+
+def parse_catalog_args(argv, command):
+    if command == WHATIS_COMMAND:
+        usage = "%(prog)s {} [OPTIONS] NAME [NAME ...]"
+        description = "Show one-line descriptions of the pages NAME"
+        words = dict(metavar='NAME', nargs='+', help="Page name")
+    else:
+        usage = "%(prog)s {} [OPTIONS] [KEYWORD ...]"
+        description = "Find pages whose name or description contains " \
+                      "all the keywords, or list the section"
+        words = dict(metavar='KEYWORD', nargs='*',
+                     help="Keyword, a trailing '*' matches a prefix")
+    parser = argparse.ArgumentParser(
+        usage=usage.format(command),
+        description=description + ". The catalog of pages is updated "
+                                  "from the changed man directories first")
+
+    parser.add_argument(
+        "words",
+        type=str,
+        **words)
+
+    parser.add_argument(
+        "-s",
+        "--section",
+        metavar='SECTION',
+        type=str,
+        default=None,
+        help="Only pages of the section")
+
+    parser.add_argument(
+        "-c",
+        "--catalog",
+        metavar='CATALOG',
+        type=str,
+        default=None,
+        help="Catalog file. ~/.cache/man2html/catalog.sqlite "
+             "if not specified")
+
+    parser.add_argument(
+        "-r",
+        "--root",
+        metavar='ROOT',
+        type=str,
+        action="append",
+        default=None,
+        help="Man tree root containing manN directories. "
+             "MAN_PATH is used if not specified")
+
+    parser.add_argument(
+        "-e",
+        "--encoding",
+        metavar='ENCODING',
+        type=str,
+        default="utf-8",
+        help="Input files encoding")
+
+    args = parser.parse_args(argv)
+    if not args.words and args.section is None:
+        parser.error("a keyword or --section is required")
+    return args
+
+
+def get_man_index():
+    global _man_index
+    if _man_index is None:
+        from core.man_index import ManIndex
+        _man_index = ManIndex.load(get_man_path())
+    return _man_index
+
+
+def get_file_from_man_path(name: str, section=None):
+    return get_man_index().find(name, section)
+
+
+def batch_main(argv):
+    args = parse_batch_args(argv)
+    roots = args.root if args.root else get_man_path()
+
+    from core.batch import run_batch
+
+    pages = None
+    if args.links:
+        from core.cross_references import PageSet
+        from core.man_index import ManIndex
+
+        index = ManIndex.build(roots) if args.root else get_man_index()
+        pages = PageSet.from_index(index)
+
+    report = run_batch(roots, args.output, jobs=args.jobs,
+                       strict_mode=args.strict, encoding=args.encoding,
+                       output_encoding=args.output_encoding,
+                       cache_dir=args.cache_dir,
+                       cache_size=args.cache_size * MEGABYTE,
+                       collect_stats=args.stats is not None,
+                       styles=args.styles, split=args.split,
+                       readers=args.readers, pages=pages,
+                       search_index=args.search_index,
+                       budget=make_budget(args),
+                       reproducible=args.reproducible,
+                       compress=args.gzip)
+
+    print(report.format(), file=sys.stderr)
+    if report.stats is not None:
+        write_stats(report.stats, args.stats)
+    if report.failures:
+        sys.exit(ERROR_EXCEPTION)
+
+
+def serve_main(argv):
+    args = parse_serve_args(argv)
+    get_man_index()  # индекс загружается до запуска цикла событий
+
+    import concurrent.futures
+    import functools
+    from core.batch import init_worker
+    from core.server import serve
+
+    linker = None
+    if args.links:
+        from core.cross_references import CrossReferenceLinker, PageSet, \
+            SERVER_HREF_FORMAT
+
+        linker = CrossReferenceLinker(PageSet.from_index(get_man_index()),
+                                      SERVER_HREF_FORMAT)
+
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=args.jobs,
+        initializer=functools.partial(init_worker, linker=linker,
+                                      budget=make_budget(args),
+                                      reproducible=args.reproducible),
+        initargs=(args.strict,))
+    with executor:
+        try:
+            serve(get_file_from_man_path, executor, args.host, args.port,
+                  encoding=args.encoding,
+                  cache_size=args.memory_cache_size * MEGABYTE)
+        except KeyboardInterrupt:
+            pass
+
+
+def watch_main(argv):
+    args = parse_watch_args(argv)
+    roots = args.root if args.root else get_man_path()
+
+    import concurrent.futures
+    import functools
+    from core.batch import init_worker
+    from core.watch import Watcher, watch, open_inotify
+
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=args.jobs,
+        initializer=functools.partial(init_worker,
+                                      reproducible=args.reproducible),
+        initargs=(args.strict,))
+    with executor:
+        watcher = Watcher(roots, args.output, executor,
+                          encoding=args.encoding,
+                          output_encoding=args.output_encoding)
+        if args.once:
+            report = watcher.sync(full=True)
+            print(report.format(), file=sys.stderr)
+            if report.failures:
+                sys.exit(ERROR_EXCEPTION)
+            return
+        notifier = None if args.no_inotify else open_inotify()
+        try:
+            watch(watcher, args.interval, notifier)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if notifier is not None:
+                notifier.close()
+
+
+def search_main(argv):
+    args = parse_search_args(argv)
+    if not os.path.isfile(args.index):
+        print("No search index: {}".format(args.index), file=sys.stderr)
+        sys.exit(ERROR_EXCEPTION)
+
+    from core.search_index import SearchIndex, IndexVersionError
+
+    try:
+        index = SearchIndex.open(args.index)
+    except IndexVersionError as e:
+        print("{} with '{} --search-index'".format(e, BATCH_COMMAND),
+              file=sys.stderr)
+        sys.exit(ERROR_EXCEPTION)
+    with index:
+        results = index.search(args.words, args.section, args.limit)
+    for result in results:
+        print(result.format())
+    if not results:
+        sys.exit(ERROR_EXCEPTION)
+
+
+def catalog_main(argv, command):
+    args = parse_catalog_args(argv, command)
+    roots = args.root if args.root else get_man_path()
+
+    import logging
+    from core.catalog import Catalog, default_catalog_path
+
+    # из каждой страницы читается только NAME, предупреждения о
+    # командах остальной разметки здесь не нужны
+    logging.getLogger("core.man2html_translator").setLevel(logging.ERROR)
+    path = args.catalog if args.catalog else default_catalog_path()
+    with Catalog(path, encoding=args.encoding) as catalog:
+        catalog.update(roots)
+        if command == WHATIS_COMMAND:
+            found = True
+            for name in args.words:
+                entries = catalog.whatis(name, args.section)
+                if not entries:
+                    print("{}: nothing appropriate.".format(name),
+                          file=sys.stderr)
+                    found = False
+                for entry in entries:
+                    print(entry.format())
+        else:
+            entries = catalog.apropos(args.words, args.section)
+            for entry in entries:
+                print(entry.format())
+            found = bool(entries)
+    if not found:
+        sys.exit(ERROR_EXCEPTION)
+
+
+def whatis_main(argv):
+    catalog_main(argv, WHATIS_COMMAND)
+
+
+def apropos_main(argv):
+    catalog_main(argv, APROPOS_COMMAND)
+
+
+SUBCOMMANDS = {
+    BATCH_COMMAND: batch_main,
+    SERVE_COMMAND: serve_main,
+    WATCH_COMMAND: watch_main,
+    SEARCH_COMMAND: search_main,
+    WHATIS_COMMAND: whatis_main,
+    APROPOS_COMMAND: apropos_main,
+}
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        SUBCOMMANDS[sys.argv[1]](sys.argv[2:])
+        return
+
     args = parse_args()
 
+    import io
+    import logging
+    from core.args_parser import ArgsParser
+    from core.budget import BudgetExceeded
+    from core.html_renderer import make_renderer
+    from core.man2html_translator import Man2HtmlTranslator
+    from core.man_files import open_man_file, read_man_bytes
+    from core.stats import TranslationStats
+    from core.translation_cache import TranslationCache
+
     log = logging.StreamHandler(sys.stderr)
     log.setFormatter(logging.Formatter(
         "%(name)s: %(asctime)s [%(levelname)s] %(message)s"))
 
-    translator = Man2HtmlTranslator(ArgsParser(), strict_mode=args.strict)
+    stats = TranslationStats() if args.stats is not None else None
+    translator = Man2HtmlTranslator(ArgsParser(), strict_mode=args.strict,
+                                    stats=stats,
+                                    renderer=make_renderer(args.styles),
+                                    budget=make_budget(args))
 
-    input_file = get_file_from_man_path(args.name, args.section)
+    input_file = None
+    if not is_file_path(args.name):
+        input_file = get_file_from_man_path(args.name, args.section)
     if not input_file:
         input_file = args.name
+    if args.reproducible:
+        from core.reproducible import page_clock, source_date_epoch
+        try:
+            translator.clock = page_clock(input_file, source_date_epoch())
+        except OSError as e:
+            print("Error opening file.\n{}".format(e), file=sys.stderr)
+            sys.exit(ERROR_EXCEPTION)
+    cache = None
+    if args.cache_dir:
+        cache = TranslationCache(args.cache_dir, args.cache_size * MEGABYTE)
     try:
-        input_stream = open_man_file(input_file, args.encoding)
+        if cache is not None:
+            input_stream = io.BytesIO(read_man_bytes(input_file))
+        else:
+            input_stream = open_man_file(input_file, args.encoding)
     except OSError as e:
         print("Error opening file.\n{}".format(e), file=sys.stderr)
         sys.exit(ERROR_EXCEPTION)
     else:
         pass  # todo log input OK
 
+    result = None
     with input_stream as f:
         try:
-            result = translator.translate(f)
+            if cache is not None:
+                result = cache.translate(translator, f.read(), input_file,
+                                         args.encoding)
+            elif args.stream:
+                stream_result(translator, f, args)
+            elif args.split:
+                split_result(translator, f, args)
+            else:
+                result = translator.translate(f)
         except NotImplementedError as e:
             print("Not implemented:\n{0}".format(e), file=sys.stderr)
             sys.exit(ERROR_EXCEPTION)
+        except BudgetExceeded as e:
+            print("Translation stopped: {}".format(e), file=sys.stderr)
+            sys.exit(ERROR_EXCEPTION)
         except Exception as e:
             # todo log error
             print("Some error happened", file=sys.stderr)
@@ -141,16 +909,72 @@ def main():
         else:
             pass  # todo log translation OK
 
-    print_result(result, args)
+    if result is not None:
+        print_result(result, args)
+    if stats is not None:
+        write_stats(stats, args.stats)
     # todo log finished OK
 
 
-def open_man_file(name, encoding):
-    path = pathlib.Path(name)
-    suffix = path.suffix.lower()
-    if suffix == GZ_SUFFIX:
-        return gzip.open(name, 'rt', encoding=encoding)
-    return open(name, encoding=encoding)
+def write_stats(stats, path):
+    if path == STDERR_PATH:
+        print(stats.to_json(), file=sys.stderr)
+        return
+    try:
+        with open(path, 'w', encoding="utf-8") as output:
+            output.write(stats.to_json())
+    except OSError:
+        print("Error writing to {}".format(path), file=sys.stderr)
+        sys.exit(ERROR_EXCEPTION)
+
+
+def stream_result(translator, lines, args):
+    if not args.output:
+        translator.translate_to_stream(lines, sys.stdout)
+        print()
+        return
+    try:
+        output = open(args.output, 'w', encoding=args.output_encoding)
+    except OSError:
+        print("Error writing to {}".format(args.output), file=sys.stderr)
+        sys.exit(ERROR_EXCEPTION)
+    with output:
+        translator.translate_to_stream(lines, output)
+
+
+def split_result(translator, lines, args):
+    import pathlib
+    from core.batch import sections_directory, write_sections, HTML_SUFFIX
+
+    destination = pathlib.Path(args.output)
+    if destination.suffix != HTML_SUFFIX:
+        destination = destination.with_name(destination.name + HTML_SUFFIX)
+    index, sections = translator.translate_sections(
+        lines, sections_directory(destination).name)
+    try:
+        write_sections(destination, sections, args.output_encoding)
+        with open(str(destination), 'w',
+                  encoding=args.output_encoding) as output:
+            output.write(index)
+        if args.gzip:
+            directory = sections_directory(destination)
+            for name, html in sections:
+                write_compressed_result(directory / name, html, args)
+            write_compressed_result(destination, index, args)
+    except OSError:
+        print("Error writing to {}".format(destination), file=sys.stderr)
+        sys.exit(ERROR_EXCEPTION)
+
+
+def write_compressed_result(path, html, args):
+    """Пишет для --gzip сжатый спутник path.gz, если его содержимое
+    изменилось."""
+    from core.precompressed import compress_output, gzip_path
+
+    data = compress_output(path, html.encode(args.output_encoding))
+    if data is not None:
+        with open(str(gzip_path(path)), 'wb') as output:
+            output.write(data)
 
 
 def print_result(result, args):
@@ -159,6 +983,10 @@ def print_result(result, args):
             with open(args.output, 'w',
                       encoding=args.output_encoding) as output:
                 output.write(result)
+            if args.gzip:
+                import pathlib
+                write_compressed_result(pathlib.Path(args.output), result,
+                                        args)
         except:
             print("Error writing to {}".format(args.output), file=sys.stderr)
             sys.exit(ERROR_EXCEPTION)  # todo is it proper way?
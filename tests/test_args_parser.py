@@ -80,6 +80,38 @@ class ArgsParserTests(unittest.TestCase):
 
         self.assertEqual(expected, parsed)
 
+    def test_escapes_are_replaced_without_quotes(self):
+        line = '.BR \\-\\-help\\c foo\\|bar\n'
+        expected = ['.BR', '--help', 'foobar']
+
+        parsed = self.parser.parse_args(line)
+
+        self.assertEqual(expected, parsed)
+
+    def test_unknown_escape_keeps_backslash(self):
+        line = 'a\\fB b\\\\e'
+        expected = ['a\\fB', 'b\\\\']
+
+        parsed = self.parser.parse_args(line)
+
+        self.assertEqual(expected, parsed)
+
+    def test_trailing_backslash_is_dropped(self):
+        line = 'word1 word2\\'
+        expected = ['word1', 'word2']
+
+        parsed = self.parser.parse_args(line)
+
+        self.assertEqual(expected, parsed)
+
+    def test_escaped_space_does_not_split(self):
+        line = 'word1\\ word2 word3'
+        expected = ['word1 word2', 'word3']
+
+        parsed = self.parser.parse_args(line)
+
+        self.assertEqual(expected, parsed)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,206 @@
+import gzip
+import os
+import pathlib
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from core import batch, pipeline
+from core.cross_references import PageSet
+from core.man_index import ManIndex
+from core.reproducible import HASH_MANIFEST_NAME
+from core.search_index import SearchIndex
+
+
+class BatchTests(unittest.TestCase):
+    '''Тестирование пакетного перевода дерева man'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.directory.name, "man")
+        self.output = pathlib.Path(self.directory.name, "html")
+        (self.root / "man1").mkdir(parents=True)
+        (self.root / "man5").mkdir(parents=True)
+        (self.root / "cat1").mkdir(parents=True)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_page(self, relative, text):
+        path = self.root / relative
+        if path.suffix == ".gz":
+            with gzip.open(str(path), "wt", encoding="utf-8") as f:
+                f.write(text)
+        else:
+            path.write_text(text, encoding="utf-8")
+
+    def test_finds_pages_only_in_man_directories(self):
+        self.write_page("man1/ls.1.gz", ".TH LS 1\n")
+        self.write_page("man5/passwd.5", ".TH PASSWD 5\n")
+        self.write_page("cat1/ls.1", "formatted")
+
+        found = [relative for _, relative in batch.find_man_pages([self.root])]
+
+        self.assertEqual([pathlib.Path("man1/ls.1.gz"),
+                          pathlib.Path("man5/passwd.5")], found)
+
+    def test_output_path_mirrors_tree_without_compression_suffix(self):
+        actual = batch.output_path_for(pathlib.Path("man1/ls.1.gz"), "out")
+
+        self.assertEqual(pathlib.Path("out/man1/ls.1.html"), actual)
+
+    def test_translates_pages_and_reports_failures(self):
+        self.write_page("man1/ls.1.gz", ".TH LS 1\n.SH NAME\nls\n")
+        (self.root / "man1" / "broken.1.gz").write_bytes(b"not gzip")
+
+        report = batch.run_batch([self.root], self.output, jobs=1)
+
+        self.assertEqual(2, report.pages)
+        self.assertEqual(1, len(report.failures))
+        self.assertTrue(report.failures[0][0].endswith("broken.1.gz"))
+        html = (self.output / "man1" / "ls.1.html").read_text(
+            encoding="utf-8")
+        self.assertIn("<h2>NAME</h2>", html)
+
+    def test_second_run_is_served_from_cache(self):
+        self.write_page("man1/ls.1.gz", ".TH LS 1\n.SH NAME\nls\n")
+        cache = pathlib.Path(self.directory.name, "cache")
+
+        first = batch.run_batch([self.root], self.output, jobs=1,
+                                cache_dir=cache)
+        second = batch.run_batch([self.root], self.output, jobs=1,
+                                 cache_dir=cache)
+
+        self.assertEqual((0, 1), (first.cache_hits, first.cache_misses))
+        self.assertEqual((1, 0), (second.cache_hits, second.cache_misses))
+
+    def test_shared_styles_are_written_to_one_stylesheet(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n.SH NAME\nls\n")
+        self.write_page("man5/passwd.5",
+                        ".TH PASSWD 5\n.PD 2\nfirst\n.PP\nsecond\n")
+
+        batch.run_batch([self.root], self.output, jobs=1,
+                        styles=batch.STYLES_SHARED)
+
+        html = (self.output / "man1" / "ls.1.html").read_text(
+            encoding="utf-8")
+        stylesheet = (self.output / batch.STYLESHEET_NAME).read_text(
+            encoding="utf-8")
+        self.assertIn('href="../man2html.css"', html)
+        self.assertNotIn("style=", html)
+        self.assertIn("-webkit-margin-before:0.4em", stylesheet)
+        self.assertIn("-webkit-margin-before:2.0em", stylesheet)
+
+    def test_split_pages_are_written_as_index_and_sections(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n.SH NAME\nls\n.SH OPTIONS\n")
+        stale = self.output / "man1" / "ls.1" / "09-old.html"
+        stale.parent.mkdir(parents=True)
+        stale.write_text("old", encoding="utf-8")
+
+        batch.run_batch([self.root], self.output, jobs=1, split=True)
+
+        index = (self.output / "man1" / "ls.1.html").read_text(
+            encoding="utf-8")
+        self.assertIn('href="ls.1/01-name.html"', index)
+        self.assertEqual(["01-name.html", "02-options.html"], sorted(
+            path.name for path in (self.output / "man1" / "ls.1").iterdir()))
+
+    def test_pipeline_reports_stage_metrics(self):
+        for n in range(5):
+            self.write_page("man1/p{}.1.gz".format(n),
+                            ".TH P{} 1\n.SH NAME\np\n".format(n))
+
+        report = batch.run_batch([self.root], self.output, jobs=1,
+                                 chunk_size=2, readers=2, queue_size=2)
+
+        self.assertEqual(5, report.pages)
+        self.assertEqual(["read", "translate", "write"], list(report.stages))
+        for metrics in report.stages.values():
+            self.assertEqual(5, metrics.items)
+        self.assertLessEqual(report.stages["translate"].max_depth, 2)
+        self.assertIn("translate", report.format())
+
+    def test_last_chunk_is_written_when_callbacks_are_slow(self):
+        for number in range(20):
+            self.write_page("man1/page{}.1".format(number),
+                            ".TH PAGE 1\n.SH NAME\npage\n")
+        record = pipeline.StageMetrics.record
+
+        def slow_record(metrics, items, seconds):
+            time.sleep(0.01)
+            record(metrics, items, seconds)
+
+        with mock.patch.object(pipeline.StageMetrics, "record",
+                               slow_record):
+            report = batch.run_batch([self.root], self.output, jobs=2,
+                                     chunk_size=4)
+
+        self.assertEqual(20, report.pages)
+        self.assertEqual(20, len(list((self.output / "man1").iterdir())))
+
+    def test_links_point_into_output_tree(self):
+        self.write_page("man1/ls.1.gz", ".TH LS 1\n.SH NAME\nls\n")
+        self.write_page("man5/passwd.5",
+                        ".TH PASSWD 5\n.SH SEE ALSO\n.BR ls (1)\n")
+        pages = PageSet.from_index(ManIndex.build([self.root]))
+
+        batch.run_batch([self.root], self.output, jobs=1, pages=pages)
+
+        html = (self.output / "man5" / "passwd.5.html").read_text(
+            encoding="utf-8")
+        self.assertIn('<a href="../man1/ls.1.html">', html)
+
+    def test_search_index_is_built_from_translated_pages(self):
+        self.write_page("man1/ls.1.gz", ".TH LS 1\n.SH NAME\nls \\- list\n")
+        self.write_page("man5/passwd.5", ".TH PASSWD 5\n.SH NAME\npasswd\n")
+        path = pathlib.Path(self.directory.name, "search.db")
+
+        batch.run_batch([self.root], self.output, jobs=1, search_index=path)
+
+        with SearchIndex(path) as index:
+            self.assertEqual(2, len(index))
+            self.assertEqual(["ls"], [result.name for result in
+                                      index.search(["list"])])
+
+    def test_reproducible_run_writes_same_bytes_and_manifest(self):
+        self.write_page("man1/ls.1.gz", ".TH LS 1\n.SH NAME\nls\n")
+        source = self.root / "man1" / "ls.1.gz"
+        os.utime(str(source), (1500000000, 1500000000))
+        page = self.output / "man1" / "ls.1.html"
+
+        first = batch.run_batch([self.root], self.output, jobs=1,
+                                reproducible=True)
+        html = page.read_bytes()
+        os.utime(str(page), (1, 1))
+        second = batch.run_batch([self.root], self.output, jobs=1,
+                                 reproducible=True)
+
+        self.assertIn(b"July 14, 2017", html)
+        self.assertEqual(html, page.read_bytes())
+        self.assertEqual((0, 1), (first.unchanged, second.unchanged))
+        self.assertEqual(1, page.stat().st_mtime)
+        manifest = (self.output / HASH_MANIFEST_NAME).read_text(
+            encoding="utf-8")
+        self.assertTrue(manifest.endswith("  man1/ls.1.html\n"))
+
+
+    def test_compressed_copies_are_written_once(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n.SH NAME\nls\n")
+        compressed = self.output / "man1" / "ls.1.html.gz"
+
+        first = batch.run_batch([self.root], self.output, jobs=1,
+                                reproducible=True, compress=True)
+        os.utime(str(compressed), (1, 1))
+        second = batch.run_batch([self.root], self.output, jobs=1,
+                                 reproducible=True, compress=True)
+
+        html = (self.output / "man1" / "ls.1.html").read_bytes()
+        self.assertEqual(html, gzip.decompress(compressed.read_bytes()))
+        self.assertEqual((1, 0), (first.compressed,
+                                  first.compressed_unchanged))
+        self.assertEqual((0, 1), (second.compressed,
+                                  second.compressed_unchanged))
+        self.assertEqual(1, compressed.stat().st_mtime)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import datetime
+import io
+import itertools
+import unittest
+
+from core.args_parser import ArgsParser
+from core.budget import TranslationBudget, TooManyLines, TooManyNodes, \
+    TooDeep, DeadlineExceeded, DEFAULT_MAX_DEPTH
+from core.man2html_translator import Man2HtmlTranslator
+
+
+def fixed_clock():
+    return datetime.datetime(2000, 1, 1)
+
+
+class BudgetTests(unittest.TestCase):
+    '''Тестирование пределов работы над страницей'''
+    def translator(self, **limits):
+        return Man2HtmlTranslator(ArgsParser(), strict_mode=False,
+                                  budget=TranslationBudget(**limits))
+
+    def test_endless_input_stops_at_line_limit(self):
+        translator = self.translator(max_lines=100)
+
+        with self.assertRaises(TooManyLines) as error:
+            translator.translate(itertools.repeat("text"))
+
+        self.assertEqual(100, error.exception.limit)
+
+    def test_self_recursive_macro_stops_at_depth_limit(self):
+        lines = [".de XX", ".B x", ".XX", "..", ".XX"]
+
+        with self.assertRaises(TooDeep):
+            self.translator(max_depth=8).translate(lines)
+        # строки раскрытых макросов тоже считаются
+        with self.assertRaises(TooManyLines):
+            self.translator(max_lines=1000).translate(lines)
+
+    def test_recursive_macro_fails_without_budget(self):
+        translator = Man2HtmlTranslator(ArgsParser(), strict_mode=False)
+
+        with self.assertRaises(TooDeep) as error:
+            translator.translate([".de XX", ".XX", "..", ".XX"])
+
+        self.assertEqual(DEFAULT_MAX_DEPTH, error.exception.limit)
+
+    def test_nested_if_stops_at_depth_limit(self):
+        line = " ".join([".if t"] * 10 + ["text"])
+
+        with self.assertRaises(TooDeep):
+            self.translator(max_depth=5).translate([line])
+        self.translator(max_depth=10).translate([line])
+
+    def test_node_limit(self):
+        with self.assertRaises(TooManyNodes):
+            self.translator(max_nodes=10).translate(
+                itertools.repeat(".SH NAME"))
+
+    def test_deadline(self):
+        with self.assertRaises(DeadlineExceeded):
+            self.translator(seconds=0.01).translate(itertools.repeat("x"))
+
+    def test_truncated_page_ends_with_reason(self):
+        translator = self.translator(max_lines=3, truncate=True)
+        lines = [".SH NAME", "first", "second", "third", "fourth"]
+
+        html = translator.translate(lines)
+        output = io.StringIO()
+        translator.translate_to_stream(lines, output)
+
+        self.assertIn("second", html)
+        self.assertNotIn("third", html)
+        self.assertIn("Page truncated: too many lines (limit 3)", html)
+        self.assertEqual(html.split("Time:")[0],
+                         output.getvalue().split("Time:")[0])
+
+    def test_page_within_budget_is_unchanged(self):
+        lines = [".de XX", ".B \\\\$1", "..", ".SH NAME", ".XX ls"]
+        plain = Man2HtmlTranslator(ArgsParser(), strict_mode=False,
+                                   clock=fixed_clock)
+        limited = self.translator(max_lines=100, max_nodes=100, max_depth=2,
+                                  seconds=60)
+        limited.clock = fixed_clock
+
+        self.assertEqual(plain.translate(lines), limited.translate(lines))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+from core.args_parser import ArgsParser
+from core.catalog import Catalog, split_name_line, section_pattern
+from core.man2html_translator import Man2HtmlTranslator
+
+LS = ".TH LS 1 2022-09-20 \"GNU coreutils\"\n.SH NAME\n" \
+     "ls, dir \\- list directory contents\n.SH SYNOPSIS\n.B ls\n"
+GZIP = ".TH GZIP 1 2023 local\n.SH NAME\ngzip, gunzip \\- compress files\n"
+PRINTF = ".TH PRINTF 3p 2017 POSIX\n.SH NAME\nprintf \\- print " \
+         "formatted output\n.SH DESCRIPTION\nwrites to stdout\n"
+
+
+class ReadNameSectionTests(unittest.TestCase):
+    '''Тестирование разбора страницы только до конца раздела NAME'''
+    def test_stops_after_name_section(self):
+        lines = iter(LS.splitlines() + [".XX never read"])
+        translator = Man2HtmlTranslator(ArgsParser())
+
+        state = translator.read_name_section(lines)
+
+        self.assertEqual(("LS", "1", "2022-09-20", "GNU coreutils"),
+                         (state.title, state.section, state.date,
+                          state.source))
+        self.assertEqual(["ls, dir - list directory contents"],
+                         state.text.body)
+        self.assertIn(".XX never read", list(lines))
+
+    def test_page_without_headings_has_no_name_text(self):
+        translator = Man2HtmlTranslator(ArgsParser())
+
+        state = translator.read_name_section(["text", "more text"])
+
+        self.assertEqual([], state.text.body)
+
+
+class CatalogTests(unittest.TestCase):
+    '''Тестирование каталога страниц для whatis и apropos'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.directory.name, "man")
+        (self.root / "man1").mkdir(parents=True)
+        (self.root / "man3").mkdir(parents=True)
+        self.write_page("man1/ls.1", LS)
+        self.write_page("man1/gzip.1", GZIP)
+        self.write_page("man3/printf.3p", PRINTF)
+        self.catalog = Catalog(pathlib.Path(self.directory.name,
+                                            "catalog.sqlite"))
+
+    def tearDown(self):
+        self.catalog.close()
+        self.directory.cleanup()
+
+    def write_page(self, relative, text):
+        (self.root / relative).write_text(text, encoding="utf-8")
+
+    def test_split_name_line(self):
+        self.assertEqual((["gzip", "gunzip"], "compress"),
+                         split_name_line("gzip, gunzip - compress"))
+        self.assertEqual(([], "no separator"),
+                         split_name_line("no separator"))
+
+    def test_section_pattern_escapes_glob(self):
+        self.assertEqual("3*", section_pattern("3"))
+        self.assertEqual("[*]*", section_pattern("*"))
+
+    def test_whatis_finds_names_from_name_section(self):
+        self.catalog.update([self.root])
+
+        entries = self.catalog.whatis("gunzip")
+
+        self.assertEqual(1, len(entries))
+        self.assertEqual(("gunzip", "1", "compress files", "local"),
+                         (entries[0].name, entries[0].section,
+                          entries[0].description, entries[0].source))
+        self.assertTrue(entries[0].path.endswith("gzip.1"))
+        self.assertEqual("gunzip (1)           - compress files",
+                         entries[0].format())
+
+    def test_apropos_matches_keywords_and_sections(self):
+        self.catalog.update([self.root])
+
+        self.assertEqual(["dir", "ls"], [entry.name for entry in
+                                         self.catalog.apropos(["list"])])
+        self.assertEqual(["gunzip", "gzip"],
+                         [entry.name for entry in
+                          self.catalog.apropos(["compress"], "1")])
+        self.assertEqual([("printf", "3p")],
+                         [(entry.name, entry.section) for entry in
+                          self.catalog.apropos([], "3")])
+        self.assertEqual([], self.catalog.apropos(["formatted"], "1"))
+
+    def test_update_reads_only_changed_files(self):
+        self.assertEqual(3, self.catalog.update([self.root]))
+        self.assertEqual(0, self.catalog.update([self.root]))
+
+        self.write_page("man1/gzip.1", GZIP.replace("compress files",
+                                                    "squeeze files"))
+        os.utime(str(self.root / "man1"), ns=(1, 1))
+        (self.root / "man3" / "printf.3p").unlink()
+
+        self.assertEqual(1, self.catalog.update([self.root]))
+        self.assertEqual("squeeze files",
+                         self.catalog.whatis("gzip")[0].description)
+        self.assertEqual([], self.catalog.whatis("printf"))
+
+    def test_recursive_macro_page_keeps_file_name(self):
+        self.write_page("man1/loop.1", ".de XX\n.XX\n..\n.XX\n"
+                                       ".SH NAME\nloop \\- never read\n")
+
+        self.catalog.update([self.root])
+
+        entry, = self.catalog.whatis("loop")
+        self.assertEqual(("1", ""), (entry.section, entry.description))
+
+    def test_missing_root_removes_its_pages(self):
+        self.catalog.update([self.root])
+
+        self.catalog.update([])
+
+        self.assertEqual(0, len(self.catalog))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import man2html
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+class CliTests(unittest.TestCase):
+    '''Тестирование запуска утилиты командной строки'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config = os.path.join(self.directory.name, "manpath.config")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_config(self, text):
+        with open(self.config, "w") as f:
+            f.write(text)
+
+    def test_import_does_not_load_translator(self):
+        code = ("import sys, man2html; "
+                "print(any(name.split('.')[0] == 'dominate' "
+                "or name == 'core.man2html_translator' "
+                "for name in sys.modules))")
+
+        output = subprocess.check_output([sys.executable, "-c", code],
+                                         cwd=ROOT, universal_newlines=True)
+
+        self.assertEqual("False", output.strip())
+
+    def test_man_path_skips_empty_lines_and_comments(self):
+        self.write_config("# comment\n\nMANDATORY_MANPATH /usr/man\n"
+                          "MANDATORY_MANPATH /usr/man\n")
+
+        actual = man2html.read_man_path(self.config, path="")
+
+        self.assertEqual(["/usr/man"], actual)
+
+    def test_man_path_map_uses_program_directories(self):
+        self.write_config("MANPATH_MAP /bin /usr/share/man\n"
+                          "MANPATH_MAP /opt/bin /opt/man\n")
+
+        actual = man2html.read_man_path(
+            self.config, path=os.pathsep.join(["/usr/bin", "/bin"]))
+
+        self.assertEqual(["/usr/share/man"], actual)
+
+    def test_missing_config_gives_empty_man_path(self):
+        actual = man2html.read_man_path(
+            os.path.join(self.directory.name, "missing"))
+
+        self.assertEqual([], actual)
+
+    def test_name_with_directory_is_file_path(self):
+        self.assertTrue(man2html.is_file_path(os.path.join(".", "ls.1")))
+        self.assertFalse(man2html.is_file_path("ls"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import pathlib
+import tempfile
+import unittest
+
+from core.args_parser import ArgsParser
+from core.cross_references import PageSet, CrossReferenceLinker, \
+    SERVER_HREF_FORMAT
+from core.man2html_translator import Man2HtmlTranslator
+from core.man_index import ManIndex
+from core.page_split import relocate_links
+from core.page_ir import ELEMENT
+
+
+class CrossReferenceTests(unittest.TestCase):
+    '''Тестирование гиперссылок на другие страницы'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.directory.name)
+        for relative in ("man1/ls.1.gz", "man3/printf.3p", "man3/printf.3"):
+            (root / relative).parent.mkdir(exist_ok=True)
+            (root / relative).write_bytes(b"")
+        self.pages = PageSet.from_index(ManIndex.build([root]))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def translate(self, lines, linker):
+        translator = Man2HtmlTranslator(ArgsParser(), strict_mode=False,
+                                        linker=linker)
+        return translator.translate(lines)
+
+    def test_page_set_is_built_from_index(self):
+        self.assertIn(("ls", "1"), self.pages)
+        self.assertIn(("printf", "3p"), self.pages)
+        self.assertNotIn(("cat", "1"), self.pages)
+        self.assertEqual(("3", "man3", "printf.3"),
+                         self.pages.find("printf", "3"))
+
+    def test_only_existing_pages_are_linked(self):
+        html = self.translate([".BR ls (1),", ".BR cat (1)"],
+                              CrossReferenceLinker(self.pages))
+
+        self.assertIn('<a href="../man1/ls.1.html">', html)
+        self.assertNotIn("cat.1", html)
+
+    def test_section_is_matched_by_prefix(self):
+        pages = PageSet({("tar", "1"): ("1x", "man1", "tar.1x"),
+                         ("tar", "1x"): ("1x", "man1", "tar.1x")})
+        linker = CrossReferenceLinker(pages, SERVER_HREF_FORMAT)
+
+        self.assertEqual("/man/1x/tar", linker.href("tar", "1"))
+        html = self.translate([".IR tar (1)"], linker)
+
+        self.assertIn('<a href="/man/1x/tar"><i>tar</i></a>(1)', html)
+
+    def test_links_change_output_variant(self):
+        translator = Man2HtmlTranslator(ArgsParser(), strict_mode=False)
+        plain = translator.output_variant
+
+        translator.linker = CrossReferenceLinker(self.pages)
+
+        self.assertNotEqual(plain, translator.output_variant)
+        self.assertNotEqual(CrossReferenceLinker(self.pages).variant,
+                            CrossReferenceLinker(PageSet()).variant)
+
+    def test_section_files_get_relocated_links(self):
+        instructions = [(ELEMENT, 'a', (('href', '../man1/ls.1.html'),)),
+                        (ELEMENT, 'a', (('href', '/man/1/ls'),))]
+
+        relocated = relocate_links(instructions)
+
+        self.assertEqual((('href', '../../man1/ls.1.html'),),
+                         relocated[0][2])
+        self.assertEqual(instructions[1], relocated[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
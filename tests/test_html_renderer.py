@@ -0,0 +1,59 @@
+import datetime
+import unittest
+
+from core.args_parser import ArgsParser
+import core.man2html_translator as man2html_translator
+from core.html_renderer import StylesheetHtmlRenderer, style_class
+
+
+class StylesheetHtmlRendererTests(unittest.TestCase):
+    '''Тестирование рендеринга стилей абзацев классами css'''
+    def setUp(self):
+        man2html_translator.now = lambda: datetime.datetime(1, 1, 1, 1, 1, 1)
+        self.lines = [".TH LS 1", ".SH NAME", "ls", ".PP", "text",
+                      ".TP", ".B \\-a", "all", ".TP", ".B \\-b", "both"]
+
+    def translate(self, renderer):
+        translator = man2html_translator.Man2HtmlTranslator(
+            ArgsParser(), strict_mode=False, renderer=renderer)
+        return translator.translate(self.lines)
+
+    def test_styles_become_classes_in_style_block(self):
+        html = self.translate(StylesheetHtmlRenderer())
+
+        paragraph = style_class(
+            "-webkit-margin-before:0.4em;-webkit-margin-after:0.4em")
+        item = style_class("text-indent:5en")
+        self.assertNotIn("style=", html)
+        self.assertNotIn("text-indent=", html)
+        self.assertIn('<dd class="{}">'.format(item), html)
+        self.assertIn('<p class="{}">'.format(paragraph), html)
+        self.assertEqual(1, html.count(".{}{{".format(item)))
+        self.assertIn("<style>", html)
+
+    def test_page_is_smaller_than_with_style_attributes(self):
+        plain = self.translate(None)
+
+        html = self.translate(StylesheetHtmlRenderer())
+
+        self.assertLess(len(html), len(plain))
+
+    def test_external_stylesheet_is_linked_instead_of_style_block(self):
+        renderer = StylesheetHtmlRenderer("../man2html.css")
+
+        html = self.translate(renderer)
+
+        self.assertIn('<link href="../man2html.css" rel="stylesheet">',
+                      html)
+        self.assertNotIn("<style>", html)
+        self.assertIn("text-indent:5en", renderer.rules.values())
+
+    def test_class_names_do_not_depend_on_page(self):
+        self.assertEqual(style_class("text-indent:5en"),
+                         style_class("text-indent:5en"))
+        self.assertNotEqual(style_class("text-indent:5en"),
+                            style_class("text-indent:6en"))
+
+
+if __name__ == "__main__":
+    unittest.main()
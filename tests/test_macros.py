@@ -0,0 +1,48 @@
+import unittest
+
+from core.args_parser import ArgsParser
+from core.macros import Macro, MacroCache
+
+
+class MacroTests(unittest.TestCase):
+    '''Тестирование компиляции и раскрытия макросов'''
+    def setUp(self):
+        self.parser = ArgsParser()
+
+    def test_substitutes_numbered_arguments(self):
+        macro = Macro.compile(['.BR \\\\$1 (\\\\$2)\n', 'text\n'],
+                              self.parser)
+
+        expanded = macro.expand(['ls', '1'])
+
+        self.assertEqual([['.BR', 'ls', '(1)'], ['text']], expanded)
+
+    def test_missing_argument_is_empty(self):
+        macro = Macro.compile(['.B \\$1\\$3'], self.parser)
+
+        self.assertEqual([['.B', 'a']], macro.expand(['a', 'b']))
+
+    def test_argument_expanding_to_nothing_is_dropped(self):
+        macro = Macro.compile(['.BR \\$1 \\$2'], self.parser)
+
+        self.assertEqual([['.BR', 'ls']], macro.expand(['ls']))
+        self.assertEqual([['.BR']], macro.expand([]))
+
+    def test_all_arguments_token_is_spliced(self):
+        macro = Macro.compile(['.I \\\\$*'], self.parser)
+
+        self.assertEqual([['.I', 'a', 'b']], macro.expand(['a', 'b']))
+
+    def test_cache_compiles_same_body_once(self):
+        cache = MacroCache()
+        lines = ['.B \\\\$1\n']
+
+        first = cache.compile(lines, self.parser)
+        second = cache.compile(list(lines), self.parser)
+
+        self.assertIs(first, second)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+
+if __name__ == "__main__":
+    unittest.main()
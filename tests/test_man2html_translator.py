@@ -1,6 +1,7 @@
 import unittest
 
 import datetime
+import io
 import dominate
 
 from core.args_parser import ArgsParser
@@ -78,6 +79,99 @@ class Man2HtmlProcessorTests(unittest.TestCase):
 
         self.assertEqual(expected, actual)
 
+    def test_streaming_output_equals_compiled_page(self):
+        lines = [".TH LS 1 2020 GNU \"User Commands\"", ".SH NAME",
+                 "ls \\- list <files> & dirs", ".SH OPTIONS", ".TP",
+                 ".B \\-a", "do not ignore", ".TP", ".BR \\-b \" (1)\"",
+                 "print escapes", ".PP", "text", ".I italic", ".SS Sub",
+                 "tail"]
+        expected = self.translator.translate(lines)
+        output = io.StringIO()
+
+        self.translator.translate_to_stream(lines, output)
+
+        self.assertEqual(expected, output.getvalue())
+
+    def test_streaming_empty_page_equals_compiled_page(self):
+        output = io.StringIO()
+
+        self.translator.translate_to_stream([], output)
+
+        self.assertEqual(self.empty_man_page_html(), output.getvalue())
+
+    def test_streaming_writes_closed_sections_before_input_ends(self):
+        output = io.StringIO()
+        written_before_end = []
+
+        def lines():
+            yield ".TH title"
+            yield ".SH FIRST"
+            yield "text"
+            yield ".SH SECOND"
+            yield "more"
+            written_before_end.append(output.getvalue())
+
+        self.translator.translate_to_stream(lines(), output)
+
+        self.assertIn("<h2>FIRST</h2>", written_before_end[0])
+        self.assertNotIn("</html>", written_before_end[0])
+
+    def test_user_macros_expand_like_their_body(self):
+        lines = [".de Op", ".RB [ \\\\$1 ]", "..", ".Op \\-v"]
+        expected = self.translator.translate([".RB [ \\-v ]"])
+
+        actual = self.translator.translate(lines)
+
+        self.assertEqual(expected, actual)
+
+    def test_macro_called_without_arguments_translates(self):
+        lines = [".de Op", ".B \\\\$1", "..", "text", ".Op"]
+
+        actual = self.translator.translate(lines)
+
+        self.assertIn("text", actual)
+
+    def test_missing_macro_argument_adds_no_empty_element(self):
+        lines = [".de Bx", ".BR \\\\$1 \\\\$2", "..", ".Bx ls"]
+        expected = self.translator.translate([".BR ls"])
+
+        actual = self.translator.translate(lines)
+
+        self.assertEqual(expected, actual)
+        self.assertNotIn("<span></span>", actual)
+
+    def test_macros_are_compiled_once_per_translator(self):
+        lines = [".de Op", ".B \\\\$1", "..", ".Op a", ".Op b"]
+
+        self.translator.translate(lines)
+        self.translator.translate(lines)
+
+        self.assertEqual(1, self.translator.macro_cache.misses)
+        self.assertEqual(1, self.translator.macro_cache.hits)
+
+    def test_strict_mode_is_part_of_output_variant(self):
+        lenient = man2html_translator.Man2HtmlTranslator(ArgsParser(),
+                                                         strict_mode=False)
+
+        self.assertNotEqual(self.translator.output_variant,
+                            lenient.output_variant)
+
+    def test_subclass_handlers_override_command_table(self):
+        class CountingTranslator(man2html_translator.Man2HtmlTranslator):
+            calls = 0
+
+            def handle_SH(self, state, *args):
+                CountingTranslator.calls += 1
+                super().handle_SH(state, *args)
+
+        translator = CountingTranslator(ArgsParser())
+        translator.translate([".SH NAME", "text", ".SH SYNOPSIS"])
+
+        self.assertEqual(2, CountingTranslator.calls)
+        base = man2html_translator.Man2HtmlTranslator.commands
+        self.assertIs(base[".B"], CountingTranslator.commands[".B"])
+        self.assertIsNot(base[".SH"], CountingTranslator.commands[".SH"])
+
 
 if __name__ == "__main__":
     unittest.main()
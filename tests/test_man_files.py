@@ -0,0 +1,87 @@
+import bz2
+import gzip
+import lzma
+import os
+import tempfile
+import unittest
+
+from core import man_files
+
+TEXT = ".TH LS 1\n.SH NAME\nls \\- list\x0cdirectory é\n"
+
+
+class ManFileTests(unittest.TestCase):
+    '''Тестирование чтения файлов страниц'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, data: bytes):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def read(self, path, chunk_size=man_files.CHUNK_SIZE):
+        with man_files.ManFile(path, "utf-8", chunk_size) as f:
+            return list(f)
+
+    def test_reads_lines_like_text_file(self):
+        path = self.write("ls.1", TEXT.encode("utf-8"))
+
+        with open(path, encoding="utf-8") as f:
+            expected = list(f)
+
+        self.assertEqual(expected, self.read(path))
+        self.assertEqual(expected, self.read(path, chunk_size=3))
+
+    def test_decompresses_by_suffix_format(self):
+        expected = self.read(self.write("ls.1", TEXT.encode("utf-8")))
+
+        for name, compress in (("ls.1.gz", gzip.compress),
+                               ("ls.1.bz2", bz2.compress),
+                               ("ls.1.xz", lzma.compress)):
+            path = self.write(name, compress(TEXT.encode("utf-8")))
+
+            self.assertEqual(expected, self.read(path, chunk_size=5), name)
+
+    def test_format_is_detected_by_magic_bytes(self):
+        path = self.write("ls.1", bz2.compress(TEXT.encode("utf-8")))
+
+        self.assertEqual(TEXT.splitlines(True)[:2], self.read(path)[:2])
+
+    def test_translates_line_endings(self):
+        path = self.write("ls.1", b".TH LS 1\r\n.SH NAME\rls\r")
+
+        self.assertEqual([".TH LS 1\n", ".SH NAME\n", "ls\n"],
+                         self.read(path, chunk_size=1))
+
+    def test_concatenated_gzip_members_are_read(self):
+        data = gzip.compress(b".TH LS 1\n") + gzip.compress(b"ls\n")
+        path = self.write("ls.1.gz", data)
+
+        self.assertEqual([".TH LS 1\n", "ls\n"], self.read(path))
+
+    def test_truncated_file_raises(self):
+        path = self.write("ls.1.xz", lzma.compress(b".TH LS 1\n")[:-8])
+
+        with self.assertRaises(EOFError):
+            self.read(path)
+
+    def test_empty_file_has_no_lines(self):
+        self.assertEqual([], self.read(self.write("ls.1", b"")))
+        self.assertEqual([], self.read(self.write("ls.1.gz", b"")))
+
+    def test_decoded_bytes_equal_read_file(self):
+        data = gzip.compress(TEXT.encode("utf-8"))
+        path = self.write("ls.1.gz", data)
+
+        actual = list(man_files.decode_man_bytes(data, path, "utf-8"))
+
+        self.assertEqual(self.read(path), actual)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+from core.man_index import ManIndex, split_page_name
+
+
+class ManIndexTests(unittest.TestCase):
+    '''Тестирование индекса страниц man'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.first = pathlib.Path(self.directory.name, "first")
+        self.second = pathlib.Path(self.directory.name, "second")
+        self.cache = pathlib.Path(self.directory.name, "cache", "index.json")
+        for relative in ("first/man1/ls.1.gz", "first/man3/printf.3.bz2",
+                         "first/man3/printf.3p.xz", "first/man1/printf.1",
+                         "second/man1/ls.1", "second/man8/mount.8.gz"):
+            path = pathlib.Path(self.directory.name, relative)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_splits_suffixed_section(self):
+        self.assertEqual(("printf", "3p"),
+                         split_page_name("printf.3p.gz", "3"))
+        self.assertIsNone(split_page_name("README", "1"))
+
+    def test_finds_page_by_name_and_section(self):
+        index = ManIndex.build([self.first, self.second])
+
+        self.assertEqual(self.first / "man3" / "printf.3.bz2",
+                         index.find("printf", 3))
+        self.assertEqual(self.first / "man3" / "printf.3p.xz",
+                         index.find("printf", "3p"))
+        self.assertIsNone(index.find("printf", 5))
+
+    def test_lookup_without_section_follows_section_then_root_order(self):
+        index = ManIndex.build([self.first, self.second])
+
+        self.assertEqual(self.first / "man1" / "printf.1",
+                         index.find("printf"))
+        self.assertEqual(self.first / "man1" / "ls.1.gz", index.find("ls"))
+        self.assertEqual(self.second / "man8" / "mount.8.gz",
+                         index.find("mount"))
+
+    def test_saved_index_is_reused_until_directory_changes(self):
+        roots = [self.first, self.second]
+        ManIndex.load(roots, self.cache)
+        self.assertTrue(self.cache.is_file())
+
+        (self.second / "man1" / "cp.1").write_text("")
+        man1 = str(self.second / "man1")
+        stat = os.stat(man1)
+        os.utime(man1, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        index = ManIndex.load(roots, self.cache)
+
+        self.assertEqual(self.second / "man1" / "cp.1", index.find("cp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,6 +13,35 @@ class ManProcessStateTests(unittest.TestCase):
         self.assertEqual("", state.source)
         self.assertEqual("", state.manual)
 
+    def test_lines_are_read_lazily(self):
+        consumed = []
+
+        def lines():
+            for line in ["first", "second", "third"]:
+                consumed.append(line)
+                yield line
+
+        state = ManProcessState(lines())
+
+        self.assertEqual("first", state.peek_line())
+        self.assertEqual("second", state.peek_line(1))
+        self.assertEqual(["first", "second"], consumed)
+        self.assertEqual("first", state.pop_line())
+        self.assertEqual(1, state.index)
+
+    def test_pop_lines_until_skips_terminator(self):
+        state = ManProcessState([".B x", "..\n", "after"])
+
+        self.assertEqual([".B x"], state.pop_lines_until(".."))
+        self.assertEqual("after", state.pop_line())
+        self.assertFalse(state.has_more_lines())
+
+    def test_pop_lines_until_stops_at_end_without_terminator(self):
+        state = ManProcessState([".B x", ".I y"])
+
+        self.assertEqual([".B x", ".I y"], state.pop_lines_until(".."))
+        self.assertFalse(state.has_more_lines())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+import dominate.tags as tags
+
+from core.nodes import Element, text_element, bold, italic, roman
+
+
+class NodesTests(unittest.TestCase):
+    '''Тестирование компактных узлов страницы'''
+    def test_text_is_escaped_once_on_add(self):
+        paragraph = Element('p', 'a < b & "c"')
+
+        self.assertEqual(['a &lt; b &amp; &quot;c&quot;'],
+                         paragraph.children)
+
+    def test_iterables_are_flattened(self):
+        element = Element('p', (text for text in ["a", "b"]), [bold("c")])
+
+        self.assertEqual(3, len(element))
+
+    def test_attributes_are_created_on_demand(self):
+        element = Element('dd')
+        self.assertIsNone(element.attributes)
+
+        element.set_attribute("text-indent", "5en")
+
+        self.assertEqual({"text-indent": "5en"}, element.attributes)
+
+    def test_render_equals_dominate(self):
+        expected_list = tags.dl()
+        expected_list.add(tags.dt(" ", tags.b("-a"), tags.i("x")))
+        body = tags.p(" text ", tags.span("<roman>"), tags.br(),
+                      style="margin:0")
+        expected_list.add(tags.dd(body, **{"text-indent": "5en"}))
+        expected = tags.div(tags.h2("NAME & more"), expected_list,
+                            tags.p())
+
+        actual_list = Element('dl')
+        actual_list.add(Element('dt', " ", bold("-a"), italic("x")))
+        actual_body = Element('p', " text ", roman("<roman>"), Element('br'),
+                              attributes={"style": "margin:0"})
+        actual_list.add(Element('dd', actual_body,
+                                attributes={"text-indent": "5en"}))
+        actual = Element('div', text_element('h2', "NAME & more"),
+                         actual_list, Element('p'))
+
+        self.assertEqual(expected.render(), actual.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import datetime
+import unittest
+
+from core.args_parser import ArgsParser
+import core.man2html_translator as man2html_translator
+from core.html_renderer import HtmlRenderer
+from core.page_ir import PageIr, HEADING, PARAGRAPH, LIST, ITEM_TAG, \
+    ITEM_BODY, FONT, TEXT, END
+
+
+class PageIrTests(unittest.TestCase):
+    '''Тестирование промежуточного представления страницы'''
+    def setUp(self):
+        self.translator = man2html_translator.Man2HtmlTranslator(
+            ArgsParser(), strict_mode=False)
+        # время не должно меняться в течение одного теста
+        man2html_translator.now = lambda: datetime.datetime(1, 1, 1, 1, 1, 1)
+        self.lines = [".TH LS 1 2020 GNU \"User Commands\"", ".SH NAME",
+                      "ls \\- list <files> & \"dirs\"", ".SH OPTIONS",
+                      ".TP", ".B \\-a", "do not ignore", ".TP",
+                      ".BR \\-b \" (1)\"", "print", ".PP", "text",
+                      ".I italic", ".br", ".SS Sub", "tail"]
+
+    def test_rendered_ir_equals_translated_page(self):
+        expected = self.translator.translate(self.lines)
+
+        actual = self.translator.render_ir(self.translator.compile_ir(
+            self.lines))
+
+        self.assertEqual(expected, actual)
+
+    def test_empty_page_renders_like_translated_page(self):
+        expected = self.translator.translate([])
+
+        actual = self.translator.render_ir(self.translator.compile_ir([]))
+
+        self.assertEqual(expected, actual)
+
+    def test_serialized_ir_renders_the_same(self):
+        page = self.translator.compile_ir(self.lines)
+
+        restored = PageIr.loads(page.dumps())
+
+        self.assertEqual(page.instructions, restored.instructions)
+        self.assertEqual("LS", restored.title)
+        self.assertEqual(self.translator.render_ir(page),
+                         self.translator.render_ir(restored))
+
+    def test_instructions_describe_page_structure(self):
+        page = self.translator.compile_ir(
+            [".SH NAME", ".TP", ".B \\-a", "all"])
+
+        style = "-webkit-margin-before:0.4em;-webkit-margin-after:0.4em"
+        self.assertEqual([(HEADING, 2, "NAME"),
+                          (LIST,),
+                          (ITEM_TAG,), (TEXT, " "), (FONT, "B", "-a"), (END,),
+                          (ITEM_BODY, "5en"),
+                          (PARAGRAPH, style), (TEXT, " all"), (END,),
+                          (END,),
+                          (END,)], page.instructions)
+
+    def test_renderer_can_be_replaced_without_reparsing(self):
+        class TitledRenderer(HtmlRenderer):
+            def render_head_elements(self, page, sb):
+                sb.append("    <title>{}</title>\n".format(page.title))
+
+        page = self.translator.compile_ir(self.lines)
+
+        html = self.translator.render_ir(page, TitledRenderer())
+
+        self.assertIn("<title>LS</title>", html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import datetime
+import unittest
+
+from core.args_parser import ArgsParser
+import core.man2html_translator as man2html_translator
+from core.html_renderer import StylesheetHtmlRenderer
+from core.page_ir import HEADING, TEXT
+from core.page_split import split_sections, section_file_name
+
+
+class PageSplitTests(unittest.TestCase):
+    '''Тестирование деления страницы на разделы'''
+    def setUp(self):
+        man2html_translator.now = lambda: datetime.datetime(1, 1, 1, 1, 1, 1)
+        self.translator = man2html_translator.Man2HtmlTranslator(
+            ArgsParser(), strict_mode=False)
+        self.lines = [".TH LS 1", "intro", ".SH NAME", "ls \\- list",
+                      ".SH DESCRIPTION", "text", ".SS Sorting", "sorted",
+                      ".SH SEE ALSO", "dir"]
+
+    def test_sections_start_at_top_level_headings(self):
+        page = self.translator.compile_ir(self.lines)
+
+        preamble, sections = split_sections(page.instructions)
+
+        self.assertEqual(["NAME", "DESCRIPTION", "SEE ALSO"],
+                         [section.title for section in sections])
+        self.assertEqual((TEXT, " intro"), preamble[1])
+        self.assertEqual((HEADING, 2, "NAME"), sections[0].instructions[0])
+        self.assertEqual(["Sorting"], sections[1].subsections())
+
+    def test_file_names_are_numbered_slugs(self):
+        self.assertEqual("03-see-also.html", section_file_name(3, "SEE ALSO"))
+        self.assertEqual("01-имя.html", section_file_name(1, "ИМЯ"))
+        self.assertEqual("02-section.html", section_file_name(2, "..."))
+
+    def test_index_links_sections_and_sections_link_back(self):
+        index, sections = self.translator.translate_sections(self.lines,
+                                                              "ls.1")
+
+        self.assertEqual(["01-name.html", "02-description.html",
+                          "03-see-also.html"],
+                         [name for name, _ in sections])
+        self.assertIn('<a href="ls.1/02-description.html">Sorting</a>',
+                      index)
+        self.assertIn("intro", index)
+        self.assertNotIn("sorted", index)
+        self.assertIn('<a href="../ls.1.html">LS(1)</a>', sections[1][1])
+        self.assertIn("sorted", sections[1][1])
+        self.assertNotIn("<h2>NAME</h2>", sections[1][1])
+
+    def test_shared_stylesheet_link_is_relative_to_section_file(self):
+        translator = man2html_translator.Man2HtmlTranslator(
+            ArgsParser(), strict_mode=False,
+            renderer=StylesheetHtmlRenderer("../man2html.css"))
+
+        index, sections = translator.translate_sections(self.lines, "ls.1")
+
+        self.assertIn('href="../man2html.css"', index)
+        self.assertIn('href="../../man2html.css"', sections[0][1])
+        self.assertEqual("../man2html.css", translator.renderer.href)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import concurrent.futures
+import unittest
+
+from core.pipeline import Pipeline
+
+
+class PipelineTests(unittest.TestCase):
+    '''Тестирование конвейера чтения, перевода и записи'''
+    def setUp(self):
+        self.executor = concurrent.futures.ThreadPoolExecutor(2)
+        self.written = []
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def run_pipeline(self, tasks, read):
+        pipeline = Pipeline(
+            read, lambda items: [item * 10 for item in items],
+            self.written.extend, self.executor,
+            is_result=lambda item: isinstance(item, str),
+            readers=3, queue_size=2, chunk_size=4)
+        pipeline.run(tasks)
+        return pipeline
+
+    def test_every_task_passes_all_stages(self):
+        pipeline = self.run_pipeline(range(50), lambda task: task)
+
+        self.assertEqual([n * 10 for n in range(50)], sorted(self.written))
+        self.assertEqual([50, 50, 50],
+                         [metrics.items for metrics in pipeline.stages])
+
+    def test_ready_results_skip_translation(self):
+        pipeline = self.run_pipeline(
+            range(4), lambda task: "failed" if task == 2 else task)
+
+        self.assertEqual(["failed", 0, 10, 30], sorted(
+            self.written, key=lambda item: -1 if item == "failed" else item))
+        self.assertEqual(3, pipeline.stages[1].items)
+
+    def test_translation_errors_are_raised(self):
+        def translate(items):
+            raise RuntimeError("broken")
+
+        pipeline = Pipeline(lambda task: task, translate,
+                            self.written.extend, self.executor,
+                            is_result=lambda item: False, readers=2)
+
+        with self.assertRaises(RuntimeError):
+            pipeline.run(range(100))
+        self.assertEqual([], self.written)
+
+    def test_write_errors_are_raised(self):
+        def write(results):
+            raise OSError("disk full")
+
+        pipeline = Pipeline(lambda task: task, lambda items: items, write,
+                            self.executor, is_result=lambda item: False,
+                            readers=2, queue_size=2, chunk_size=1)
+
+        with self.assertRaises(OSError):
+            pipeline.run(range(1000))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import gzip
+import pathlib
+import tempfile
+import unittest
+
+from core.precompressed import compress_output, gzip_bytes, \
+    gzip_is_current, gzip_path
+
+HTML = "<html>страница</html>".encode("utf-8")
+
+
+class PrecompressedTests(unittest.TestCase):
+    '''Тестирование сжатых копий готовых страниц'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.directory.name, "ls.1.html")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_gzip_bytes_are_readable_and_stable(self):
+        data = gzip_bytes(HTML)
+
+        self.assertEqual(HTML, gzip.decompress(data))
+        self.assertEqual(data, gzip_bytes(HTML))
+
+    def test_gzip_path_adds_suffix(self):
+        self.assertEqual("ls.1.html.gz", gzip_path(self.path).name)
+
+    def test_existing_file_with_same_content_is_current(self):
+        gzip_path(self.path).write_bytes(gzip_bytes(HTML))
+
+        self.assertTrue(gzip_is_current(gzip_path(self.path), HTML))
+        self.assertFalse(gzip_is_current(gzip_path(self.path),
+                                         HTML + b" "))
+        self.assertIsNone(compress_output(self.path, HTML))
+
+    def test_missing_or_broken_file_is_compressed(self):
+        self.assertEqual(HTML, gzip.decompress(
+            compress_output(self.path, HTML)))
+
+        gzip_path(self.path).write_bytes(b"not gzip")
+
+        self.assertFalse(gzip_is_current(gzip_path(self.path), HTML))
+
+
+if __name__ == "__main__":
+    unittest.main()
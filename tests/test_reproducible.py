@@ -0,0 +1,79 @@
+import datetime
+import os
+import pathlib
+import tempfile
+import unittest
+
+from core.args_parser import ArgsParser
+from core.man2html_translator import Man2HtmlTranslator
+from core.reproducible import FixedClock, HashManifest, page_clock, \
+    source_date_epoch, SOURCE_DATE_EPOCH
+
+PAGE = [".TH LS 1", ".SH NAME", "ls"]
+
+
+class ReproducibleTests(unittest.TestCase):
+    '''Тестирование воспроизводимого перевода и манифеста хешей'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_source_date_epoch_is_read_from_environment(self):
+        self.assertEqual(1700000000,
+                         source_date_epoch({SOURCE_DATE_EPOCH: "1700000000"}))
+        self.assertIsNone(source_date_epoch({SOURCE_DATE_EPOCH: ""}))
+        self.assertIsNone(source_date_epoch({}))
+        with self.assertRaises(ValueError):
+            source_date_epoch({SOURCE_DATE_EPOCH: "yesterday"})
+
+    def test_fixed_clock_uses_utc(self):
+        clock = FixedClock(0)
+
+        self.assertEqual(datetime.datetime(1970, 1, 1,
+                                           tzinfo=datetime.timezone.utc),
+                         clock())
+
+    def test_page_clock_prefers_epoch_over_mtime(self):
+        path = self.root / "ls.1"
+        path.write_text("", encoding="utf-8")
+        os.utime(str(path), (1000, 1000))
+
+        self.assertEqual(1000, page_clock(path).timestamp)
+        self.assertEqual(5, page_clock(path, 5).timestamp)
+
+    def test_translation_is_byte_identical(self):
+        first = Man2HtmlTranslator(ArgsParser(), clock=FixedClock(1))
+        second = Man2HtmlTranslator(ArgsParser(), clock=FixedClock(1))
+
+        self.assertEqual(first.translate(PAGE), second.translate(PAGE))
+        self.assertIn("UTC", first.translate(PAGE))
+
+    def test_clock_is_part_of_output_variant(self):
+        first = Man2HtmlTranslator(ArgsParser(), clock=FixedClock(1))
+        second = Man2HtmlTranslator(ArgsParser(), clock=FixedClock(2))
+
+        self.assertNotEqual(first.output_variant, second.output_variant)
+
+    def test_manifest_skips_unchanged_files(self):
+        path = self.root / "man1" / "ls.1.html"
+        path.parent.mkdir()
+        manifest = HashManifest.load(self.root)
+        manifest.write(path, "<html>", "utf-8")
+        manifest.save()
+        os.utime(str(path), (1, 1))
+
+        manifest = HashManifest.load(self.root)
+        manifest.write(path, "<html>", "utf-8")
+        unchanged = manifest.unchanged
+        manifest.write(path, "<html>changed", "utf-8")
+
+        self.assertEqual(1, unchanged)
+        self.assertEqual("<html>changed", path.read_text(encoding="utf-8"))
+        self.assertEqual(["man1/ls.1.html"], list(manifest.hashes))
+
+
+if __name__ == "__main__":
+    unittest.main()
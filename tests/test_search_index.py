@@ -0,0 +1,105 @@
+import pathlib
+import sqlite3
+import tempfile
+import unittest
+
+from core.args_parser import ArgsParser
+from core.man2html_translator import Man2HtmlTranslator
+from core.search_index import SearchIndex, IndexVersionError, \
+    search_query, page_name
+
+
+class SearchIndexTests(unittest.TestCase):
+    '''Тестирование поискового индекса страниц'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.directory.name, "search.db")
+        self.translator = Man2HtmlTranslator(ArgsParser(), strict_mode=False,
+                                             collect_text=True)
+        self.lines = [".TH LS 1", ".SH NAME", "ls \\- list directory",
+                      ".SH OPTIONS", ".TP", "\\fB\\-a\\fR, \\fB\\-\\-all\\fR",
+                      "do not ignore entries starting with .",
+                      ".SS Sorting", ".B sort", "by name"]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def fields(self, lines):
+        self.translator.translate(lines)
+        return self.translator.page_text.fields()
+
+    def test_translator_collects_headings_options_and_body(self):
+        headings, options, body = self.fields(self.lines)
+
+        self.assertEqual("NAME\nOPTIONS\nSorting", headings)
+        self.assertEqual("-a, --all", options)
+        self.assertIn("ls - list directory", body)
+        self.assertIn("sort by name", body)
+        self.assertNotIn("-a", body)
+
+    def test_text_is_not_collected_by_default(self):
+        translator = Man2HtmlTranslator(ArgsParser(), strict_mode=False)
+
+        translator.translate(self.lines)
+
+        self.assertIsNone(translator.page_text)
+
+    def test_search_finds_pages_with_all_words(self):
+        with SearchIndex.create(self.path) as index:
+            index.add("/man/man1/ls.1.gz", self.fields(self.lines))
+            index.add("/man/man1/cat.1", self.fields(
+                [".SH NAME", "cat \\- concatenate files"]))
+
+        with SearchIndex.open(self.path) as index:
+            self.assertEqual(["ls"], [result.name for result in
+                                      index.search(["--all"])])
+            self.assertEqual(["cat"], [result.name for result in
+                                       index.search(["concat*", "files"])])
+            self.assertEqual([], index.search(["list", "files"]))
+            self.assertEqual([], index.search(["ls"], section="5"))
+
+    def test_read_only_index_is_not_rebuilt(self):
+        with SearchIndex.create(self.path) as index:
+            index.add("/man/man1/ls.1", self.fields(self.lines))
+        connection = sqlite3.connect(str(self.path))
+        connection.execute("PRAGMA user_version = 1000")
+        connection.commit()
+        connection.close()
+        data = self.path.read_bytes()
+
+        with self.assertRaises(IndexVersionError):
+            SearchIndex.open(self.path)
+
+        self.assertEqual(data, self.path.read_bytes())
+
+    def test_exact_name_is_found_first(self):
+        with SearchIndex.create(self.path) as index:
+            index.add("/man/man1/ls.1", self.fields(self.lines))
+            index.add("/man/man1/dir.1", self.fields(
+                [".SH NAME", "dir \\- like ls ls ls"]))
+
+            self.assertEqual("ls", index.search(["ls"])[0].name)
+
+    def test_pages_are_replaced_and_indexes_merged(self):
+        other = pathlib.Path(self.directory.name, "other.db")
+        with SearchIndex.create(other) as index:
+            index.add("/man/man1/cat.1", self.fields([".SH NAME", "cat"]))
+            index.add("/man/man1/ls.1", self.fields([".SH NAME", "new"]))
+
+        with SearchIndex.create(self.path) as index:
+            index.add("/man/man1/ls.1", self.fields(self.lines))
+            index.merge(other)
+
+            self.assertEqual(2, len(index))
+            self.assertEqual([], index.search(["directory"]))
+            self.assertEqual(["ls"], [result.name for result in
+                                      index.search(["new"])])
+
+    def test_query_words_are_quoted(self):
+        self.assertEqual('"--all" "a""b" "comp"*',
+                         search_query(["--all", 'a"b', "comp*", "*"]))
+        self.assertEqual(("printf", "3p"), page_name("man3/printf.3p.gz"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import asyncio
+import concurrent.futures
+import pathlib
+import tempfile
+import unittest
+
+from core import batch
+from core.server import ManPageServer, PageLru, Page
+
+
+class ManPageServerTests(unittest.TestCase):
+    '''Тестирование HTTP-сервера страниц man'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.page = pathlib.Path(self.directory.name, "ls.1")
+        self.page.write_text(".TH LS 1\n.SH NAME\nls\n", encoding="utf-8")
+        self.lookups = []
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, initializer=batch.init_worker, initargs=(False,))
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.directory.cleanup()
+
+    def lookup(self, name, section):
+        self.lookups.append((name, section))
+        if (name, section) == ("ls", "1"):
+            return self.page
+        return None
+
+    def request(self, *requests):
+        async def run():
+            server = ManPageServer(self.lookup, self.executor)
+            listener = await server.start("127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            responses = []
+            async with listener:
+                for request in requests:
+                    reader, writer = await asyncio.open_connection(
+                        "127.0.0.1", port)
+                    writer.write(request.encode("latin-1"))
+                    responses.append(await reader.read())
+                    writer.close()
+            return responses
+
+        return asyncio.run(run())
+
+    @staticmethod
+    def etag_of(response: bytes):
+        for line in response.split(b"\r\n"):
+            if line.startswith(b"ETag: "):
+                return line[len(b"ETag: "):].decode("latin-1")
+
+    def test_serves_translated_page_and_caches_it(self):
+        first, second = self.request("GET /man/1/ls HTTP/1.1\r\n\r\n",
+                                     "GET /man/1/ls HTTP/1.1\r\n\r\n")
+
+        self.assertTrue(first.startswith(b"HTTP/1.1 200 OK"))
+        self.assertIn(b"<h2>NAME</h2>", first)
+        self.assertEqual(first, second)
+        self.assertEqual([("ls", "1")], self.lookups)
+
+    def test_matching_if_none_match_gets_not_modified(self):
+        first, = self.request("GET /man/1/ls HTTP/1.1\r\n\r\n")
+        etag = self.etag_of(first)
+
+        second, = self.request(
+            "GET /man/1/ls HTTP/1.1\r\nIf-None-Match: {}\r\n\r\n".format(
+                etag))
+
+        self.assertTrue(second.startswith(b"HTTP/1.1 304 Not Modified"))
+        self.assertTrue(second.endswith(b"\r\n\r\n"))
+
+    def test_waiters_survive_cancelled_first_request(self):
+        async def run():
+            server = ManPageServer(self.lookup, self.executor)
+            release = asyncio.Event()
+            translate = server._translate
+
+            async def slow_translate(section, name):
+                await release.wait()
+                return await translate(section, name)
+
+            server._translate = slow_translate
+            first = asyncio.ensure_future(server.get_page("1", "ls"))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(server.get_page("1", "ls"))
+            await asyncio.sleep(0)
+            first.cancel()
+            await asyncio.sleep(0)
+            release.set()
+            return await asyncio.wait_for(second, 5)
+
+        page = asyncio.run(run())
+
+        self.assertIn(b"<h2>NAME</h2>", page.body)
+
+    def test_unknown_page_is_not_found(self):
+        response, = self.request("GET /man/1/missing HTTP/1.1\r\n\r\n")
+
+        self.assertTrue(response.startswith(b"HTTP/1.1 404 Not Found"))
+
+    def test_lru_evicts_least_recently_used_page(self):
+        pages = PageLru(max_size=10)
+        pages.put("a", Page(b"aaaa"))
+        pages.put("b", Page(b"bbbb"))
+        pages.get("a")
+
+        pages.put("c", Page(b"cccc"))
+
+        self.assertIsNotNone(pages.get("a"))
+        self.assertIsNone(pages.get("b"))
+        self.assertEqual(8, pages.size)
+
+
+if __name__ == "__main__":
+    unittest.main()
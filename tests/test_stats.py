@@ -0,0 +1,47 @@
+import unittest
+
+from core.args_parser import ArgsParser
+from core.man2html_translator import Man2HtmlTranslator
+from core.stats import TranslationStats, TEXT_KEY
+
+
+class TranslationStatsTests(unittest.TestCase):
+    '''Тестирование сбора статистики перевода'''
+    def setUp(self):
+        self.stats = TranslationStats()
+        self.translator = Man2HtmlTranslator(ArgsParser(), strict_mode=False,
+                                             stats=self.stats)
+
+    def test_counts_commands_lines_and_nodes(self):
+        self.translator.translate([".TH title", ".SH NAME", "text",
+                                   ".B bold", ".XX unknown"])
+
+        data = self.stats.to_dict()
+        self.assertEqual(1, data["pages"])
+        self.assertEqual(5, data["lines_tokenized"])
+        self.assertEqual(2, data["nodes_produced"])
+        self.assertEqual(1, data["commands"][".SH"]["calls"])
+        self.assertEqual(1, data["commands"][TEXT_KEY]["calls"])
+        self.assertEqual({".XX": 1}, data["unknown_commands"])
+
+    def test_statistics_are_not_collected_by_default(self):
+        translator = Man2HtmlTranslator(ArgsParser())
+
+        translator.translate([".TH title"])
+
+        self.assertIsNone(translator.stats)
+
+    def test_merge_adds_counters(self):
+        self.translator.translate([".SH NAME", ".XX"])
+        total = TranslationStats()
+
+        total.merge(self.stats.to_dict())
+        total.merge(self.stats.to_dict())
+
+        self.assertEqual(2, total.pages)
+        self.assertEqual(2, total.commands[".SH"].calls)
+        self.assertEqual({".XX": 2}, total.unknown_commands)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import pathlib
+import tempfile
+import unittest
+
+from core.args_parser import ArgsParser
+from core.budget import TranslationBudget
+from core.man2html_translator import Man2HtmlTranslator
+from core.translation_cache import TranslationCache
+
+
+class CountingTranslator(object):
+    output_variant = "html"
+
+    def __init__(self):
+        self.calls = 0
+
+    def translate(self, lines):
+        self.calls += 1
+        return "<html>{}</html>".format("".join(lines))
+
+
+class TranslationCacheTests(unittest.TestCase):
+    '''Тестирование кеша результатов перевода'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = TranslationCache(self.directory.name)
+        self.translator = CountingTranslator()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hit_skips_translation(self):
+        first = self.cache.translate(self.translator, b"text\n", "a.1",
+                                     "utf-8")
+        second = self.cache.translate(self.translator, b"text\n", "a.1",
+                                      "utf-8")
+
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.translator.calls)
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_key_depends_on_bytes_and_encoding(self):
+        key = self.cache.key(b"text", "utf-8")
+
+        self.assertNotEqual(key, self.cache.key(b"text2", "utf-8"))
+        self.assertNotEqual(key, self.cache.key(b"text", "koi8-r"))
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = TranslationCache(self.directory.name, max_size=250)
+        keys = [cache.key(bytes([number]), "utf-8") for number in range(3)]
+        cache.put(keys[0], "a" * 100)
+        cache.put(keys[1], "b" * 100)
+        for age, key in enumerate(keys[:2]):
+            os.utime(str(cache._path(key)), ns=(age, age))
+        self.assertIsNotNone(cache.get(keys[0]))
+
+        cache.put(keys[2], "c" * 100)
+
+        remaining = sorted(path.stem for path in
+                           pathlib.Path(self.directory.name).glob("*/*"))
+        self.assertEqual(sorted([keys[0], keys[2]]), remaining)
+
+    def test_page_truncated_by_deadline_is_not_cached(self):
+        translator = Man2HtmlTranslator(
+            ArgsParser(), strict_mode=False,
+            budget=TranslationBudget(seconds=0, truncate=True))
+        data = b"text\n" * 1000
+
+        html = self.cache.translate(translator, data, "a.1", "utf-8")
+
+        self.assertIn("Page truncated: deadline exceeded", html)
+        self.assertEqual([], list(
+            pathlib.Path(self.directory.name).glob("*/*")))
+
+    def test_page_truncated_by_line_limit_is_cached(self):
+        translator = Man2HtmlTranslator(
+            ArgsParser(), strict_mode=False,
+            budget=TranslationBudget(max_lines=10, truncate=True))
+        data = b"text\n" * 1000
+
+        self.cache.translate(translator, data, "a.1", "utf-8")
+        self.cache.translate(translator, data, "a.1", "utf-8")
+
+        self.assertEqual(1, self.cache.hits)
+
+
+if __name__ == "__main__":
+    unittest.main()
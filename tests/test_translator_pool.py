@@ -0,0 +1,69 @@
+import concurrent.futures
+import datetime
+import gzip
+import unittest
+
+from core.args_parser import ArgsParser
+from core.man2html_translator import Man2HtmlTranslator
+from core.translator_pool import TranslatorPool
+
+
+def fixed_clock():
+    return datetime.datetime(1, 1, 1, 1, 1, 1)
+
+
+class TranslatorPoolTests(unittest.TestCase):
+    '''Тестирование общего для потоков API транслятора'''
+    def setUp(self):
+        self.pool = TranslatorPool(
+            lambda: Man2HtmlTranslator(ArgsParser(), strict_mode=False,
+                                       clock=fixed_clock), max_idle=2)
+        self.pages = [".TH P{0} 1\n.de XX\n.B \\\\$1\n..\n.SH NAME\n"
+                      ".XX p{0}\n.TP\n.B \\-a\nall\n".format(n).encode()
+                      for n in range(20)]
+
+    def test_threads_get_the_same_result_as_one_translator(self):
+        translator = Man2HtmlTranslator(ArgsParser(), strict_mode=False,
+                                        clock=fixed_clock)
+        expected = [translator.translate_bytes(page) for page in self.pages]
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            actual = list(executor.map(self.pool.translate_bytes,
+                                       self.pages * 10))
+
+        self.assertEqual(expected * 10, actual)
+        self.assertLessEqual(len(self.pool._idle), 2)
+
+    def test_translators_are_reused(self):
+        with self.pool.translator() as first:
+            pass
+        with self.pool.translator() as second:
+            pass
+
+        self.assertIs(first, second)
+
+    def test_command_table_is_shared_and_immutable(self):
+        first = Man2HtmlTranslator(ArgsParser())
+        second = Man2HtmlTranslator(ArgsParser())
+
+        self.assertIs(first.commands, second.commands)
+        with self.assertRaises(TypeError):
+            first.commands[".XX"] = first.commands[".B"]
+
+    def test_compressed_bytes_are_translated(self):
+        data = gzip.compress(self.pages[0])
+
+        self.assertEqual(self.pool.translate_bytes(self.pages[0]),
+                         self.pool.translate_bytes(data))
+
+    def test_unknown_commands_are_logged(self):
+        translator = Man2HtmlTranslator(ArgsParser(), strict_mode=False)
+
+        with self.assertLogs("core.man2html_translator") as logs:
+            translator.translate([".XX arg"])
+
+        self.assertIn("unknown command: .XX arg", logs.output[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import concurrent.futures
+import os
+import pathlib
+import tempfile
+import unittest
+
+from core import batch, watch
+
+
+class WatcherTests(unittest.TestCase):
+    '''Тестирование инкрементального перевода дерева man'''
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = pathlib.Path(self.directory.name, "man")
+        self.output = pathlib.Path(self.directory.name, "html")
+        (self.root / "man1").mkdir(parents=True)
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, initializer=batch.init_worker,
+            initargs=(False,))
+        self.mtime = 10 ** 18
+
+    def tearDown(self):
+        self.executor.shutdown()
+        self.directory.cleanup()
+
+    def new_watcher(self):
+        return watch.Watcher([self.root], self.output, self.executor)
+
+    def write_page(self, relative, text):
+        path = self.root / relative
+        path.write_text(text, encoding="utf-8")
+        self.touch(path)
+        self.touch(path.parent)
+
+    def touch(self, path):
+        # время задаётся явно: точность mtime файловой системы бывает
+        # грубее, чем интервал между действиями теста
+        self.mtime += 10 ** 9
+        os.utime(str(path), ns=(self.mtime, self.mtime))
+
+    def read_output(self, relative):
+        return (self.output / relative).read_text(encoding="utf-8")
+
+    def test_first_sync_translates_everything(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n.SH NAME\nls\n")
+
+        report = self.new_watcher().sync(full=True)
+
+        self.assertEqual(1, report.translated)
+        self.assertIn("<h2>NAME</h2>", self.read_output("man1/ls.1.html"))
+        self.assertTrue((self.output / watch.MANIFEST_NAME).exists())
+
+    def test_unchanged_tree_is_not_translated_again(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n")
+        self.new_watcher().sync(full=True)
+
+        report = self.new_watcher().sync()
+
+        self.assertEqual((0, 0), (report.translated, report.removed))
+
+    def test_only_changed_page_is_translated(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n")
+        self.write_page("man1/cp.1", ".TH CP 1\n")
+        watcher = self.new_watcher()
+        watcher.sync(full=True)
+
+        self.write_page("man1/ls.1", ".TH LS 1\n.SH CHANGED\n")
+        report = watcher.sync()
+
+        self.assertEqual(1, report.translated)
+        self.assertIn("CHANGED", self.read_output("man1/ls.1.html"))
+
+    def test_touched_page_with_same_content_is_not_translated(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n")
+        watcher = self.new_watcher()
+        watcher.sync(full=True)
+
+        self.touch(self.root / "man1" / "ls.1")
+        report = watcher.sync([self.root / "man1"])
+
+        self.assertEqual(0, report.translated)
+
+    def test_removed_page_output_is_deleted(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n")
+        watcher = self.new_watcher()
+        watcher.sync(full=True)
+
+        (self.root / "man1" / "ls.1").unlink()
+        self.touch(self.root / "man1")
+        report = watcher.sync()
+
+        self.assertEqual(1, report.removed)
+        self.assertFalse((self.output / "man1" / "ls.1.html").exists())
+
+    def test_new_section_directory_is_found(self):
+        watcher = self.new_watcher()
+        watcher.sync(full=True)
+
+        (self.root / "man5").mkdir()
+        self.write_page("man5/passwd.5", ".TH PASSWD 5\n")
+        self.touch(self.root)
+        report = watcher.sync()
+
+        self.assertEqual(1, report.translated)
+
+    def test_poll_finds_page_rewritten_in_place(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n")
+        watcher = self.new_watcher()
+        watcher.sync(full=True)
+
+        path = self.root / "man1" / "ls.1"
+        path.write_text(".TH LS 1\n.SH CHANGED\n", encoding="utf-8")
+        self.touch(path)
+        report = watcher.poll()
+
+        self.assertEqual(1, report.translated)
+        self.assertIn("CHANGED", self.read_output("man1/ls.1.html"))
+        self.assertEqual(0, watcher.poll().translated)
+
+    def test_failed_page_is_retried_and_its_output_removed(self):
+        self.write_page("man1/ls.1", ".TH LS 1\n")
+        watcher = self.new_watcher()
+        watcher.sync(full=True)
+
+        self.write_page("man1/ls.1", ".de XX\n.XX\n..\n.XX\n")
+        self.assertEqual(1, len(watcher.sync().failures))
+        # страница с ошибкой переводится снова и без изменений каталога
+        self.assertEqual(1, len(watcher.sync().failures))
+
+        (self.root / "man1" / "ls.1").unlink()
+        self.touch(self.root / "man1")
+        report = watcher.sync()
+
+        self.assertEqual(1, report.removed)
+        self.assertFalse((self.output / "man1" / "ls.1.html").exists())
+
+    @unittest.skipIf(watch.open_inotify() is None, "inotify is unavailable")
+    def test_inotify_reports_changed_directory(self):
+        notifier = watch.open_inotify()
+        self.addCleanup(notifier.close)
+        notifier.watch(self.root / "man1")
+
+        (self.root / "man1" / "ls.1").write_text(".TH LS 1\n")
+
+        self.assertEqual({str(self.root / "man1")}, notifier.wait(5))
+
+
+if __name__ == "__main__":
+    unittest.main()